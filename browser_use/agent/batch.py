@@ -0,0 +1,203 @@
+"""
+Running many agents on one browser, with shared resources and concurrency limits.
+
+The agents of a batch share one controller, and so the action models built from its registry, one
+browser with a pool of warm contexts, and a limit on the model calls running at the same time. Results
+are streamed as the tasks finish, and the batch keeps the throughput, step latencies and token usage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from browser_use.agent.service import Agent
+from browser_use.agent.views import AgentHistoryList
+from browser_use.browser.browser import Browser
+from browser_use.browser.context import BrowserContext
+from browser_use.browser.pool import BrowserContextPool, BrowserContextPoolConfig
+from browser_use.controller.service import Controller
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+	index: int
+	task: str
+	history: Optional[AgentHistoryList]
+	# Set when the agent could not run at all, failed steps are in the history
+	error: Optional[str] = None
+	duration_seconds: float = 0.0
+
+
+@dataclass
+class BatchMetrics:
+	"""Aggregate statistics of the tasks of a batch finished so far"""
+
+	tasks_completed: int = 0
+	tasks_failed: int = 0
+	steps: int = 0
+	input_tokens: int = 0
+	cached_input_tokens: int = 0
+	elapsed_seconds: float = 0.0
+	step_latencies: list[float] = field(default_factory=list)
+
+	@property
+	def tasks_per_minute(self) -> float:
+		return 60 * (self.tasks_completed + self.tasks_failed) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+	@property
+	def steps_per_second(self) -> float:
+		return self.steps / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+	def step_latency_percentile(self, percentile: float) -> Optional[float]:
+		"""Step duration in seconds below which `percentile` percent of the steps are, by nearest rank"""
+		if not self.step_latencies:
+			return None
+		latencies = sorted(self.step_latencies)
+		return latencies[max(0, math.ceil(percentile / 100 * len(latencies)) - 1)]
+
+	@property
+	def p50_step_latency(self) -> Optional[float]:
+		return self.step_latency_percentile(50)
+
+	@property
+	def p95_step_latency(self) -> Optional[float]:
+		return self.step_latency_percentile(95)
+
+	def record(self, result: BatchResult) -> None:
+		if result.history is None:
+			self.tasks_failed += 1
+			return
+		self.tasks_completed += 1
+		for item in result.history.history:
+			self.steps += 1
+			if item.metadata:
+				self.step_latencies.append(item.metadata.duration_seconds)
+				self.input_tokens += item.metadata.input_tokens
+				self.cached_input_tokens += item.metadata.cached_input_tokens
+
+
+class AgentBatch:
+	"""
+	Runs one agent per task, at most `max_concurrent_agents` at a time.
+
+	Usage:
+		batch = AgentBatch(tasks, llm=ChatOpenAI(model='gpt-4o'), max_concurrent_agents=8, max_concurrent_llm_calls=16)
+		async for result in batch.stream():
+			print(result.index, result.history.final_result())
+		print(batch.metrics.p95_step_latency)
+
+	Other keyword arguments are passed to every `Agent`.
+	"""
+
+	def __init__(
+		self,
+		tasks: Sequence[str],
+		llm: BaseChatModel,
+		controller: Optional[Controller] = None,
+		browser: Optional[Browser] = None,
+		max_concurrent_agents: int = 4,
+		max_concurrent_llm_calls: Optional[int] = None,
+		max_steps: int = 100,
+		reuse_browser_contexts: bool = True,
+		**agent_kwargs: Any,
+	):
+		if max_concurrent_agents < 1:
+			raise ValueError('max_concurrent_agents must be at least 1')
+
+		self.tasks = list(tasks)
+		self.llm = llm
+		self.controller = controller or Controller()
+		self.browser = browser
+		self.max_concurrent_agents = max_concurrent_agents
+		self.max_steps = max_steps
+		self.reuse_browser_contexts = reuse_browser_contexts
+		self.agent_kwargs = agent_kwargs
+		self.metrics = BatchMetrics()
+
+		self._agent_semaphore = asyncio.Semaphore(max_concurrent_agents)
+		self._llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls) if max_concurrent_llm_calls else None
+
+	async def stream(self) -> AsyncIterator[BatchResult]:
+		"""Run the tasks and yield their results as they finish"""
+		browser = self.browser or Browser()
+		pool = None
+		if self.reuse_browser_contexts and not (browser.config.cdp_url or browser.config.chrome_instance_path):
+			pool = BrowserContextPool(browser, BrowserContextPoolConfig(min_size=0, max_size=self.max_concurrent_agents))
+
+		start = time.monotonic()
+		running = [asyncio.create_task(self._run_task(index, task, browser, pool)) for index, task in enumerate(self.tasks)]
+		try:
+			for next_result in asyncio.as_completed(running):
+				result = await next_result
+				self.metrics.record(result)
+				self.metrics.elapsed_seconds = time.monotonic() - start
+				yield result
+		finally:
+			for task in running:
+				task.cancel()
+			await asyncio.gather(*running, return_exceptions=True)
+			self.metrics.elapsed_seconds = time.monotonic() - start
+			if pool is not None:
+				await pool.close()
+			if self.browser is None:
+				await browser.close()
+
+	async def run(self) -> list[BatchResult]:
+		"""Run the tasks and return their results in the order of the tasks"""
+		results: list[Optional[BatchResult]] = [None] * len(self.tasks)
+		async for result in self.stream():
+			results[result.index] = result
+		return results  # type: ignore
+
+	async def _run_task(self, index: int, task: str, browser: Browser, pool: Optional[BrowserContextPool]) -> BatchResult:
+		async with self._agent_semaphore:
+			start = time.monotonic()
+			try:
+				if pool is not None:
+					async with pool.lease() as browser_context:
+						history = await self._run_agent(task, browser, browser_context)
+				else:
+					browser_context = BrowserContext(browser=browser, config=browser.config.new_context_config)
+					try:
+						history = await self._run_agent(task, browser, browser_context)
+					finally:
+						await browser_context.close()
+				return BatchResult(index=index, task=task, history=history, duration_seconds=time.monotonic() - start)
+			except Exception as e:
+				logger.error(f'Task {index} of the batch failed: {type(e).__name__}: {e}')
+				return BatchResult(
+					index=index,
+					task=task,
+					history=None,
+					error=f'{type(e).__name__}: {e}',
+					duration_seconds=time.monotonic() - start,
+				)
+
+	async def _run_agent(self, task: str, browser: Browser, browser_context: BrowserContext) -> AgentHistoryList:
+		agent = self._create_agent(task, browser, browser_context)
+		return await agent.run(max_steps=self.max_steps)
+
+	def _create_agent(self, task: str, browser: Browser, browser_context: BrowserContext) -> Agent:
+		return Agent(
+			task=task,
+			llm=self.llm,
+			browser=browser,
+			browser_context=browser_context,
+			controller=self.controller,
+			llm_semaphore=self._llm_semaphore,
+			**self.agent_kwargs,
+		)
+
+
+async def run_many(tasks: Sequence[str], llm: BaseChatModel, **kwargs: Any) -> list[BatchResult]:
+	"""Run one agent per task with a shared controller and browser, see `AgentBatch` for the options"""
+	return await AgentBatch(tasks, llm, **kwargs).run()
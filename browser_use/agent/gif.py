@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import base64
+import functools
 import io
+import itertools
 import logging
 import os
 import platform
-from typing import TYPE_CHECKING, Optional
+import shutil
+import subprocess
+from typing import TYPE_CHECKING, Iterator, Optional
 
 from browser_use.agent.views import (
 	AgentHistoryList,
@@ -17,6 +21,15 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+LOGO_PATH = './static/browser-use.png'
+
+# Encoder arguments of the video formats, written through ffmpeg
+VIDEO_CODECS = {
+	'.mp4': ['-c:v', 'libx264', '-pix_fmt', 'yuv420p'],
+	'.webm': ['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuv420p'],
+}
+
+
 def create_history_gif(
 	task: str,
 	history: AgentHistoryList,
@@ -32,108 +45,211 @@ def create_history_gif(
 	margin: int = 40,
 	line_spacing: float = 1.5,
 ) -> None:
-	"""Create a GIF from the agent's history with overlaid task and goal text."""
+	"""
+	Create a GIF from the agent's history with overlaid task and goal text.
+
+	Frames are decoded, overlaid and encoded one at a time, so memory does not grow with the length of the
+	history. An output path ending in .mp4 or .webm writes a video through ffmpeg instead. The function is
+	blocking: run it with `asyncio.to_thread` from async code, or submit it to a process pool.
+	"""
 	if not history.history:
 		logger.warning('No history to create GIF from')
 		return
 
-	from PIL import Image, ImageFont
-
-	images = []
-
 	# if history is empty or first screenshot is None, we can't create a gif
-	if not history.history or not history.history[0].state.screenshot:
+	first_screenshot = history.history[0].state.get_screenshot()
+	if not first_screenshot:
 		logger.warning('No history or first screenshot to create GIF from')
 		return
 
-	# Try to load nicer fonts
-	try:
-		# Try different font options in order of preference
-		font_options = ['Helvetica', 'Arial', 'DejaVuSans', 'Verdana']
-		font_loaded = False
-
-		for font_name in font_options:
-			try:
-				if platform.system() == 'Windows':
-					# Need to specify the abs font path on Windows
-					font_name = os.path.join(os.getenv('WIN_FONT_DIR', 'C:\\Windows\\Fonts'), font_name + '.ttf')
-				regular_font = ImageFont.truetype(font_name, font_size)
-				title_font = ImageFont.truetype(font_name, title_font_size)
-				goal_font = ImageFont.truetype(font_name, goal_font_size)
-				font_loaded = True
-				break
-			except OSError:
-				continue
-
-		if not font_loaded:
-			raise OSError('No preferred fonts found')
-
-	except OSError:
-		regular_font = ImageFont.load_default()
-		title_font = ImageFont.load_default()
-
-		goal_font = regular_font
-
-	# Load logo if requested
-	logo = None
-	if show_logo:
+	regular_font, title_font = _load_fonts(font_size, title_font_size)
+	logo = _load_logo(LOGO_PATH) if show_logo else None
+
+	frames = _render_frames(
+		task if show_task else None,
+		history,
+		first_screenshot,
+		regular_font,
+		title_font,
+		logo,
+		show_goals,
+		margin,
+		line_spacing,
+	)
+
+	suffix = os.path.splitext(output_path)[1].lower()
+	if suffix in VIDEO_CODECS:
+		frame_count = _write_video(frames, output_path, duration, VIDEO_CODECS[suffix])
+	else:
+		frame_count = _write_gif(frames, output_path, duration)
+
+	if frame_count:
+		logger.info(f'Created {"video" if suffix in VIDEO_CODECS else "GIF"} at {output_path}')
+	else:
+		logger.warning('No images found in history to create GIF')
+
+
+@functools.lru_cache(maxsize=16)
+def _load_fonts(font_size: int, title_font_size: int) -> tuple['ImageFont.FreeTypeFont', 'ImageFont.FreeTypeFont']:
+	"""Load the regular and title fonts once per size, trying nicer fonts first"""
+	from PIL import ImageFont
+
+	# Try different font options in order of preference
+	font_options = ['Helvetica', 'Arial', 'DejaVuSans', 'Verdana']
+	for font_name in font_options:
 		try:
-			logo = Image.open('./static/browser-use.png')
-			# Resize logo to be small (e.g., 40px height)
+			if platform.system() == 'Windows':
+				# Need to specify the abs font path on Windows
+				font_name = os.path.join(os.getenv('WIN_FONT_DIR', 'C:\\Windows\\Fonts'), font_name + '.ttf')
+			return ImageFont.truetype(font_name, font_size), ImageFont.truetype(font_name, title_font_size)
+		except OSError:
+			continue
+
+	return ImageFont.load_default(), ImageFont.load_default()  # type: ignore
+
+
+@functools.lru_cache(maxsize=16)
+def _load_font_variant(path: str, size: int) -> 'ImageFont.FreeTypeFont':
+	from PIL import ImageFont
+
+	return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_logo(path: str) -> Optional['Image.Image']:
+	"""Load the logo once, resized to be small"""
+	from PIL import Image
+
+	try:
+		with Image.open(path) as logo:
 			logo_height = 150
 			aspect_ratio = logo.width / logo.height
 			logo_width = int(logo_height * aspect_ratio)
-			logo = logo.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
-		except Exception as e:
-			logger.warning(f'Could not load logo: {e}')
-
-	# Create task frame if requested
-	if show_task and task:
-		task_frame = _create_task_frame(
-			task,
-			history.history[0].state.screenshot,
-			title_font,  # type: ignore
-			regular_font,  # type: ignore
-			logo,
-			line_spacing,
-		)
-		images.append(task_frame)
+			return logo.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
+	except Exception as e:
+		logger.warning(f'Could not load logo: {e}')
+		return None
+
+
+def _render_frames(
+	task: Optional[str],
+	history: AgentHistoryList,
+	first_screenshot: str,
+	regular_font: 'ImageFont.FreeTypeFont',
+	title_font: 'ImageFont.FreeTypeFont',
+	logo: Optional['Image.Image'],
+	show_goals: bool,
+	margin: int,
+	line_spacing: float,
+) -> Iterator['Image.Image']:
+	"""Yield the frames one by one: the task frame if a task is given, then every step with a screenshot"""
+	from PIL import Image
+
+	if task:
+		yield _create_task_frame(task, first_screenshot, title_font, regular_font, logo, line_spacing)
 
-	# Process each history item
 	for i, item in enumerate(history.history, 1):
-		if not item.state.screenshot:
+		screenshot = item.state.get_screenshot()
+		if not screenshot:
 			continue
 
 		# Convert base64 screenshot to PIL Image
-		img_data = base64.b64decode(item.state.screenshot)
-		image = Image.open(io.BytesIO(img_data))
+		image = Image.open(io.BytesIO(base64.b64decode(screenshot)))
 
 		if show_goals and item.model_output:
 			image = _add_overlay_to_image(
 				image=image,
 				step_number=i,
 				goal_text=item.model_output.current_state.next_goal,
-				regular_font=regular_font,  # type: ignore
-				title_font=title_font,  # type: ignore
+				regular_font=regular_font,
+				title_font=title_font,
 				margin=margin,
 				logo=logo,
 			)
 
-		images.append(image)
-
-	if images:
-		# Save the GIF
-		images[0].save(
-			output_path,
-			save_all=True,
-			append_images=images[1:],
-			duration=duration,
-			loop=0,
-			optimize=False,
-		)
-		logger.info(f'Created GIF at {output_path}')
-	else:
-		logger.warning('No images found in history to create GIF')
+		yield image
+
+
+def _fit_to_size(image: 'Image.Image', size: tuple[int, int]) -> 'Image.Image':
+	"""All frames share the size of the first one, which is the size of the GIF canvas and of the video"""
+	image = image.convert('RGB')
+	return image if image.size == size else image.resize(size)
+
+
+def _write_gif(frames: Iterator['Image.Image'], output_path: str, duration: int) -> int:
+	"""Encode the frames into a looping GIF as they come, each with its own palette. Returns the number of frames."""
+	from PIL import GifImagePlugin, Image
+
+	first_frame = next(frames, None)
+	if first_frame is None:
+		return 0
+
+	size = first_frame.size
+	frame_count = 0
+	with open(output_path, 'wb') as f:
+		for frame in itertools.chain([first_frame], frames):
+			frame = _fit_to_size(frame, size).convert('P', palette=Image.Palette.ADAPTIVE)
+			if frame_count == 0:
+				header, _ = GifImagePlugin.getheader(frame, info={'loop': 0, 'duration': duration})
+				f.write(b''.join(header))
+			f.write(b''.join(GifImagePlugin.getdata(frame, duration=duration, include_color_table=True)))
+			frame_count += 1
+		f.write(b';')  # trailer
+
+	return frame_count
+
+
+def _write_video(frames: Iterator['Image.Image'], output_path: str, duration: int, codec_args: list[str]) -> int:
+	"""Pipe the frames as raw RGB into an ffmpeg process. Returns the number of frames."""
+	ffmpeg = shutil.which('ffmpeg')
+	if ffmpeg is None:
+		raise RuntimeError(f'ffmpeg is required to write {output_path}, install it or use a .gif output path')
+
+	first_frame = next(frames, None)
+	if first_frame is None:
+		return 0
+
+	size = first_frame.size
+	frame_rate = f'1000/{duration}'
+	command = [
+		ffmpeg,
+		'-y',
+		'-loglevel',
+		'error',
+		'-f',
+		'rawvideo',
+		'-pix_fmt',
+		'rgb24',
+		'-s',
+		f'{size[0]}x{size[1]}',
+		'-framerate',
+		frame_rate,
+		'-i',
+		'-',
+		# yuv420p needs even dimensions
+		'-vf',
+		'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+		*codec_args,
+		'-r',
+		frame_rate,
+		output_path,
+	]
+
+	frame_count = 0
+	with subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+		assert process.stdin is not None
+		try:
+			for frame in itertools.chain([first_frame], frames):
+				process.stdin.write(_fit_to_size(frame, size).tobytes())
+				frame_count += 1
+		finally:
+			process.stdin.close()
+		stderr = process.stderr.read() if process.stderr else b''
+
+	if process.returncode != 0:
+		raise RuntimeError(f'ffmpeg failed to write {output_path}: {stderr.decode(errors="replace").strip()}')
+
+	return frame_count
 
 
 def _create_task_frame(
@@ -145,7 +261,7 @@ def _create_task_frame(
 	line_spacing: float = 1.5,
 ) -> 'Image.Image':
 	"""Create initial frame showing the task."""
-	from PIL import Image, ImageDraw, ImageFont
+	from PIL import Image, ImageDraw
 
 	img_data = base64.b64decode(first_screenshot)
 	template = Image.open(io.BytesIO(img_data))
@@ -158,7 +274,7 @@ def _create_task_frame(
 	# Draw task text with increased font size
 	margin = 140  # Increased margin
 	max_width = image.width - (2 * margin)
-	larger_font = ImageFont.truetype(regular_font.path, regular_font.size + 16)  # Increase font size more
+	larger_font = _load_font_variant(regular_font.path, regular_font.size + 16)  # Increase font size more
 	wrapped_text = _wrap_text(task, larger_font, max_width)
 
 	# Calculate line height with spacing
@@ -0,0 +1,113 @@
+"""
+Compaction of the older steps of the message history into a running summary.
+
+Every step appends the model output, its tool message and the results kept in memory, so the input of
+long runs grows without bound. Past a threshold, the steps before the most recent ones are replaced
+by a single summary message, written either extractively from the model outputs or by a cheap LLM.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+if TYPE_CHECKING:
+	from langchain_core.language_models.chat_models import BaseChatModel
+
+SUMMARY_HEADER = '[Summary of earlier steps]'
+MEMORY_PREFIX = 'Memory after these steps: '
+OMITTED_LINE = '... earlier steps omitted ...'
+
+# Calls the model through the limits of the caller, like `Agent._invoke_llm` with the scheduler shared by all agents
+InvokeLLM = Callable[[Callable[[], Awaitable[BaseMessage]], 'BaseChatModel'], Awaitable[BaseMessage]]
+
+SUMMARIZER_PROMPT = """You compress the history of a browser automation agent.
+You get the summary of the steps so far and a log of the steps that follow it.
+Write one updated summary: what was done and found, which pages were visited, what failed and what is left to do.
+Keep every fact needed to finish the task (urls, names, numbers, extracted data). Be concise and do not invent anything.
+Answer with the summary only."""
+
+
+def _truncate(text: str, max_chars: int) -> str:
+	text = ' '.join(text.split())
+	return text if len(text) <= max_chars else text[: max_chars - 3] + '...'
+
+
+def _format_action(action: dict) -> str:
+	return ', '.join(
+		f'{name}({json.dumps(params, ensure_ascii=False, separators=(",", ":"))})' if params else name
+		for name, params in action.items()
+	)
+
+
+def summarize_extractively(messages: list[BaseMessage], max_line_chars: int = 300) -> list[str]:
+	"""One line per model output, with its goal and actions, followed by the results and plans kept in memory"""
+	lines = []
+	for message in messages:
+		if isinstance(message, AIMessage) and message.tool_calls:
+			for tool_call in message.tool_calls:
+				args = tool_call['args']
+				brain = args.get('current_state', {})
+				parts = []
+				if brain.get('evaluation_previous_goal'):
+					parts.append(f'evaluation: {brain["evaluation_previous_goal"]}')
+				if brain.get('next_goal'):
+					parts.append(f'goal: {brain["next_goal"]}')
+				actions = [_format_action(action) for action in args.get('action', []) if action]
+				if actions:
+					parts.append(f'actions: {"; ".join(actions)}')
+				if parts:
+					lines.append(_truncate('- ' + ' | '.join(parts), max_line_chars))
+		elif isinstance(message, AIMessage) and isinstance(message.content, str) and message.content.strip():
+			lines.append(_truncate(f'- plan: {message.content}', max_line_chars))
+		elif isinstance(message, HumanMessage) and isinstance(message.content, str) and message.content.strip():
+			lines.append(_truncate(f'  {message.content}', max_line_chars))
+
+	# The memory of the last model output describes the progress so far
+	for message in reversed(messages):
+		if isinstance(message, AIMessage) and message.tool_calls:
+			memory = message.tool_calls[-1]['args'].get('current_state', {}).get('memory')
+			if memory:
+				lines.append(_truncate(f'{MEMORY_PREFIX}{memory}', max_line_chars * 2))
+			break
+
+	return lines
+
+
+def merge_summaries(previous: Optional[str], lines: list[str], max_chars: int) -> str:
+	"""Append the new lines to the previous summary, dropping the oldest lines beyond `max_chars`"""
+	previous_lines = previous.splitlines() if previous else []
+	omitted = OMITTED_LINE in previous_lines
+	has_new_memory = any(line.startswith(MEMORY_PREFIX) for line in lines)
+	# An older memory is superseded by the new one
+	all_lines = [
+		line for line in previous_lines if line != OMITTED_LINE and not (has_new_memory and line.startswith(MEMORY_PREFIX))
+	] + lines
+
+	while len(all_lines) > 1 and sum(len(line) + 1 for line in all_lines) > max_chars:
+		all_lines.pop(0)
+		omitted = True
+
+	return '\n'.join(([OMITTED_LINE] if omitted else []) + all_lines)
+
+
+async def summarize_with_llm(
+	llm: BaseChatModel, previous: Optional[str], lines: list[str], invoke_llm: Optional[InvokeLLM] = None
+) -> str:
+	"""Let the LLM rewrite the previous summary with the log of the compacted steps"""
+	log = '\n'.join(lines)
+	messages = [
+		SystemMessage(content=SUMMARIZER_PROMPT),
+		HumanMessage(content=f'Summary so far:\n{previous or "(none)"}\n\nSteps that follow:\n{log}'),
+	]
+	if invoke_llm is None:
+		response = await llm.ainvoke(messages)
+	else:
+		response = await invoke_llm(lambda: llm.ainvoke(messages), llm)
+	return str(response.content).strip()
+
+
+def summary_message(summary: str) -> HumanMessage:
+	return HumanMessage(content=f'{SUMMARY_HEADER}\n{summary}')
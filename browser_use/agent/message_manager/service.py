@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from langchain_core.messages import (
 	AIMessage,
@@ -12,18 +12,49 @@ from langchain_core.messages import (
 )
 from pydantic import BaseModel
 
-from browser_use.agent.message_manager.views import MessageMetadata
+from browser_use.agent.message_manager.compaction import (
+	InvokeLLM,
+	merge_summaries,
+	summarize_extractively,
+	summarize_with_llm,
+	summary_message,
+)
+from browser_use.agent.message_manager.tokens import TokenCounter, get_token_counter
+from browser_use.agent.message_manager.views import ManagedMessage, MessageKind, MessageMetadata
 from browser_use.agent.prompts import AgentMessagePrompt
 from browser_use.agent.views import ActionResult, AgentOutput, AgentStepInfo, MessageManagerState
 from browser_use.browser.views import BrowserState
+from browser_use.dom.budget import ElementLine, pack_lines, score_lines, task_words
+from browser_use.dom.diff import ElementLines, ElementsDiff, diff_elements, element_lines, line_keys
 from browser_use.utils import time_execution_sync
 
+if TYPE_CHECKING:
+	from langchain_core.language_models.chat_models import BaseChatModel
+
 logger = logging.getLogger(__name__)
 
 
 class MessageManagerSettings(BaseModel):
 	max_input_tokens: int = 128000
+	# Mark the stable prefix of the messages with Anthropic cache_control breakpoints
+	prompt_caching: bool = False
+	# Replace the older steps with a summary once the history reaches this fraction of max_input_tokens
+	compaction_threshold: Optional[float] = None
+	# Most recent steps that are always kept as they are
+	compaction_keep_steps: int = 5
+	# Maximum length of the extractive summary, the oldest steps are dropped from it first
+	compaction_summary_max_chars: int = 6000
+	# Send only the changes to the interactive elements since a baseline element list kept in the history
+	state_delta: bool = False
+	# Send a new baseline instead once the changes exceed this fraction of the elements
+	state_delta_max_ratio: float = 0.3
+	# Keep only the most relevant elements that fit in this many tokens, None to send all of them
+	max_elements_tokens: Optional[int] = None
+	# Model whose tokenizer counts the tokens, see `get_token_counter`
+	model_name: Optional[str] = None
+	# Used when no tokenizer is available
 	estimated_characters_per_token: int = 3
+	# Used when the size of an image cannot be read
 	image_tokens: int = 800
 	include_attributes: list[str] = []
 	message_context: Optional[str] = None
@@ -38,11 +69,32 @@ class MessageManager:
 		system_message: SystemMessage,
 		settings: MessageManagerSettings = MessageManagerSettings(),
 		state: MessageManagerState = MessageManagerState(),
+		token_counter: Optional[TokenCounter] = None,
+		summarizer_llm: Optional[BaseChatModel] = None,
 	):
 		self.task = task
 		self.settings = settings
 		self.state = state
 		self.system_prompt = system_message
+		self.token_counter = token_counter or get_token_counter(
+			settings.model_name,
+			settings.estimated_characters_per_token,
+			fallback_image_tokens=settings.image_tokens,
+		)
+
+		# Writes the summary of compacted steps, an extractive summary is used without it
+		self.summarizer_llm = summarizer_llm
+
+		# Screenshot and history message of the image that the state messages of an unchanged page refer to
+		self._screenshot_message: Optional[tuple[str, BaseMessage]] = None
+		# The state message of the current step, where the volatile end of the messages starts
+		self._state_message: Optional[BaseMessage] = None
+		# Message that ended the stable prefix at the previous call, whose cache the next call reads
+		self._previous_cache_breakpoint: Optional[BaseMessage] = None
+		# Url, keyed element lines and history message of the element list that state deltas refer to
+		self._elements_baseline: Optional[tuple[str, ElementLines, BaseMessage]] = None
+		# All element lines of the previous state, to rank the ones that changed since higher
+		self._previous_element_lines: Optional[ElementLines] = None
 
 		# Only initialize messages if state is empty
 		if len(self.state.history.messages) == 0:
@@ -100,10 +152,12 @@ class MessageManager:
 			filepaths_msg = HumanMessage(content=f'Here are file paths you can use: {self.settings.available_file_paths}')
 			self._add_message_with_tokens(filepaths_msg)
 
+		self.state.init_messages = len(self.state.history.messages)
+
 	def add_new_task(self, new_task: str) -> None:
 		content = f'Your new ultimate task is: """{new_task}""". Take the previous context into account and finish your new ultimate task. '
 		msg = HumanMessage(content=content)
-		self._add_message_with_tokens(msg)
+		self._add_message_with_tokens(msg, kind='task')
 		self.task = new_task
 
 	@time_execution_sync('--add_state_message')
@@ -133,14 +187,93 @@ class MessageManager:
 						self._add_message_with_tokens(msg)
 					result = None  # if result in history, we dont want to add it again
 
+		screenshot_already_sent = False
+		if use_vision and state.screenshot and state.screenshot_unchanged:
+			self._keep_screenshot(state.screenshot)
+			screenshot_already_sent = True
+		elif self._screenshot_message is not None:
+			# The page changed, the kept screenshot is outdated
+			self.state.history.remove_message(self._screenshot_message[1])
+			self._screenshot_message = None
+
+		lines = None
+		if self.settings.state_delta or self.settings.max_elements_tokens is not None:
+			lines = self._get_element_lines(state)
+		elements_diff = None
+		elements_text = None
+		if lines is not None and self.settings.state_delta:
+			elements_diff = self._update_elements_baseline(state, lines)
+		elif lines is not None:
+			elements_text = '\n'.join(line for _, line in lines)
+
 		# otherwise add state message and result to next message (which will not stay in memory)
 		state_message = AgentMessagePrompt(
 			state,
 			result,
 			include_attributes=self.settings.include_attributes,
 			step_info=step_info,
+			screenshot_already_sent=screenshot_already_sent,
+			elements_diff=elements_diff,
+			elements_text=elements_text,
 		).get_user_message(use_vision)
-		self._add_message_with_tokens(state_message)
+		self._add_message_with_tokens(state_message, kind='state')
+		self._state_message = self.state.history.messages[-1].message
+
+	def _keep_screenshot(self, screenshot: str) -> None:
+		"""
+		Keep the screenshot in a history message of its own, which the state messages refer to while it does not change.
+
+		State messages are removed after every step, so the image of the previous one is not in the messages anymore.
+		The browser also only compares to its previous state, which may never have been sent (e.g. the states
+		taken between the actions of a step), so the kept message always holds the current screenshot.
+		"""
+		if self._screenshot_message is not None:
+			kept_screenshot, kept_message = self._screenshot_message
+			if kept_screenshot == screenshot and any(m.message is kept_message for m in self.state.history.messages):
+				return
+			self.state.history.remove_message(kept_message)
+
+		self._add_message_with_tokens(AgentMessagePrompt.get_screenshot_message(screenshot))
+		self._screenshot_message = (screenshot, self.state.history.messages[-1].message)
+
+	def _get_element_lines(self, state: BrowserState) -> list[ElementLine]:
+		"""The serialized elements, packed into `max_elements_tokens` by relevance if it is set"""
+		lines = state.element_tree.clickable_elements_to_lines(include_attributes=self.settings.include_attributes)
+		if self.settings.max_elements_tokens is None:
+			return lines
+
+		keys = line_keys(lines)
+		changed_keys = None
+		if self._previous_element_lines is not None:
+			previous = self._previous_element_lines
+			changed_keys = {key for key, (_, line) in zip(keys, lines) if previous.get(key) != line}
+		self._previous_element_lines = dict(zip(keys, (line for _, line in lines)))
+
+		scores = score_lines(lines, task_words(self.task), changed_keys, keys)
+		return pack_lines(lines, scores, self.settings.max_elements_tokens, self.token_counter.count_text)
+
+	def _update_elements_baseline(self, state: BrowserState, lines: list[ElementLine]) -> ElementsDiff:
+		"""
+		Diff the elements against the baseline, or add a new baseline message to the history.
+
+		A new baseline is sent after navigation, when the changes are large, or when the previous baseline
+		left the history (e.g. compacted). It replaces the previous one, and the state message then lists no changes.
+		"""
+		current = element_lines(lines)
+
+		if self._elements_baseline is not None:
+			baseline_url, baseline, baseline_message = self._elements_baseline
+			in_history = any(m.message is baseline_message for m in self.state.history.messages)
+			if baseline_url == state.url and in_history:
+				diff = diff_elements(baseline, current)
+				if len(diff) <= self.settings.state_delta_max_ratio * max(len(current), 1):
+					return diff
+			self.state.history.remove_message(baseline_message)
+
+		elements_text = '\n'.join(line for _, line in lines)
+		self._add_message_with_tokens(AgentMessagePrompt.get_elements_baseline_message(state.url, elements_text), kind='elements')
+		self._elements_baseline = (state.url, current, self.state.history.messages[-1].message)
+		return ElementsDiff()
 
 	def add_model_output(self, model_output: AgentOutput) -> None:
 		"""Add model output as AI message"""
@@ -180,11 +313,43 @@ class MessageManager:
 			logger.debug(f'{m.message.__class__.__name__} - Token count: {m.metadata.tokens}')
 		logger.debug(f'Total input tokens: {total_input_tokens}')
 
+		if self.settings.prompt_caching:
+			msg = self._add_cache_breakpoints(msg)
+
 		return msg
 
-	def _add_message_with_tokens(self, message: BaseMessage, position: int | None = None) -> None:
+	def _add_cache_breakpoints(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+		"""
+		Mark the system prompt and the end of the stable history as cache breakpoints.
+
+		Everything before the state message of the current step is only ever appended to, so the provider can
+		reuse it from the previous step. The breakpoint moves to the last message before the state message,
+		and the one of the previous call is kept, so the prefix written then is read even when a step added
+		many messages. The stored messages are not modified, the marked ones are copies.
+		"""
+		stable_end = next((i for i, m in enumerate(messages) if m is self._state_message), len(messages))
+
+		breakpoints = set()
+		if messages and isinstance(messages[0], SystemMessage):
+			breakpoints.add(0)
+		# Anthropic drops empty text blocks, e.g. of the model outputs, so those cannot carry a breakpoint
+		last_breakpoint = next((i for i in range(stable_end - 1, 0, -1) if _can_cache(messages[i])), None)
+		if last_breakpoint is not None:
+			breakpoints.add(last_breakpoint)
+			previous = next((i for i, m in enumerate(messages) if m is self._previous_cache_breakpoint), None)
+			if previous is not None:
+				breakpoints.add(previous)
+			self._previous_cache_breakpoint = messages[last_breakpoint]
+
+		return [_with_cache_control(m) if i in breakpoints else m for i, m in enumerate(messages)]
+
+	def _add_message_with_tokens(
+		self, message: BaseMessage, position: int | None = None, kind: Optional[MessageKind] = None
+	) -> None:
 		"""Add message with token count metadata
 		position: None for last, -1 for second last, etc.
+		kind: 'task' for tasks given by the user, which compaction keeps verbatim, 'state' and 'elements' for
+		the browser state and the interactive elements baseline, which it leaves out of the summary
 		"""
 
 		# filter out sensitive data from the message
@@ -192,7 +357,7 @@ class MessageManager:
 			message = self._filter_sensitive_data(message)
 
 		token_count = self._count_tokens(message)
-		metadata = MessageMetadata(tokens=token_count)
+		metadata = MessageMetadata(tokens=token_count, kind=kind)
 		self.state.history.add_message(message, metadata, position)
 
 	@time_execution_sync('--filter_sensitive_data')
@@ -223,7 +388,7 @@ class MessageManager:
 		if isinstance(message.content, list):
 			for item in message.content:
 				if 'image_url' in item:
-					tokens += self.settings.image_tokens
+					tokens += self.token_counter.count_image(item['image_url'])  # type: ignore
 				elif isinstance(item, dict) and 'text' in item:
 					tokens += self._count_text_tokens(item['text'])
 		else:
@@ -233,10 +398,19 @@ class MessageManager:
 			tokens += self._count_text_tokens(msg)
 		return tokens
 
+	async def load_token_counter(self) -> None:
+		"""Load the tokenizer without blocking the event loop, and count the messages so far again with it"""
+		if not await self.token_counter.load():
+			return
+
+		self.state.history.current_tokens = 0
+		for managed_message in self.state.history.messages:
+			managed_message.metadata.tokens = self._count_tokens(managed_message.message)
+			self.state.history.current_tokens += managed_message.metadata.tokens
+
 	def _count_text_tokens(self, text: str) -> int:
 		"""Count tokens in a text string"""
-		tokens = len(text) // self.settings.estimated_characters_per_token  # Rough estimate if no tokenizer available
-		return tokens
+		return self.token_counter.count_text(text)
 
 	def cut_messages(self):
 		"""Get current message list, potentially trimmed to max tokens"""
@@ -252,11 +426,12 @@ class MessageManager:
 			for item in msg.message.content:
 				if 'image_url' in item:
 					msg.message.content.remove(item)
-					diff -= self.settings.image_tokens
-					msg.metadata.tokens -= self.settings.image_tokens
-					self.state.history.current_tokens -= self.settings.image_tokens
+					image_tokens = self.token_counter.count_image(item['image_url'])  # type: ignore
+					diff -= image_tokens
+					msg.metadata.tokens -= image_tokens
+					self.state.history.current_tokens -= image_tokens
 					logger.debug(
-						f'Removed image with {self.settings.image_tokens} tokens - total tokens now: {self.state.history.current_tokens}/{self.settings.max_input_tokens}'
+						f'Removed image with {image_tokens} tokens - total tokens now: {self.state.history.current_tokens}/{self.settings.max_input_tokens}'
 					)
 				elif 'text' in item and isinstance(item, dict):
 					text += item['text']
@@ -295,6 +470,61 @@ class MessageManager:
 			f'Added message with {last_msg.metadata.tokens} tokens - total tokens now: {self.state.history.current_tokens}/{self.settings.max_input_tokens} - total messages: {len(self.state.history.messages)}'
 		)
 
+	async def compact_history(self, invoke_llm: Optional[InvokeLLM] = None) -> bool:
+		"""
+		Replace the older steps with a running summary once the history passes the compaction threshold.
+
+		The initial messages and the last `compaction_keep_steps` steps are kept. A step starts with the
+		model output, so a tool message always stays with the tool call it answers. Tasks given by the user
+		in the compacted steps are kept verbatim after the summary. Returns whether the history was compacted.
+
+		invoke_llm: calls the summarizer through the rate limits of the caller, it is called directly without it
+		"""
+		threshold = self.settings.compaction_threshold
+		if threshold is None or not self.state.init_messages:
+			return False
+		if self.state.history.current_tokens < threshold * self.settings.max_input_tokens:
+			return False
+
+		messages = self.state.history.messages
+		start = self.state.init_messages
+		first_step = start + 1 if self.state.summary is not None else start
+		step_starts = [
+			i
+			for i in range(first_step, len(messages))
+			if isinstance(messages[i].message, AIMessage) and messages[i].message.tool_calls  # type: ignore
+		]
+		keep_steps = max(1, self.settings.compaction_keep_steps)
+		if len(step_starts) <= keep_steps:
+			return False
+		end = step_starts[-keep_steps]
+
+		compacted = [m for m in messages[first_step:end] if m.metadata.kind != 'task']
+		kept_tasks = [m for m in messages[first_step:end] if m.metadata.kind == 'task']
+
+		# Only the steps, action results and text of the user: the browser states are outdated
+		lines = summarize_extractively([m.message for m in compacted if m.metadata.kind is None])
+		summary = None
+		if self.summarizer_llm is not None:
+			try:
+				summary = await summarize_with_llm(self.summarizer_llm, self.state.summary, lines, invoke_llm)
+			except Exception as e:
+				logger.warning(f'Could not summarize the history with the LLM, using an extractive summary instead: {e}')
+		if not summary:
+			summary = merge_summaries(self.state.summary, lines, self.settings.compaction_summary_max_chars)
+
+		tokens_before = self.state.history.current_tokens
+		message = summary_message(summary)
+		summary_managed_message = ManagedMessage(message=message, metadata=MessageMetadata(tokens=self._count_tokens(message)))
+		self.state.history.replace_messages(start, end, [summary_managed_message, *kept_tasks])
+		self.state.summary = summary
+
+		logger.info(
+			f'Compacted {len(step_starts) - keep_steps} steps of the history into a summary - '
+			f'tokens {tokens_before} -> {self.state.history.current_tokens}/{self.settings.max_input_tokens}'
+		)
+		return True
+
 	def _remove_last_state_message(self) -> None:
 		"""Remove last state message from history"""
 		self.state.history.remove_last_state_message()
@@ -304,3 +534,38 @@ class MessageManager:
 		msg = ToolMessage(content=content, tool_call_id=str(self.state.tool_id))
 		self.state.tool_id += 1
 		self._add_message_with_tokens(msg)
+
+
+def _has_text(message: BaseMessage) -> bool:
+	if isinstance(message.content, str):
+		return bool(message.content.strip())
+	return any(isinstance(item, dict) and item.get('type') == 'text' and item['text'].strip() for item in message.content)
+
+
+def _can_cache(message: BaseMessage) -> bool:
+	return isinstance(message, ToolMessage) or _has_text(message)
+
+
+def _with_cache_control(message: BaseMessage) -> BaseMessage:
+	"""Copy of the message with an ephemeral cache_control on its tool result or its last text block"""
+	if isinstance(message, ToolMessage):
+		# The tool result block itself carries the breakpoint, its content is often empty
+		tool_result = {
+			'type': 'tool_result',
+			'content': message.content,
+			'tool_use_id': message.tool_call_id,
+			'is_error': message.status == 'error',
+			'cache_control': {'type': 'ephemeral'},
+		}
+		return message.model_copy(update={'content': [tool_result]})
+
+	if isinstance(message.content, str):
+		content = [{'type': 'text', 'text': message.content, 'cache_control': {'type': 'ephemeral'}}]
+	else:
+		content = list(message.content)
+		for i in range(len(content) - 1, -1, -1):
+			item = content[i]
+			if isinstance(item, dict) and item.get('type') == 'text':
+				content[i] = {**item, 'cache_control': {'type': 'ephemeral'}}
+				break
+	return message.model_copy(update={'content': content})
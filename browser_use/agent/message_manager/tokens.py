@@ -0,0 +1,194 @@
+"""
+Token counting for the message history.
+
+The counter decides when `MessageManager.cut_messages` trims the history, so it should be as close as
+possible to what the provider charges. tiktoken is optional (`pip install "browser-use[tokenizer]"`): when it
+is installed, the encoding of the model or the closest recent one is used, and a characters-per-token
+estimate otherwise.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional
+
+from browser_use.browser.screenshot import image_size
+
+if TYPE_CHECKING:
+	import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Image cost of the OpenAI vision models: a base cost plus a cost per 512px tile of the resized image
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+
+# Image cost of the Anthropic models: one token per 750 pixels of the image, after it is resized to fit these limits
+ANTHROPIC_IMAGE_PIXELS_PER_TOKEN = 750
+ANTHROPIC_IMAGE_MAX_LONG_EDGE = 1568
+ANTHROPIC_IMAGE_MAX_PIXELS = 1_150_000
+
+ImagePricing = Literal['openai', 'anthropic']
+
+
+def image_tokens(width: int, height: int, detail: str = 'auto') -> int:
+	"""Tokens of an image of the given size, from the dimensions it is resized to before being tiled"""
+	if detail == 'low':
+		return IMAGE_BASE_TOKENS
+
+	# Fit in a 2048x2048 square, then scale the shortest side down to 768px
+	if max(width, height) > 2048:
+		scale = 2048 / max(width, height)
+		width, height = width * scale, height * scale
+	if min(width, height) > 768:
+		scale = 768 / min(width, height)
+		width, height = width * scale, height * scale
+
+	tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+	return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def anthropic_image_tokens(width: int, height: int) -> int:
+	"""Tokens of an image of the given size for the Anthropic models, which scale large images down first"""
+	scale = min(
+		1.0,
+		ANTHROPIC_IMAGE_MAX_LONG_EDGE / max(width, height),
+		math.sqrt(ANTHROPIC_IMAGE_MAX_PIXELS / (width * height)),
+	)
+	return math.ceil(width * height * scale * scale / ANTHROPIC_IMAGE_PIXELS_PER_TOKEN)
+
+
+def is_anthropic_model(model_name: Optional[str]) -> bool:
+	return model_name is not None and 'claude' in model_name.lower()
+
+
+class TokenCounter(ABC):
+	"""
+	Counts the tokens of texts and images. Implement `_count_text` to plug in another tokenizer.
+
+	Counts are memoized by a hash of the content, since the same prompts, DOM states and screenshots are
+	counted again every time the history is rebuilt.
+	"""
+
+	def __init__(self, cache_size: int = 4096, fallback_image_tokens: int = 800, image_pricing: ImagePricing = 'openai'):
+		self.cache_size = cache_size
+		self.fallback_image_tokens = fallback_image_tokens
+		self.image_pricing = image_pricing
+		self._cache: OrderedDict[bytes, int] = OrderedDict()
+
+	@abstractmethod
+	def _count_text(self, text: str) -> int: ...
+
+	async def load(self) -> bool:
+		"""Load the tokenizer without blocking the event loop. Returns whether counts from now on differ from before."""
+		return False
+
+	def count_text(self, text: str) -> int:
+		key = hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+		return self._memoized(key, lambda: self._count_text(text))
+
+	def count_image(self, image_url: dict[str, Any] | str) -> int:
+		"""Tokens of an `image_url` content item, from the dimensions of a base64 data URL"""
+		url = image_url['url'] if isinstance(image_url, dict) else image_url
+		detail = image_url.get('detail', 'auto') if isinstance(image_url, dict) else 'auto'
+		if not url.startswith('data:'):
+			return self.fallback_image_tokens
+
+		key = hashlib.blake2b(f'{detail}:{url}'.encode(), digest_size=16).digest()
+
+		def count() -> int:
+			size = image_size(url.partition(',')[2])
+			if size is None:
+				return self.fallback_image_tokens
+			if self.image_pricing == 'anthropic':
+				return anthropic_image_tokens(*size)
+			return image_tokens(*size, detail=detail)
+
+		return self._memoized(key, count)
+
+	def _memoized(self, key: bytes, count: Callable[[], int]) -> int:
+		tokens = self._cache.get(key)
+		if tokens is not None:
+			self._cache.move_to_end(key)
+			return tokens
+
+		tokens = count()
+		self._cache[key] = tokens
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+		return tokens
+
+
+class EstimateTokenCounter(TokenCounter):
+	"""Rough estimate from the number of characters, for when no tokenizer is available"""
+
+	def __init__(self, characters_per_token: int = 3, **kwargs):
+		super().__init__(**kwargs)
+		self.characters_per_token = characters_per_token
+
+	def _count_text(self, text: str) -> int:
+		return len(text) // self.characters_per_token
+
+
+class TiktokenCounter(EstimateTokenCounter):
+	"""
+	Counts with the tiktoken encoding of the model, or the closest recent one for other models.
+
+	Loading the encoding reads (and may download) the BPE ranks, so it runs in a thread on `load`, and the
+	characters-per-token estimate is used until then. If it cannot be loaded, e.g. because the BPE ranks
+	cannot be downloaded, the counter keeps the estimate.
+	"""
+
+	def __init__(self, model_name: Optional[str] = None, characters_per_token: int = 3, **kwargs):
+		super().__init__(characters_per_token, **kwargs)
+		self.model_name = model_name
+		self._encoding: Optional[tiktoken.Encoding] = None
+		self._encoding_failed = False
+
+	async def load(self) -> bool:
+		if self._encoding is not None or self._encoding_failed:
+			return False
+		try:
+			self._encoding = await asyncio.to_thread(_get_encoding, self.model_name)
+		except Exception as e:
+			logger.warning(f'Could not load a tokenizer for {self.model_name}, estimating token counts instead: {e}')
+			self._encoding_failed = True
+			return False
+
+		# The memoized counts are estimates
+		self._cache.clear()
+		return True
+
+	def _count_text(self, text: str) -> int:
+		if self._encoding is None:
+			return super()._count_text(text)
+		return len(self._encoding.encode(text, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model_name: Optional[str]) -> tiktoken.Encoding:
+	"""Load an encoding once per process, the first load reads (and may download) the BPE ranks"""
+	import tiktoken
+
+	if model_name:
+		try:
+			return tiktoken.encoding_for_model(model_name)
+		except KeyError:
+			pass
+	return tiktoken.get_encoding('o200k_base')
+
+
+def get_token_counter(model_name: Optional[str] = None, characters_per_token: int = 3, **kwargs) -> TokenCounter:
+	"""The tokenizer-backed counter if tiktoken is installed, the characters-per-token estimate otherwise"""
+	kwargs.setdefault('image_pricing', 'anthropic' if is_anthropic_model(model_name) else 'openai')
+	if importlib.util.find_spec('tiktoken') is None:
+		return EstimateTokenCounter(characters_per_token, **kwargs)
+	return TiktokenCounter(model_name, characters_per_token, **kwargs)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Literal, Optional
 
 from langchain_core.load import dumpd, load
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
@@ -9,11 +9,16 @@ from pydantic import BaseModel, ConfigDict, Field, model_serializer, model_valid
 if TYPE_CHECKING:
 	from browser_use.agent.views import AgentOutput
 
+MessageKind = Literal['task', 'state', 'elements']
+
 
 class MessageMetadata(BaseModel):
 	"""Metadata for a message"""
 
 	tokens: int = 0
+	# Tasks given by the user after the start, which compaction keeps verbatim, and the browser state and
+	# interactive elements baseline, which it leaves out of the summary
+	kind: Optional[MessageKind] = None
 
 
 class ManagedMessage(BaseModel):
@@ -113,6 +118,21 @@ class MessageHistory(BaseModel):
 				self.messages.pop(i)
 				break
 
+	def replace_messages(self, start: int, end: int, messages: list[ManagedMessage]) -> None:
+		"""Replace the messages from start to end (exclusive) with the given ones"""
+		self.current_tokens -= sum(m.metadata.tokens for m in self.messages[start:end])
+		self.messages[start:end] = messages
+		self.current_tokens += sum(m.metadata.tokens for m in messages)
+
+	def remove_message(self, message: BaseMessage) -> bool:
+		"""Remove a message by identity. Returns False if it is not in the history anymore."""
+		for i, managed_message in enumerate(self.messages):
+			if managed_message.message is message:
+				self.current_tokens -= managed_message.metadata.tokens
+				self.messages.pop(i)
+				return True
+		return False
+
 	def remove_last_state_message(self) -> None:
 		"""Remove last state message from history"""
 		if len(self.messages) > 2 and isinstance(self.messages[-1].message, HumanMessage):
@@ -125,5 +145,9 @@ class MessageManagerState(BaseModel):
 
 	history: MessageHistory = Field(default_factory=MessageHistory)
 	tool_id: int = 1
+	# Number of messages set up before the task history, which are never compacted
+	init_messages: int = 0
+	# Running summary of the compacted steps, kept in the message right after the initial ones
+	summary: Optional[str] = None
 
 	model_config = ConfigDict(arbitrary_types_allowed=True)
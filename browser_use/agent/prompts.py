@@ -1,13 +1,27 @@
 import datetime
 import importlib.resources
 from datetime import datetime
+from functools import cache
 from typing import TYPE_CHECKING, List, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from browser_use.browser.screenshot import image_mime_type
+
 if TYPE_CHECKING:
 	from browser_use.agent.views import ActionResult, AgentStepInfo
 	from browser_use.browser.views import BrowserState
+	from browser_use.dom.diff import ElementsDiff
+
+ELEMENTS_BASELINE_HEADER = '[Interactive elements]'
+SCREENSHOT_HEADER = '[Screenshot]'
+
+
+@cache
+def _read_prompt_template() -> str:
+	# This works both in development and when installed as a package
+	with importlib.resources.files('browser_use.agent').joinpath('system_prompt.md').open('r') as f:
+		return f.read()
 
 
 class SystemPrompt:
@@ -35,9 +49,7 @@ class SystemPrompt:
 	def _load_prompt_template(self) -> None:
 		"""Load the prompt template from the markdown file."""
 		try:
-			# This works both in development and when installed as a package
-			with importlib.resources.files('browser_use.agent').joinpath('system_prompt.md').open('r') as f:
-				self.prompt_template = f.read()
+			self.prompt_template = _read_prompt_template()
 		except Exception as e:
 			raise RuntimeError(f'Failed to load system prompt template: {e}')
 
@@ -67,18 +79,70 @@ class AgentMessagePrompt:
 		result: Optional[List['ActionResult']] = None,
 		include_attributes: list[str] = [],
 		step_info: Optional['AgentStepInfo'] = None,
+		screenshot_already_sent: bool = False,
+		elements_diff: Optional['ElementsDiff'] = None,
+		elements_text: Optional[str] = None,
 	):
 		self.state = state
 		self.result = result
 		self.include_attributes = include_attributes
 		self.step_info = step_info
+		self.screenshot_already_sent = screenshot_already_sent
+		# Changes since the elements baseline message in the history, instead of the full element list
+		self.elements_diff = elements_diff
+		# Already serialized elements, e.g. packed into a token budget
+		self.elements_text = elements_text
+
+	@staticmethod
+	def get_elements_baseline_message(url: str, elements_text: str) -> HumanMessage:
+		"""Full element list that the following state messages only describe the changes to"""
+		return HumanMessage(
+			content=f'{ELEMENTS_BASELINE_HEADER}\n'
+			f'Interactive elements of {url}. The next state messages only list the changes to them:\n'
+			f'{elements_text or "empty page"}'
+		)
 
-	def get_user_message(self, use_vision: bool = True) -> HumanMessage:
-		elements_text = self.state.element_tree.clickable_elements_to_string(include_attributes=self.include_attributes)
+	@staticmethod
+	def get_screenshot_message(screenshot: str) -> HumanMessage:
+		"""Screenshot that the following state messages refer to while the page looks the same"""
+		# The text comes last, so that a cache breakpoint on it covers the image
+		return HumanMessage(
+			content=[
+				{'type': 'image_url', 'image_url': {'url': f'data:{image_mime_type(screenshot)};base64,{screenshot}'}},
+				{
+					'type': 'text',
+					'text': f'{SCREENSHOT_HEADER}\nThis is a screenshot of the current page. '
+					'The next state messages refer to it while the page looks the same.',
+				},
+			]
+		)
 
+	def _elements_diff_text(self) -> str:
+		assert self.elements_diff is not None
+		if not self.elements_diff:
+			return f'No changes since the {ELEMENTS_BASELINE_HEADER} message above'
+
+		sections = [f'Changes since the {ELEMENTS_BASELINE_HEADER} message above, all other elements are unchanged:']
+		for title, lines in [
+			('Removed', self.elements_diff.removed),
+			('Added', self.elements_diff.added),
+			('Changed', self.elements_diff.changed),
+		]:
+			if lines:
+				sections.append(f'{title}:\n' + '\n'.join(lines))
+		return '\n'.join(sections)
+
+	def get_user_message(self, use_vision: bool = True) -> HumanMessage:
 		has_content_above = (self.state.pixels_above or 0) > 0
 		has_content_below = (self.state.pixels_below or 0) > 0
 
+		if self.elements_diff is not None:
+			elements_text = self._elements_diff_text()
+		elif self.elements_text is not None:
+			elements_text = self.elements_text
+		else:
+			elements_text = self.state.element_tree.clickable_elements_to_string(include_attributes=self.include_attributes)
+
 		if elements_text != '':
 			if has_content_above:
 				elements_text = (
@@ -123,14 +187,21 @@ Interactive elements from top layer of the current page inside the viewport:
 					error = result.error.split('\n')[-1]
 					state_description += f'\nAction error {i + 1}/{len(self.result)}: ...{error}'
 
-		if self.state.screenshot and use_vision == True:
+		if self.state.screenshot and use_vision and self.screenshot_already_sent:
+			state_description += (
+				f'\nThe page looks exactly the same as in the {SCREENSHOT_HEADER} message above, so it is not attached again.'
+			)
+
+		elif self.state.screenshot and use_vision == True:
 			# Format message for vision model
 			return HumanMessage(
 				content=[
 					{'type': 'text', 'text': state_description},
 					{
 						'type': 'image_url',
-						'image_url': {'url': f'data:image/png;base64,{self.state.screenshot}'},  # , 'detail': 'low'
+						'image_url': {
+							'url': f'data:{image_mime_type(self.state.screenshot)};base64,{self.state.screenshot}'
+						},  # , 'detail': 'low'
 					},
 				]
 			)
@@ -0,0 +1,347 @@
+"""
+Process-wide scheduling of the model calls of every agent.
+
+With many agents on one API key, every agent calling the model as soon as it is ready ends in bursts of
+rate limit errors, and every agent waiting out its own fixed `retry_delay` wastes whole steps. The
+scheduler keeps a token bucket for the requests and one for the tokens per minute of every model, and
+lets the calls through in order of priority as the budgets allow. A rate limit error pauses every call
+to that model for as long as the response headers ask, then the call is retried ahead of the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RATE_LIMIT_ERRORS = {'RateLimitError', 'ResourceExhausted', 'TooManyRequests'}
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_SECONDS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+@dataclass
+class ModelLimits:
+	"""Budgets of one model. None leaves the budget to the provider, until its headers tell it."""
+
+	requests_per_minute: Optional[float] = None
+	tokens_per_minute: Optional[float] = None
+	max_concurrent: Optional[int] = None
+
+
+@dataclass
+class ModelMetrics:
+	requests: int = 0
+	rate_limited: int = 0
+	input_tokens: int = 0
+	output_tokens: int = 0
+	queued_seconds: float = 0.0
+	backoff_seconds: float = 0.0
+
+
+class TokenBucket:
+	"""Holds up to a minute of budget, refilled continuously at `rate_per_minute`"""
+
+	def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic):
+		self.clock = clock
+		self.rate_per_minute = rate_per_minute
+		self.level = rate_per_minute
+		self.updated = clock()
+
+	@property
+	def capacity(self) -> float:
+		return self.rate_per_minute
+
+	def _refill(self) -> None:
+		now = self.clock()
+		self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_minute / 60)
+		self.updated = now
+
+	def wait_time(self, amount: float) -> float:
+		"""Seconds until `amount` is available. A request larger than the bucket waits for a full bucket."""
+		self._refill()
+		missing = min(amount, self.capacity) - self.level
+		return max(0.0, missing * 60 / self.rate_per_minute)
+
+	def consume(self, amount: float) -> None:
+		"""Take `amount`, going into debt if the bucket does not hold it, e.g. to correct an estimate"""
+		self._refill()
+		self.level -= amount
+
+	def set_remaining(self, remaining: float) -> None:
+		self._refill()
+		self.level = min(self.level, remaining)
+
+
+@dataclass(order=True)
+class _Waiter:
+	priority: float
+	progress: int
+	sequence: int
+	tokens: int = field(compare=False)
+	future: asyncio.Future[None] = field(compare=False)
+
+
+class _ModelState:
+	def __init__(self, limits: ModelLimits):
+		self.limits = limits
+		self.requests = TokenBucket(limits.requests_per_minute) if limits.requests_per_minute else None
+		self.tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+		self.waiters: list[_Waiter] = []
+		self.running = 0
+		self.backoff_until = 0.0
+		self.consecutive_rate_limits = 0
+		self.changed = asyncio.Event()
+		self.dispatcher: Optional[asyncio.Task] = None
+		self.metrics = ModelMetrics()
+
+	def wait_time(self, tokens: int) -> Optional[float]:
+		"""Seconds until a call of `tokens` can start, or None if it waits for a running call to end"""
+		if self.limits.max_concurrent is not None and self.running >= self.limits.max_concurrent:
+			return None
+		wait = max(0.0, self.backoff_until - time.monotonic())
+		if self.requests is not None:
+			wait = max(wait, self.requests.wait_time(1))
+		if self.tokens is not None and tokens:
+			wait = max(wait, self.tokens.wait_time(tokens))
+		return wait
+
+
+class LLMScheduler:
+	"""
+	Lets the model calls of every agent through according to the budgets of their model.
+
+	Share one scheduler between all agents of a process, e.g. `Agent(..., llm_scheduler=scheduler)`.
+	Lower `priority` goes first; among equal priorities, the agent with more `progress` (steps) goes first,
+	since it holds its browser context and is closer to releasing it.
+	"""
+
+	def __init__(
+		self,
+		limits: Optional[Mapping[str, ModelLimits]] = None,
+		default_limits: ModelLimits = ModelLimits(),
+		max_retries: int = 5,
+		base_backoff: float = 1.0,
+		max_backoff: float = 60.0,
+	):
+		self.limits = dict(limits or {})
+		self.default_limits = default_limits
+		self.max_retries = max_retries
+		self.base_backoff = base_backoff
+		self.max_backoff = max_backoff
+		self._models: dict[str, _ModelState] = {}
+		self._sequence = itertools.count()
+
+	def metrics(self) -> dict[str, ModelMetrics]:
+		return {model: state.metrics for model, state in self._models.items()}
+
+	async def call(
+		self,
+		model: str,
+		invoke: Callable[[], Awaitable[T]],
+		tokens: int = 0,
+		priority: float = 0,
+		progress: int = 0,
+	) -> T:
+		"""
+		Wait for the budget of `model`, then await `invoke()`. `tokens` is the estimated input of the call,
+		corrected with the usage the response reports. Rate limit errors are retried up to `max_retries` times.
+		"""
+		state = self._get_state(model)
+		sequence = next(self._sequence)
+		for attempt in range(self.max_retries + 1):
+			await self._acquire(state, tokens, priority, progress, sequence)
+			try:
+				result = await invoke()
+			except Exception as e:
+				if not is_rate_limit_error(e) or attempt == self.max_retries:
+					raise
+				self._on_rate_limit(model, state, e)
+				continue
+			finally:
+				state.running -= 1
+				state.changed.set()
+
+			state.consecutive_rate_limits = 0
+			self._on_response(state, tokens, result)
+			return result
+		raise AssertionError('unreachable')
+
+	def _get_state(self, model: str) -> _ModelState:
+		state = self._models.get(model)
+		if state is None:
+			state = self._models[model] = _ModelState(self.limits.get(model, self.default_limits))
+		return state
+
+	async def _acquire(self, state: _ModelState, tokens: int, priority: float, progress: int, sequence: int) -> None:
+		waiter = _Waiter(priority, -progress, sequence, tokens, asyncio.get_running_loop().create_future())
+		heapq.heappush(state.waiters, waiter)
+		if state.dispatcher is None or state.dispatcher.done():
+			state.dispatcher = asyncio.create_task(self._dispatch(state))
+		state.changed.set()
+
+		start = time.monotonic()
+		try:
+			await waiter.future
+		except asyncio.CancelledError:
+			if waiter.future.done() and not waiter.future.cancelled():
+				# Granted just before the cancellation, give the slot back
+				state.running -= 1
+				state.changed.set()
+			raise
+		state.metrics.queued_seconds += time.monotonic() - start
+
+	async def _dispatch(self, state: _ModelState) -> None:
+		"""Grant the budget to the waiters in order, sleeping until the first one fits"""
+		while state.waiters:
+			state.changed.clear()
+			waiter = state.waiters[0]
+			if waiter.future.done():
+				heapq.heappop(state.waiters)
+				continue
+
+			wait = state.wait_time(waiter.tokens)
+			if wait == 0:
+				heapq.heappop(state.waiters)
+				state.running += 1
+				if state.requests is not None:
+					state.requests.consume(1)
+				if state.tokens is not None:
+					state.tokens.consume(waiter.tokens)
+				state.metrics.requests += 1
+				waiter.future.set_result(None)
+				continue
+
+			# Woken up early when a call ends, a new waiter arrives or the limits change
+			try:
+				await asyncio.wait_for(state.changed.wait(), wait)
+			except asyncio.TimeoutError:
+				pass
+
+	def _on_response(self, state: _ModelState, estimated_tokens: int, result: Any) -> None:
+		message = result.get('raw') if isinstance(result, dict) else result
+		usage = getattr(message, 'usage_metadata', None) or {}
+		input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+		state.metrics.input_tokens += input_tokens
+		state.metrics.output_tokens += output_tokens
+		if state.tokens is not None and usage:
+			state.tokens.consume(input_tokens + output_tokens - estimated_tokens)
+
+		headers = (getattr(message, 'response_metadata', None) or {}).get('headers')
+		if headers:
+			self._apply_headers(state, headers)
+
+	def _on_rate_limit(self, model: str, state: _ModelState, error: Exception) -> None:
+		state.metrics.rate_limited += 1
+		state.consecutive_rate_limits += 1
+		headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+		self._apply_headers(state, headers)
+
+		delay = retry_after_seconds(headers)
+		if delay is None:
+			# Full jitter, so that the waiting calls do not come back all at once
+			delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2**state.consecutive_rate_limits))
+		state.backoff_until = max(state.backoff_until, time.monotonic() + delay)
+		state.metrics.backoff_seconds += delay
+		logger.warning(f'Rate limited by {model}, pausing its calls for {delay:.1f}s')
+
+	def _apply_headers(self, state: _ModelState, headers: Mapping[str, str]) -> None:
+		"""Adopt the limits and the remaining budget that the provider reports"""
+		headers = {key.lower(): value for key, value in headers.items()}
+		for kind in ('requests', 'tokens'):
+			limit = _first_number(headers, f'x-ratelimit-limit-{kind}', f'anthropic-ratelimit-{kind}-limit')
+			remaining = _first_number(headers, f'x-ratelimit-remaining-{kind}', f'anthropic-ratelimit-{kind}-remaining')
+			if limit is None and remaining is None:
+				continue
+
+			bucket = state.requests if kind == 'requests' else state.tokens
+			if bucket is None and limit:
+				bucket = TokenBucket(limit)
+				if kind == 'requests':
+					state.requests = bucket
+				else:
+					state.tokens = bucket
+			if bucket is None:
+				continue
+			if limit:
+				configured = state.limits.requests_per_minute if kind == 'requests' else state.limits.tokens_per_minute
+				bucket.rate_per_minute = min(limit, configured) if configured else limit
+			if remaining is not None:
+				bucket.set_remaining(remaining)
+		state.changed.set()
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+	"""Rate limit errors of the OpenAI, Anthropic and Google clients, or any error with HTTP status 429"""
+	if type(error).__name__ in RATE_LIMIT_ERRORS:
+		return True
+	status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+	return status == 429
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+	"""Delay asked by `retry-after` or the reset headers of the exhausted budget, in seconds"""
+	headers = {key.lower(): value for key, value in headers.items()}
+	if 'retry-after-ms' in headers:
+		try:
+			return float(headers['retry-after-ms']) / 1000
+		except ValueError:
+			pass
+	if 'retry-after' in headers:
+		value = headers['retry-after']
+		try:
+			return float(value)
+		except ValueError:
+			try:
+				return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+			except (TypeError, ValueError):
+				pass
+
+	delays = []
+	for kind in ('requests', 'tokens'):
+		if _first_number(headers, f'x-ratelimit-remaining-{kind}', f'anthropic-ratelimit-{kind}-remaining') != 0:
+			continue
+		reset = headers.get(f'x-ratelimit-reset-{kind}') or headers.get(f'anthropic-ratelimit-{kind}-reset')
+		delay = _parse_reset(reset) if reset else None
+		if delay is not None:
+			delays.append(delay)
+	return max(delays) if delays else None
+
+
+def _parse_reset(value: str) -> Optional[float]:
+	"""Reset time as a duration like `6m0s` or `20ms`, or as an RFC 3339 timestamp"""
+	parts = _DURATION_PART.findall(value)
+	if parts and ''.join(number + unit for number, unit in parts) == value:
+		return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+	try:
+		reset = datetime.fromisoformat(value.replace('Z', '+00:00'))
+	except ValueError:
+		return None
+	return max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+def _first_number(headers: Mapping[str, str], *names: str) -> Optional[float]:
+	for name in names:
+		if name in headers:
+			try:
+				return float(headers[name])
+			except ValueError:
+				return None
+	return None
+
+
+def get_model_name(llm: Any) -> str:
+	"""Name the scheduler keeps the budgets of a chat model under"""
+	return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
@@ -5,8 +5,10 @@ import json
 import logging
 import re
 import time
+from contextlib import nullcontext
+from functools import cache
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, TypeVar
 
 from dotenv import load_dotenv
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -23,6 +25,8 @@ from browser_use.agent.gif import create_history_gif
 from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
 from browser_use.agent.message_manager.utils import convert_input_messages, extract_json_from_model_output, save_conversation
 from browser_use.agent.prompts import AgentMessagePrompt, PlannerPrompt, SystemPrompt
+from browser_use.agent.scheduler import LLMScheduler, get_model_name
+from browser_use.agent.storage import HistoryWriter, ScreenshotStore, iter_history_file
 from browser_use.agent.views import (
 	ActionResult,
 	AgentError,
@@ -55,6 +59,9 @@ from browser_use.utils import time_execution_async, time_execution_sync
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Chat models that take explicit cache_control breakpoints
+ANTHROPIC_CHAT_MODELS = {'ChatAnthropic', 'ChatAnthropicVertex'}
+
 
 def log_response(response: AgentOutput) -> None:
 	"""Utility function to log the model's response."""
@@ -74,6 +81,38 @@ def log_response(response: AgentOutput) -> None:
 
 
 Context = TypeVar('Context')
+T = TypeVar('T')
+
+
+@cache
+def _get_browser_use_version_and_source() -> tuple[str, str]:
+	"""Looked up once per process: it runs git, and every agent would otherwise wait for it"""
+	try:
+		# First check for repository-specific files
+		repo_files = ['.git', 'README.md', 'docs', 'examples']
+		package_root = Path(__file__).parent.parent.parent
+
+		# If all of these files/dirs exist, it's likely from git
+		if all(Path(package_root / file).exists() for file in repo_files):
+			try:
+				import subprocess
+
+				version = subprocess.check_output(['git', 'describe', '--tags']).decode('utf-8').strip()
+			except Exception:
+				version = 'unknown'
+			source = 'git'
+		else:
+			# If no repo files found, try getting version from pip
+			import pkg_resources
+
+			version = pkg_resources.get_distribution('browser-use').version
+			source = 'pip'
+	except Exception:
+		version = 'unknown'
+		source = 'unknown'
+
+	logger.debug(f'Version: {version}, Source: {source}')
+	return version, source
 
 
 class Agent(Generic[Context]):
@@ -106,6 +145,13 @@ class Agent(Generic[Context]):
 		validate_output: bool = False,
 		message_context: Optional[str] = None,
 		generate_gif: bool | str = False,
+		prompt_caching: bool = False,
+		compaction_threshold: Optional[float] = None,
+		state_delta: bool = False,
+		max_elements_tokens: Optional[int] = None,
+		compaction_llm: Optional[BaseChatModel] = None,
+		screenshot_store_path: Optional[str] = None,
+		save_history_path: Optional[str] = None,
 		available_file_paths: Optional[list[str]] = None,
 		include_attributes: list[str] = [
 			'title',
@@ -124,6 +170,11 @@ class Agent(Generic[Context]):
 		page_extraction_llm: Optional[BaseChatModel] = None,
 		planner_llm: Optional[BaseChatModel] = None,
 		planner_interval: int = 1,  # Run planner every N steps
+		# Limits the model calls running at the same time, shared by the agents of a batch
+		llm_semaphore: Optional[asyncio.Semaphore] = None,
+		# Budgets the model calls of all agents sharing it, see LLMScheduler. Lower priorities go first
+		llm_scheduler: Optional[LLMScheduler] = None,
+		llm_priority: float = 0,
 		# Inject state
 		injected_agent_state: Optional[AgentState] = None,
 		#
@@ -151,6 +202,12 @@ class Agent(Generic[Context]):
 			validate_output=validate_output,
 			message_context=message_context,
 			generate_gif=generate_gif,
+			prompt_caching=prompt_caching,
+			compaction_threshold=compaction_threshold,
+			state_delta=state_delta,
+			max_elements_tokens=max_elements_tokens,
+			screenshot_store_path=screenshot_store_path,
+			save_history_path=save_history_path,
 			available_file_paths=available_file_paths,
 			include_attributes=include_attributes,
 			max_actions_per_step=max_actions_per_step,
@@ -158,11 +215,19 @@ class Agent(Generic[Context]):
 			page_extraction_llm=page_extraction_llm,
 			planner_llm=planner_llm,
 			planner_interval=planner_interval,
+			compaction_llm=compaction_llm,
 		)
 
 		# Initialize state
 		self.state = injected_agent_state or AgentState()
 
+		self._last_cache_usage: tuple[int, int] = (0, 0)
+		self._screenshot_store = ScreenshotStore(screenshot_store_path) if screenshot_store_path else None
+		# A resumed run continues its history file, a new one starts it over
+		self._history_writer = (
+			HistoryWriter(save_history_path, append=bool(self.state.history.history)) if save_history_path else None
+		)
+
 		# Action setup
 		self._setup_action_models()
 		self._set_browser_use_version_and_source()
@@ -188,12 +253,19 @@ class Agent(Generic[Context]):
 			).get_system_message(),
 			settings=MessageManagerSettings(
 				max_input_tokens=self.settings.max_input_tokens,
+				model_name=self.model_name,
+				# OpenAI caches stable prefixes on its own, Anthropic needs explicit breakpoints
+				prompt_caching=self.settings.prompt_caching and self.chat_model_library in ANTHROPIC_CHAT_MODELS,
+				compaction_threshold=self.settings.compaction_threshold,
+				state_delta=self.settings.state_delta,
+				max_elements_tokens=self.settings.max_elements_tokens,
 				include_attributes=self.settings.include_attributes,
 				message_context=self.settings.message_context,
 				sensitive_data=sensitive_data,
 				available_file_paths=self.settings.available_file_paths,
 			),
 			state=self.state.message_manager_state,
+			summarizer_llm=self.settings.compaction_llm,
 		)
 
 		# Browser setup
@@ -216,6 +288,10 @@ class Agent(Generic[Context]):
 		# Context
 		self.context = context
 
+		self.llm_semaphore = llm_semaphore
+		self.llm_scheduler = llm_scheduler
+		self.llm_priority = llm_priority
+
 		# Telemetry
 		self.telemetry = ProductTelemetry()
 
@@ -232,33 +308,7 @@ class Agent(Generic[Context]):
 
 	def _set_browser_use_version_and_source(self) -> None:
 		"""Get the version and source of the browser-use package (git or pip in a nutshell)"""
-		try:
-			# First check for repository-specific files
-			repo_files = ['.git', 'README.md', 'docs', 'examples']
-			package_root = Path(__file__).parent.parent.parent
-
-			# If all of these files/dirs exist, it's likely from git
-			if all(Path(package_root / file).exists() for file in repo_files):
-				try:
-					import subprocess
-
-					version = subprocess.check_output(['git', 'describe', '--tags']).decode('utf-8').strip()
-				except Exception:
-					version = 'unknown'
-				source = 'git'
-			else:
-				# If no repo files found, try getting version from pip
-				import pkg_resources
-
-				version = pkg_resources.get_distribution('browser-use').version
-				source = 'pip'
-		except Exception:
-			version = 'unknown'
-			source = 'unknown'
-
-		logger.debug(f'Version: {version}, Source: {source}')
-		self.version = version
-		self.source = source
+		self.version, self.source = _get_browser_use_version_and_source()
 
 	def _set_model_names(self) -> None:
 		self.chat_model_library = self.llm.__class__.__name__
@@ -330,12 +380,14 @@ class Agent(Generic[Context]):
 		result: list[ActionResult] = []
 		step_start_time = time.time()
 		tokens = 0
+		self._last_cache_usage = (0, 0)
 
 		try:
 			state = await self.browser_context.get_state()
 
 			await self._raise_if_stopped_or_paused()
 
+			await self._message_manager.compact_history(invoke_llm=self._invoke_llm)
 			self._message_manager.add_state_message(state, self.state.last_result, step_info, self.settings.use_vision)
 
 			# Run planner at specified intervals if planner is configured
@@ -421,8 +473,10 @@ class Agent(Generic[Context]):
 					step_start_time=step_start_time,
 					step_end_time=step_end_time,
 					input_tokens=tokens,
+					cached_input_tokens=self._last_cache_usage[0],
+					cache_creation_input_tokens=self._last_cache_usage[1],
 				)
-				self._make_history_item(model_output, state, result, metadata)
+				await self._make_history_item(model_output, state, result, metadata)
 
 	@time_execution_async('--handle_step_error (agent)')
 	async def _handle_step_error(self, error: Exception) -> list[ActionResult]:
@@ -451,7 +505,9 @@ class Agent(Generic[Context]):
 
 			if isinstance(error, RateLimitError) or isinstance(error, ResourceExhausted):
 				logger.warning(f'{prefix}{error_msg}')
-				await asyncio.sleep(self.settings.retry_delay)
+				# The scheduler already waited as long as the provider asked, and retried
+				if self.llm_scheduler is None:
+					await asyncio.sleep(self.settings.retry_delay)
 				self.state.consecutive_failures += 1
 			else:
 				logger.error(f'{prefix}{error_msg}')
@@ -459,7 +515,7 @@ class Agent(Generic[Context]):
 
 		return [ActionResult(error=error_msg, include_in_memory=True)]
 
-	def _make_history_item(
+	async def _make_history_item(
 		self,
 		model_output: AgentOutput | None,
 		state: BrowserState,
@@ -473,17 +529,27 @@ class Agent(Generic[Context]):
 		else:
 			interacted_elements = [None]
 
+		# Keep only a reference to the screenshot if it is written to disk. Decoding, hashing and writing it,
+		# like serializing and writing the history line below, run in a thread, so they do not hold up the
+		# other agents of the event loop.
+		screenshot, screenshot_path = state.screenshot, None
+		if self._screenshot_store is not None and screenshot is not None:
+			screenshot, screenshot_path = None, await asyncio.to_thread(self._screenshot_store.put, screenshot)
+
 		state_history = BrowserStateHistory(
 			url=state.url,
 			title=state.title,
 			tabs=state.tabs,
 			interacted_element=interacted_elements,
-			screenshot=state.screenshot,
+			screenshot=screenshot,
+			screenshot_path=screenshot_path,
 		)
 
 		history_item = AgentHistory(model_output=model_output, result=result, state=state_history, metadata=metadata)
 
 		self.state.history.history.append(history_item)
+		if self._history_writer is not None:
+			await asyncio.to_thread(self._history_writer.append, history_item)
 
 	THINK_TAGS = re.compile(r'<think>.*?</think>', re.DOTALL)
 
@@ -504,8 +570,9 @@ class Agent(Generic[Context]):
 		input_messages = self._convert_input_messages(input_messages)
 
 		if self.tool_calling_method == 'raw':
-			output = self.llm.invoke(input_messages)
-			# TODO: currently invoke does not return reasoning_content, we should override invoke
+			output = await self._invoke_llm(lambda: self.llm.ainvoke(input_messages), self.llm)
+			self._record_cache_usage(output)
+			# TODO: currently ainvoke does not return reasoning_content, we should override ainvoke
 			output.content = self._remove_think_tags(str(output.content))
 			try:
 				parsed_json = extract_json_from_model_output(output.content)
@@ -516,11 +583,13 @@ class Agent(Generic[Context]):
 
 		elif self.tool_calling_method is None:
 			structured_llm = self.llm.with_structured_output(self.AgentOutput, include_raw=True)
-			response: dict[str, Any] = await structured_llm.ainvoke(input_messages)  # type: ignore
+			response: dict[str, Any] = await self._invoke_llm(lambda: structured_llm.ainvoke(input_messages), self.llm)  # type: ignore
+			self._record_cache_usage(response['raw'])
 			parsed: AgentOutput | None = response['parsed']
 		else:
 			structured_llm = self.llm.with_structured_output(self.AgentOutput, include_raw=True, method=self.tool_calling_method)
-			response: dict[str, Any] = await structured_llm.ainvoke(input_messages)  # type: ignore
+			response: dict[str, Any] = await self._invoke_llm(lambda: structured_llm.ainvoke(input_messages), self.llm)  # type: ignore
+			self._record_cache_usage(response['raw'])
 			parsed: AgentOutput | None = response['parsed']
 
 		if parsed is None:
@@ -534,6 +603,34 @@ class Agent(Generic[Context]):
 
 		return parsed
 
+	def _llm_slot(self) -> AsyncContextManager:
+		"""Wait for a free model call slot, if the agent shares a limit with others"""
+		return self.llm_semaphore if self.llm_semaphore is not None else nullcontext()
+
+	async def _invoke_llm(self, invoke: Callable[[], Awaitable[T]], llm: BaseChatModel) -> T:
+		"""Call the model through the shared concurrency limit and scheduler, if the agent has them"""
+		# The concurrency slot is taken first, so that a call granted by the scheduler does not hold its
+		# slot and budget there while it waits for one
+		async with self._llm_slot():
+			if self.llm_scheduler is None:
+				return await invoke()
+			# Keyed like `extract_content`, so that all the calls to one model share its budget
+			return await self.llm_scheduler.call(
+				get_model_name(llm),
+				invoke,
+				tokens=self._message_manager.state.history.current_tokens,
+				priority=self.llm_priority,
+				progress=self.state.n_steps,
+			)
+
+	def _record_cache_usage(self, raw_message: Any) -> None:
+		"""Keep the prompt cache hits the provider reported for the last model call"""
+		usage = getattr(raw_message, 'usage_metadata', None) or {}
+		details = usage.get('input_token_details') or {}
+		self._last_cache_usage = (details.get('cache_read') or 0, details.get('cache_creation') or 0)
+		if self._last_cache_usage[0]:
+			logger.debug(f'Prompt cache hit: {self._last_cache_usage[0]}/{usage.get("input_tokens")} input tokens')
+
 	def _log_agent_run(self) -> None:
 		"""Log the agent run"""
 		logger.info(f'🚀 Starting task: {self.task}')
@@ -578,6 +675,7 @@ class Agent(Generic[Context]):
 		"""Execute the task with maximum number of steps"""
 		try:
 			self._log_agent_run()
+			await self._message_manager.load_token_counter()
 
 			# Execute initial actions if provided
 			if self.initial_actions:
@@ -639,7 +737,8 @@ class Agent(Generic[Context]):
 				if isinstance(self.settings.generate_gif, str):
 					output_path = self.settings.generate_gif
 
-				create_history_gif(task=self.task, history=self.state.history, output_path=output_path)
+				# Rendering is CPU bound, keep it off the event loop
+				await asyncio.to_thread(create_history_gif, task=self.task, history=self.state.history, output_path=output_path)
 
 	# @observe(name='controller.multi_act')
 	@time_execution_async('--multi-act (agent)')
@@ -676,6 +775,7 @@ class Agent(Generic[Context]):
 				self.sensitive_data,
 				self.settings.available_file_paths,
 				context=self.context,
+				llm_scheduler=self.llm_scheduler,
 			)
 
 			results.append(result)
@@ -723,7 +823,7 @@ class Agent(Generic[Context]):
 			reason: str
 
 		validator = self.llm.with_structured_output(ValidationResult, include_raw=True)
-		response: dict[str, Any] = await validator.ainvoke(msg)  # type: ignore
+		response: dict[str, Any] = await self._invoke_llm(lambda: validator.ainvoke(msg), self.llm)  # type: ignore
 		parsed: ValidationResult = response['parsed']
 		is_valid = parsed.is_valid
 		if not is_valid:
@@ -747,7 +847,7 @@ class Agent(Generic[Context]):
 
 	async def rerun_history(
 		self,
-		history: AgentHistoryList,
+		history: AgentHistoryList | Iterable[AgentHistory],
 		max_retries: int = 3,
 		skip_failures: bool = True,
 		delay_between_actions: float = 2.0,
@@ -756,7 +856,7 @@ class Agent(Generic[Context]):
 		Rerun a saved history of actions with error handling and retry logic.
 
 		Args:
-				history: The history to replay
+				history: The history to replay, or an iterable of its steps, e.g. streamed from a JSONL file
 				max_retries: Maximum number of retries per action
 				skip_failures: Whether to skip failed actions or stop execution
 				delay_between_actions: Delay between actions in seconds
@@ -771,9 +871,12 @@ class Agent(Generic[Context]):
 
 		results = []
 
-		for i, history_item in enumerate(history.history):
+		steps = history.history if isinstance(history, AgentHistoryList) else history
+		total = f'/{len(steps)}' if isinstance(steps, list) else ''
+
+		for i, history_item in enumerate(steps):
 			goal = history_item.model_output.current_state.next_goal if history_item.model_output else ''
-			logger.info(f'Replaying step {i + 1}/{len(history.history)}: goal: {goal}')
+			logger.info(f'Replaying step {i + 1}{total}: goal: {goal}')
 
 			if (
 				not history_item.model_output
@@ -840,7 +943,7 @@ class Agent(Generic[Context]):
 		if not historical_element or not current_state.element_tree:
 			return action
 
-		current_element = HistoryTreeProcessor.find_history_element_in_tree(historical_element, current_state.element_tree)
+		current_element = HistoryTreeProcessor.find_history_element_in_index(historical_element, current_state.hash_index)
 
 		if not current_element or current_element.highlight_index is None:
 			return None
@@ -857,11 +960,13 @@ class Agent(Generic[Context]):
 		Load history from file and rerun it.
 
 		Args:
-				history_file: Path to the history file
+				history_file: Path to the history file. JSONL files are replayed step by step as they are read.
 				**kwargs: Additional arguments passed to rerun_history
 		"""
 		if not history_file:
 			history_file = 'AgentHistory.json'
+		if Path(history_file).suffix == '.jsonl':
+			return await self.rerun_history(iter_history_file(history_file, self.AgentOutput), **kwargs)
 		history = AgentHistoryList.load_from_file(history_file, self.AgentOutput)
 		return await self.rerun_history(history, **kwargs)
 
@@ -938,7 +1043,8 @@ class Agent(Generic[Context]):
 		planner_messages = convert_input_messages(planner_messages, self.planner_model_name)
 
 		# Get planner output
-		response = await self.settings.planner_llm.ainvoke(planner_messages)
+		planner_llm = self.settings.planner_llm
+		response = await self._invoke_llm(lambda: planner_llm.ainvoke(planner_messages), planner_llm)
 		plan = str(response.content)
 		# if deepseek-reasoner, remove think tags
 		if self.planner_model_name == 'deepseek-reasoner':
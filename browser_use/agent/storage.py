@@ -0,0 +1,79 @@
+"""
+On-disk storage of the agent history, so long runs do not keep it all in memory.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, Type
+
+from browser_use.agent.views import AgentHistory, AgentOutput
+from browser_use.browser.screenshot import image_mime_type
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {'image/png': '.png', 'image/jpeg': '.jpg', 'image/webp': '.webp'}
+
+
+class ScreenshotStore:
+	"""
+	Content-addressed directory of screenshots: `<directory>/<first 2 hex digits>/<sha256>.<ext>`.
+
+	Identical screenshots, e.g. of steps that did not change the page, are stored once.
+	"""
+
+	def __init__(self, directory: str | Path):
+		self.directory = Path(directory)
+
+	def put(self, screenshot_b64: str) -> str:
+		"""Write a base64 encoded screenshot and return its path"""
+		image = base64.b64decode(screenshot_b64)
+		digest = hashlib.sha256(image).hexdigest()
+		path = self.directory / digest[:2] / f'{digest}{_EXTENSIONS[image_mime_type(screenshot_b64)]}'
+
+		if not path.exists():
+			path.parent.mkdir(parents=True, exist_ok=True)
+			# Write to a temporary file first, so that a crash never leaves a truncated blob under the final name
+			tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+			tmp_path.write_bytes(image)
+			os.replace(tmp_path, path)
+
+		return str(path)
+
+
+class HistoryWriter:
+	"""
+	Append-only JSONL history: one line per step, flushed as soon as the step is recorded.
+
+	A run that crashes loses at most the step it was writing, and a partly written last line is
+	skipped when reading the file back. The file holds the steps of one run: it is truncated when the
+	writer is created, unless `append` continues the history of a resumed run.
+	"""
+
+	def __init__(self, path: str | Path, append: bool = False):
+		self.path = Path(path)
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		if not append:
+			self.path.write_text('', encoding='utf-8')
+
+	def append(self, item: AgentHistory) -> None:
+		line = json.dumps(item.model_dump(), separators=(',', ':'))
+		with open(self.path, 'a', encoding='utf-8') as f:
+			f.write(line + '\n')
+
+
+def iter_history_file(path: str | Path, output_model: Type[AgentOutput]) -> Iterator[AgentHistory]:
+	"""Read a JSONL history one step at a time, without loading the whole file"""
+	with open(path, 'r', encoding='utf-8') as f:
+		for line_number, line in enumerate(f, 1):
+			if not line.strip():
+				continue
+			try:
+				data = json.loads(line)
+			except json.JSONDecodeError:
+				logger.warning(f'Skipping unreadable line {line_number} of {path}, the run probably stopped while writing it')
+				continue
+			yield AgentHistory.load_from_dict(data, output_model)
@@ -4,8 +4,9 @@ import json
 import traceback
 import uuid
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Type
+from typing import Any, Dict, Iterator, List, Literal, Optional, Type
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from openai import RateLimitError
@@ -37,6 +38,12 @@ class AgentSettings(BaseModel):
 	validate_output: bool = False
 	message_context: Optional[str] = None
 	generate_gif: bool | str = False
+	prompt_caching: bool = False
+	compaction_threshold: Optional[float] = None
+	state_delta: bool = False
+	max_elements_tokens: Optional[int] = None
+	screenshot_store_path: Optional[str] = None
+	save_history_path: Optional[str] = None
 	available_file_paths: Optional[list[str]] = None
 	override_system_message: Optional[str] = None
 	extend_system_message: Optional[str] = None
@@ -58,6 +65,7 @@ class AgentSettings(BaseModel):
 	page_extraction_llm: Optional[BaseChatModel] = None
 	planner_llm: Optional[BaseChatModel] = None
 	planner_interval: int = 1  # Run planner every N steps
+	compaction_llm: Optional[BaseChatModel] = None
 
 
 class AgentState(BaseModel):
@@ -105,6 +113,9 @@ class StepMetadata(BaseModel):
 	step_end_time: float
 	input_tokens: int  # Approximate tokens from message manager for this step
 	step_number: int
+	# Input tokens the provider read from / wrote to its prompt cache, as reported in the response
+	cached_input_tokens: int = 0
+	cache_creation_input_tokens: int = 0
 
 	@property
 	def duration_seconds(self) -> float:
@@ -136,6 +147,7 @@ class AgentOutput(BaseModel):
 	)
 
 	@staticmethod
+	@lru_cache(maxsize=128)
 	def type_with_custom_actions(custom_actions: Type[ActionModel]) -> Type['AgentOutput']:
 		"""Extend actions with custom actions"""
 		model_ = create_model(
@@ -173,6 +185,18 @@ class AgentHistory(BaseModel):
 				elements.append(None)
 		return elements
 
+	@classmethod
+	def load_from_dict(cls, data: dict[str, Any], output_model: Type[AgentOutput]) -> 'AgentHistory':
+		"""Validate a serialized history item, with the output model that knows the custom actions"""
+		if data['model_output']:
+			if isinstance(data['model_output'], dict):
+				data['model_output'] = output_model.model_validate(data['model_output'])
+			else:
+				data['model_output'] = None
+		if 'interacted_element' not in data['state']:
+			data['state']['interacted_element'] = None
+		return cls.model_validate(data)
+
 	def model_dump(self, **kwargs) -> Dict[str, Any]:
 		"""Custom serialization handling circular references"""
 
@@ -218,6 +242,10 @@ class AgentHistoryList(BaseModel):
 				total += h.metadata.input_tokens
 		return total
 
+	def total_cached_input_tokens(self) -> int:
+		"""Get the input tokens served from the provider's prompt cache across all steps"""
+		return sum(h.metadata.cached_input_tokens for h in self.history if h.metadata)
+
 	def input_token_usage(self) -> list[int]:
 		"""Get token usage for each step"""
 		return [h.metadata.input_tokens for h in self.history if h.metadata]
@@ -231,9 +259,15 @@ class AgentHistoryList(BaseModel):
 		return self.__str__()
 
 	def save_to_file(self, filepath: str | Path) -> None:
-		"""Save history to JSON file with proper serialization"""
+		"""Save history to JSON file with proper serialization, or to one line per step if the file ends with .jsonl"""
 		try:
 			Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+			if Path(filepath).suffix == '.jsonl':
+				with open(filepath, 'w', encoding='utf-8') as f:
+					for h in self.history:
+						f.write(json.dumps(h.model_dump(), separators=(',', ':')) + '\n')
+				return
+
 			data = self.model_dump()
 			with open(filepath, 'w', encoding='utf-8') as f:
 				json.dump(data, f, indent=2)
@@ -248,20 +282,17 @@ class AgentHistoryList(BaseModel):
 
 	@classmethod
 	def load_from_file(cls, filepath: str | Path, output_model: Type[AgentOutput]) -> 'AgentHistoryList':
-		"""Load history from JSON file"""
+		"""Load history from a JSON file, or from a JSONL file written step by step with `Agent(save_history_path=...)`"""
+		if Path(filepath).suffix == '.jsonl':
+			from browser_use.agent.storage import iter_history_file
+
+			return cls(history=list(iter_history_file(filepath, output_model)))
+
 		with open(filepath, 'r', encoding='utf-8') as f:
 			data = json.load(f)
 		# loop through history and validate output_model actions to enrich with custom actions
-		for h in data['history']:
-			if h['model_output']:
-				if isinstance(h['model_output'], dict):
-					h['model_output'] = output_model.model_validate(h['model_output'])
-				else:
-					h['model_output'] = None
-			if 'interacted_element' not in h['state']:
-				h['state']['interacted_element'] = None
-		history = cls.model_validate(data)
-		return history
+		history = [AgentHistory.load_from_dict(h, output_model) for h in data['history']]
+		return cls(history=history)
 
 	def last_action(self) -> None | dict:
 		"""Last action in history"""
@@ -310,7 +341,12 @@ class AgentHistoryList(BaseModel):
 
 	def screenshots(self) -> list[str | None]:
 		"""Get all screenshots from history"""
-		return [h.state.screenshot if h.state.screenshot is not None else None for h in self.history]
+		return list(self.iter_screenshots())
+
+	def iter_screenshots(self) -> Iterator[str | None]:
+		"""Get the screenshots one at a time, without loading the ones stored on disk all at once"""
+		for h in self.history:
+			yield h.state.get_screenshot()
 
 	def action_names(self) -> list[str]:
 		"""Get all action names from history"""
@@ -3,7 +3,6 @@ Playwright browser on steroids.
 """
 
 import asyncio
-import gc
 import logging
 from dataclasses import dataclass, field
 
@@ -238,8 +237,6 @@ class Browser:
 			self.playwright_browser = None
 			self.playwright = None
 
-			gc.collect()
-
 	def __del__(self):
 		"""Async cleanup when object is destroyed"""
 		try:
@@ -4,15 +4,16 @@ Playwright browser on steroids.
 
 import asyncio
 import base64
-import gc
 import json
 import logging
 import os
 import re
 import time
 import uuid
+import weakref
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Optional, TypedDict
+from typing import TYPE_CHECKING, Awaitable, Literal, Optional, TypedDict, TypeVar
+from urllib.parse import urlparse
 
 from playwright._impl._errors import TimeoutError
 from playwright.async_api import Browser as PlaywrightBrowser
@@ -23,8 +24,12 @@ from playwright.async_api import (
 	ElementHandle,
 	FrameLocator,
 	Page,
+	Request,
 )
 
+from browser_use.browser.memory import MemoryManager, MemoryPolicy
+from browser_use.browser.network import NetworkActivityTracker
+from browser_use.browser.screenshot import ScreenshotFormat, needs_reencoding, reencode_screenshot
 from browser_use.browser.views import (
 	BrowserError,
 	BrowserState,
@@ -40,6 +45,8 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 
 class BrowserContextWindowSize(TypedDict):
 	width: int
@@ -107,6 +114,48 @@ class BrowserContextConfig:
 
 	    include_dynamic_attributes: bool = True
 	        Include dynamic attributes in the CSS selector. If you want to reuse the css_selectors, it might be better to set this to False.
+
+	    incremental_dom_extraction: False
+	        Keep the DOM extractor installed in the page and only rebuild the parts of the DOM that changed since the last step
+	        (tracked with a MutationObserver). Scrolling, resizing or navigating triggers a full extraction.
+	        Highlight indices stay stable while the page is not reloaded.
+
+	    dom_wire_format: 'json'
+	        Format in which the DOM extractor returns the nodes from the page. 'columnar' sends parallel arrays with a shared
+	        string table, which is smaller and faster to decode on large pages. 'json' sends one object per node.
+
+	    memory_policy: 'never'
+	        When to run a garbage collection after a step: 'never', 'every_n_steps' or 'rss_threshold'.
+	        Collections run in a worker thread and are shared by all contexts of the process.
+	        See browser_use.browser.memory.get_memory_metrics for pause times.
+
+	    gc_every_n_steps: 10
+	        Number of steps between collections with memory_policy='every_n_steps'
+
+	    gc_rss_threshold_mb: 2048
+	        Resident memory of the process above which a collection runs with memory_policy='rss_threshold'
+
+	    gc_rss_growth_mb: 256
+	        Growth of the resident memory since the last collection after which another one runs, while still above
+	        gc_rss_threshold_mb
+
+	    screenshot_format: 'png'
+	        Format of the screenshots sent to the LLM and kept in the history: 'png', 'jpeg' or 'webp'.
+	        WebP and the maximum dimensions need Pillow, without it the screenshot stays a PNG of the original size.
+
+	    screenshot_quality: None
+	        Quality (0-100) of 'jpeg' and 'webp' screenshots
+
+	    screenshot_max_width: None
+	    screenshot_max_height: None
+	        Downscale screenshots to fit in these dimensions, keeping the aspect ratio
+
+	    screenshot_scale: 'device'
+	        'css' captures one pixel per CSS pixel instead of per device pixel, which is 4 times smaller on HiDPI screens
+
+	    skip_unchanged_screenshots: False
+	        Mark the state as visually unchanged when the screenshot is identical to the one of the previous state.
+	        The agent then keeps the image in one history message and sends a short note referring to it instead.
 	"""
 
 	cookies_file: str | None = None
@@ -132,6 +181,19 @@ class BrowserContextConfig:
 	viewport_expansion: int = 500
 	allowed_domains: list[str] | None = None
 	include_dynamic_attributes: bool = True
+	incremental_dom_extraction: bool = False
+	dom_wire_format: Literal['json', 'columnar'] = 'json'
+	memory_policy: MemoryPolicy = 'never'
+	gc_every_n_steps: int = 10
+	gc_rss_threshold_mb: int = 2048
+	gc_rss_growth_mb: int = 256
+
+	screenshot_format: ScreenshotFormat = 'png'
+	screenshot_quality: int | None = None
+	screenshot_max_width: int | None = None
+	screenshot_max_height: int | None = None
+	screenshot_scale: Literal['css', 'device'] = 'device'
+	skip_unchanged_screenshots: bool = False
 
 	_force_keep_context_alive: bool = False
 
@@ -169,6 +231,25 @@ class BrowserContext:
 		# Initialize these as None - they'll be set up when needed
 		self.session: BrowserSession | None = None
 
+		# DOM services per page, only used for incremental DOM extraction
+		self._dom_services: weakref.WeakKeyDictionary[Page, DomService] = weakref.WeakKeyDictionary()
+
+		# Network activity per page, kept across steps
+		self._network_trackers: weakref.WeakKeyDictionary[Page, NetworkActivityTracker] = weakref.WeakKeyDictionary()
+
+		# Origins of the documents loaded in this context, whose storage `fast_reset` clears
+		self._visited_origins: set[str] = set()
+
+		# Monotonic time at which the last action started, the page only counts as idle after it
+		self._action_started_at: Optional[float] = None
+
+		self.memory_manager = MemoryManager(
+			policy=config.memory_policy,
+			every_n_steps=config.gc_every_n_steps,
+			rss_threshold_mb=config.gc_rss_threshold_mb,
+			rss_growth_mb=config.gc_rss_growth_mb,
+		)
+
 	async def __aenter__(self):
 		"""Async context manager entry"""
 		await self._initialize_session()
@@ -196,6 +277,13 @@ class BrowserContext:
 					logger.debug(f'Failed to remove CDP listener: {e}')
 				self._page_event_handler = None
 
+			# The Playwright context can outlive this one (e.g. the shared context of a CDP browser)
+			try:
+				self.session.context.remove_listener('page', self._get_network_tracker)
+				self.session.context.remove_listener('request', self._record_origin)
+			except Exception as e:
+				logger.debug(f'Failed to remove network listeners: {e}')
+
 			await self.save_cookies()
 
 			if self.config.trace_path:
@@ -226,7 +314,6 @@ class BrowserContext:
 					asyncio.run(self.session.context._impl_obj.close())
 
 				self.session = None
-				gc.collect()
 			except Exception as e:
 				logger.warning(f'Failed to force close browser context: {e}')
 
@@ -247,6 +334,12 @@ class BrowserContext:
 			cached_state=None,
 		)
 
+		# Track the network activity of every page from its creation
+		for page in pages:
+			self._get_network_tracker(page)
+		context.on('page', self._get_network_tracker)
+		context.on('request', self._record_origin)
+
 		active_page = None
 		if self.browser.config.cdp_url:
 			# If we have a saved target ID, try to find and activate it
@@ -286,6 +379,7 @@ class BrowserContext:
 
 	def _add_new_page_listener(self, context: PlaywrightBrowserContext):
 		async def on_page(page: Page):
+			self._get_network_tracker(page)
 			if self.browser.config.cdp_url:
 				await page.reload()  # Reload the page to avoid timeout errors
 			await page.wait_for_load_state()
@@ -331,12 +425,7 @@ class BrowserContext:
 		if self.config.trace_path:
 			await context.tracing.start(screenshots=True, snapshots=True, sources=True)
 
-		# Load cookies if they exist
-		if self.config.cookies_file and os.path.exists(self.config.cookies_file):
-			with open(self.config.cookies_file, 'r') as f:
-				cookies = json.load(f)
-				logger.info(f'Loaded {len(cookies)} cookies from {self.config.cookies_file}')
-				await context.add_cookies(cookies)
+		await self._load_cookies(context)
 
 		# Expose anti-detection scripts
 		await context.add_init_script(
@@ -377,172 +466,43 @@ class BrowserContext:
 
 		return context
 
-	async def _wait_for_stable_network(self):
-		page = await self.get_current_page()
-
-		pending_requests = set()
-		last_activity = asyncio.get_event_loop().time()
-
-		# Define relevant resource types and content types
-		RELEVANT_RESOURCE_TYPES = {
-			'document',
-			'stylesheet',
-			'image',
-			'font',
-			'script',
-			'iframe',
-		}
-
-		RELEVANT_CONTENT_TYPES = {
-			'text/html',
-			'text/css',
-			'application/javascript',
-			'image/',
-			'font/',
-			'application/json',
-		}
-
-		# Additional patterns to filter out
-		IGNORED_URL_PATTERNS = {
-			# Analytics and tracking
-			'analytics',
-			'tracking',
-			'telemetry',
-			'beacon',
-			'metrics',
-			# Ad-related
-			'doubleclick',
-			'adsystem',
-			'adserver',
-			'advertising',
-			# Social media widgets
-			'facebook.com/plugins',
-			'platform.twitter',
-			'linkedin.com/embed',
-			# Live chat and support
-			'livechat',
-			'zendesk',
-			'intercom',
-			'crisp.chat',
-			'hotjar',
-			# Push notifications
-			'push-notifications',
-			'onesignal',
-			'pushwoosh',
-			# Background sync/heartbeat
-			'heartbeat',
-			'ping',
-			'alive',
-			# WebRTC and streaming
-			'webrtc',
-			'rtmp://',
-			'wss://',
-			# Common CDNs for dynamic content
-			'cloudfront.net',
-			'fastly.net',
-		}
-
-		async def on_request(request):
-			# Filter by resource type
-			if request.resource_type not in RELEVANT_RESOURCE_TYPES:
-				return
-
-			# Filter out streaming, websocket, and other real-time requests
-			if request.resource_type in {
-				'websocket',
-				'media',
-				'eventsource',
-				'manifest',
-				'other',
-			}:
-				return
-
-			# Filter out by URL patterns
-			url = request.url.lower()
-			if any(pattern in url for pattern in IGNORED_URL_PATTERNS):
-				return
-
-			# Filter out data URLs and blob URLs
-			if url.startswith(('data:', 'blob:')):
-				return
-
-			# Filter out requests with certain headers
-			headers = request.headers
-			if headers.get('purpose') == 'prefetch' or headers.get('sec-fetch-dest') in [
-				'video',
-				'audio',
-			]:
-				return
-
-			nonlocal last_activity
-			pending_requests.add(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request started: {request.url} ({request.resource_type})')
-
-		async def on_response(response):
-			request = response.request
-			if request not in pending_requests:
-				return
-
-			# Filter by content type if available
-			content_type = response.headers.get('content-type', '').lower()
-
-			# Skip if content type indicates streaming or real-time data
-			if any(
-				t in content_type
-				for t in [
-					'streaming',
-					'video',
-					'audio',
-					'webm',
-					'mp4',
-					'event-stream',
-					'websocket',
-					'protobuf',
-				]
-			):
-				pending_requests.remove(request)
-				return
-
-			# Only process relevant content types
-			if not any(ct in content_type for ct in RELEVANT_CONTENT_TYPES):
-				pending_requests.remove(request)
-				return
-
-			# Skip if response is too large (likely not essential for page load)
-			content_length = response.headers.get('content-length')
-			if content_length and int(content_length) > 5 * 1024 * 1024:  # 5MB
-				pending_requests.remove(request)
-				return
+	async def _load_cookies(self, context: PlaywrightBrowserContext):
+		"""Load the cookies of `cookies_file` into the context, if it exists"""
+		if self.config.cookies_file and os.path.exists(self.config.cookies_file):
+			with open(self.config.cookies_file, 'r') as f:
+				cookies = json.load(f)
+				logger.info(f'Loaded {len(cookies)} cookies from {self.config.cookies_file}')
+				await context.add_cookies(cookies)
 
-			nonlocal last_activity
-			pending_requests.remove(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request resolved: {request.url} ({content_type})')
+	def _record_origin(self, request: Request):
+		if request.resource_type == 'document':
+			parsed_url = urlparse(request.url)
+			if parsed_url.scheme in ('http', 'https') and parsed_url.netloc:
+				self._visited_origins.add(f'{parsed_url.scheme}://{parsed_url.netloc}')
 
-		# Attach event listeners
-		page.on('request', on_request)
-		page.on('response', on_response)
+	def mark_action_start(self):
+		"""
+		Record that an action is about to run on the page.
 
-		try:
-			# Wait for idle time
-			start_time = asyncio.get_event_loop().time()
-			while True:
-				await asyncio.sleep(0.1)
-				now = asyncio.get_event_loop().time()
-				if len(pending_requests) == 0 and (now - last_activity) >= self.config.wait_for_network_idle_page_load_time:
-					break
-				if now - start_time > self.config.maximum_wait_page_load_time:
-					logger.debug(
-						f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(pending_requests)} '
-						f'pending requests: {[r.url for r in pending_requests]}'
-					)
-					break
+		Requests the action starts, a delayed navigation or fetch, may only show up after it returns.
+		Until the next action, the wait for the page load only counts the network as idle after this time.
+		"""
+		self._action_started_at = time.monotonic()
 
-		finally:
-			# Clean up event listeners
-			page.remove_listener('request', on_request)
-			page.remove_listener('response', on_response)
+	async def _wait_for_stable_network(self):
+		page = await self.get_current_page()
+		tracker = self._get_network_tracker(page)
+
+		if not await tracker.wait_for_idle(
+			idle_time=self.config.wait_for_network_idle_page_load_time,
+			timeout=self.config.maximum_wait_page_load_time,
+			since=self._action_started_at,
+		):
+			logger.debug(
+				f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(tracker.pending_requests)} '
+				f'pending requests: {[r.url for r in tracker.pending_requests]}'
+			)
+			return
 
 		logger.debug(f'Network stabilized for {self.config.wait_for_network_idle_page_load_time} seconds')
 
@@ -554,9 +514,18 @@ class BrowserContext:
 		"""
 		# Start timing
 		start_time = time.time()
+		minimum_wait = timeout_overwrite or self.config.minimum_wait_page_load_time
 
 		# Wait for page load
 		try:
+			# A page that has been quiet since the last action for longer than both waits does not need to be waited for
+			page = await self.get_current_page()
+			idle_time = self._get_network_tracker(page).idle_time(since=self._action_started_at)
+			if idle_time >= max(minimum_wait, self.config.wait_for_network_idle_page_load_time):
+				await self._check_and_handle_navigation(page)
+				logger.debug('--Page already idle, not waiting')
+				return
+
 			await self._wait_for_stable_network()
 
 			# Check if the loaded URL is allowed
@@ -570,7 +539,7 @@ class BrowserContext:
 
 		# Calculate remaining time to meet minimum WAIT_TIME
 		elapsed = time.time() - start_time
-		remaining = max((timeout_overwrite or self.config.minimum_wait_page_load_time) - elapsed, 0)
+		remaining = max(minimum_wait - elapsed, 0)
 
 		logger.debug(f'--Page loaded in {elapsed:.2f} seconds, waiting for additional {remaining:.2f} seconds')
 
@@ -751,6 +720,8 @@ class BrowserContext:
 		if self.config.cookies_file:
 			asyncio.create_task(self.save_cookies())
 
+		await self.memory_manager.on_step()
+
 		return session.cached_state
 
 	async def _update_state(self, focus_element: int = -1) -> BrowserState:
@@ -774,27 +745,57 @@ class BrowserContext:
 				raise BrowserError('Browser closed: no valid pages available')
 
 		try:
-			await self.remove_highlights()
-			dom_service = DomService(page)
-			content = await dom_service.get_clickable_elements(
-				focus_element=focus_element,
-				viewport_expansion=self.config.viewport_expansion,
-				highlight_elements=self.config.highlight_elements,
+			timings: dict[str, float] = {}
+			start = time.perf_counter()
+
+			async def capture_page():
+				# Removing the previous highlights, extracting the DOM and reading the scroll info and title
+				# is a single evaluate. The screenshot has to follow it to show the new highlights.
+				dom_service = self._get_dom_service(page)
+				snapshot = await self._timed(
+					timings,
+					'dom',
+					dom_service.get_page_snapshot(
+						focus_element=focus_element,
+						viewport_expansion=self.config.viewport_expansion,
+						highlight_elements=self.config.highlight_elements,
+						incremental=self.config.incremental_dom_extraction,
+						wire_format=self.config.dom_wire_format,
+						remove_highlights=True,
+					),
+				)
+				screenshot_b64 = await self._timed(timings, 'screenshot', self.take_screenshot())
+				return snapshot, screenshot_b64
+
+			# The tabs do not depend on the page content, fetch them while the page is captured
+			(snapshot, screenshot_b64), tabs = await asyncio.gather(
+				capture_page(),
+				self._timed(timings, 'tabs', self.get_tabs_info()),
 			)
+			timings['total'] = time.perf_counter() - start
 
-			screenshot_b64 = await self.take_screenshot()
-			pixels_above, pixels_below = await self.get_scroll_info(page)
+			# Identical encodings mean identical pixels. Reuse the previous string, so that the history
+			# does not keep another copy of the same image.
+			screenshot_unchanged = False
+			previous_state = getattr(self, 'current_state', None)
+			if self.config.skip_unchanged_screenshots and previous_state is not None:
+				if previous_state.screenshot is not None and previous_state.screenshot == screenshot_b64:
+					screenshot_b64 = previous_state.screenshot
+					screenshot_unchanged = True
 
 			self.current_state = BrowserState(
-				element_tree=content.element_tree,
-				selector_map=content.selector_map,
-				url=page.url,
-				title=await page.title(),
-				tabs=await self.get_tabs_info(),
+				element_tree=snapshot.dom_state.element_tree,
+				selector_map=snapshot.dom_state.selector_map,
+				url=snapshot.url,
+				title=snapshot.title,
+				tabs=tabs,
 				screenshot=screenshot_b64,
-				pixels_above=pixels_above,
-				pixels_below=pixels_below,
+				pixels_above=snapshot.pixels_above,
+				pixels_below=snapshot.pixels_below,
+				screenshot_unchanged=screenshot_unchanged,
+				timings=timings,
 			)
+			logger.debug(f'State captured in {timings["total"]:.2f}s: {timings}')
 
 			return self.current_state
 		except Exception as e:
@@ -804,6 +805,35 @@ class BrowserContext:
 				return self.current_state
 			raise
 
+	@staticmethod
+	async def _timed(timings: dict[str, float], phase: str, awaitable: Awaitable[T]) -> T:
+		"""Await and record how long it took under `phase`"""
+		start = time.perf_counter()
+		try:
+			return await awaitable
+		finally:
+			timings[phase] = time.perf_counter() - start
+
+	def _get_network_tracker(self, page: Page) -> NetworkActivityTracker:
+		"""Get the network tracker of a page, attaching one if the page was not seen being created"""
+		tracker = self._network_trackers.get(page)
+		if tracker is None:
+			tracker = NetworkActivityTracker()
+			tracker.attach(page)
+			self._network_trackers[page] = tracker
+		return tracker
+
+	def _get_dom_service(self, page: Page) -> DomService:
+		"""Get the DOM service for a page. Incremental extraction needs the same service across steps."""
+		if not self.config.incremental_dom_extraction:
+			return DomService(page)
+
+		dom_service = self._dom_services.get(page)
+		if dom_service is None:
+			dom_service = DomService(page)
+			self._dom_services[page] = dom_service
+		return dom_service
+
 	# region - Browser Actions
 	@time_execution_async('--take_screenshot')
 	async def take_screenshot(self, full_page: bool = False) -> str:
@@ -815,11 +845,27 @@ class BrowserContext:
 		await page.bring_to_front()
 		await page.wait_for_load_state()
 
+		image_format = self.config.screenshot_format
+		max_width, max_height = self.config.screenshot_max_width, self.config.screenshot_max_height
+		reencode = needs_reencoding(image_format, max_width, max_height)
+
+		# Let Playwright encode the final format when it can, otherwise capture a lossless PNG to re-encode
 		screenshot = await page.screenshot(
 			full_page=full_page,
 			animations='disabled',
+			type='png' if reencode or image_format == 'png' else 'jpeg',
+			quality=self.config.screenshot_quality if not reencode and image_format == 'jpeg' else None,
+			scale=self.config.screenshot_scale,
 		)
 
+		if reencode:
+			try:
+				screenshot = await asyncio.to_thread(
+					reencode_screenshot, screenshot, image_format, self.config.screenshot_quality, max_width, max_height
+				)
+			except ImportError:
+				logger.warning('Pillow is not installed, sending the screenshot as PNG. Install it with `pip install pillow`')
+
 		screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
 
 		# await self.remove_highlights()
@@ -1163,9 +1209,12 @@ class BrowserContext:
 		"""Get information about all tabs"""
 		session = await self.get_session()
 
+		pages = session.context.pages
+		titles = await asyncio.gather(*(page.title() for page in pages))
+
 		tabs_info = []
-		for page_id, page in enumerate(session.context.pages):
-			tab_info = TabInfo(page_id=page_id, url=page.url, title=await page.title())
+		for page_id, (page, title) in enumerate(zip(pages, titles)):
+			tab_info = TabInfo(page_id=page_id, url=page.url, title=title)
 			tabs_info.append(tab_info)
 
 		return tabs_info
@@ -1297,9 +1346,9 @@ class BrowserContext:
 
 	async def get_scroll_info(self, page: Page) -> tuple[int, int]:
 		"""Get scroll position information for the current page."""
-		scroll_y = await page.evaluate('window.scrollY')
-		viewport_height = await page.evaluate('window.innerHeight')
-		total_height = await page.evaluate('document.documentElement.scrollHeight')
+		scroll_y, viewport_height, total_height = await page.evaluate(
+			'() => [window.scrollY, window.innerHeight, document.documentElement.scrollHeight]'
+		)
 		pixels_above = scroll_y
 		pixels_below = total_height - (scroll_y + viewport_height)
 		return pixels_above, pixels_below
@@ -1318,6 +1367,76 @@ class BrowserContext:
 		session.cached_state = None
 		self.state.target_id = None
 
+	async def fast_reset(self, url: str = 'about:blank') -> Page:
+		"""Bring the context back to the state of a new one, without recreating it
+
+		Unlike `reset_context`, this also clears the cookies, permissions and the storage of every origin
+		visited since the last reset, and replaces the tabs with a single new one, so that nothing of a
+		previous task leaks into the next one. The cookies of `cookies_file` are loaded again.
+		"""
+		session = await self.get_session()
+		context = session.context
+
+		# Open the new tab first, so that the context always has a page
+		old_pages = list(context.pages)
+		page = await context.new_page()
+
+		# Close the pages of the previous task before clearing the storage, so that their scripts and
+		# unload handlers cannot write it again
+		for old_page in old_pages:
+			try:
+				await old_page.close()
+			except Exception as e:
+				logger.debug(f'Failed to close page: {e}')
+
+		await self._clear_storage(page)
+		await context.clear_cookies()
+		await context.clear_permissions()
+		await self._load_cookies(context)
+
+		if url != 'about:blank':
+			await page.goto(url)
+			await page.wait_for_load_state('load')
+
+		session.cached_state = None
+		self.state.target_id = None
+		self._visited_origins.clear()
+		if hasattr(self, 'current_state'):
+			del self.current_state
+		return page
+
+	async def _clear_storage(self, page: Page):
+		"""Clear the local storage, IndexedDB, cache storage and service workers of the visited origins"""
+		if not self._visited_origins:
+			return
+		try:
+			cdp_session = await page.context.new_cdp_session(page)
+		except Exception as e:
+			# Not Chromium: the storage of an origin can only be cleared from a page of that origin
+			logger.debug(f'Failed to open a CDP session to clear the storage: {e}')
+			return
+		try:
+			for origin in self._visited_origins:
+				await cdp_session.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+		except Exception as e:
+			logger.debug(f'Failed to clear the storage: {e}')
+		finally:
+			await cdp_session.detach()
+
+	async def is_healthy(self, timeout: float = 5.0) -> bool:
+		"""Whether the context has an open page that still answers within `timeout` seconds"""
+		if self.session is None:
+			return False
+		pages = [page for page in self.session.context.pages if not page.is_closed()]
+		if not pages:
+			return False
+		try:
+			await asyncio.wait_for(pages[-1].evaluate('1'), timeout)
+			return True
+		except Exception as e:
+			logger.debug(f'Browser context {self.context_id} is not healthy: {e}')
+			return False
+
 	async def _get_unique_filename(self, directory, filename):
 		"""Generate a unique filename by appending (1), (2), etc., if a file already exists."""
 		base, ext = os.path.splitext(filename)
@@ -0,0 +1,139 @@
+"""
+Opt-in garbage collection policy for browser contexts.
+
+Running a full `gc.collect()` on every step stalls the event loop for every agent in the process.
+The policy decides when a context may trigger a collection, and collections are shared process-wide:
+if one is already running, other contexts skip theirs instead of queueing up behind it.
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Literal, Optional
+
+logger = logging.getLogger(__name__)
+
+MemoryPolicy = Literal['never', 'every_n_steps', 'rss_threshold']
+
+
+@dataclass
+class MemoryMetrics:
+	"""Process-wide statistics of the collections triggered by the memory policy"""
+
+	collections: int = 0
+	skipped_collections: int = 0
+	objects_collected: int = 0
+	total_pause_seconds: float = 0.0
+	max_pause_seconds: float = 0.0
+	last_pause_seconds: float = 0.0
+	last_rss_bytes: Optional[int] = None
+
+
+_metrics = MemoryMetrics()
+_collection_lock = threading.Lock()
+
+
+def get_memory_metrics() -> MemoryMetrics:
+	"""Return a snapshot of the process-wide collection metrics"""
+	return replace(_metrics)
+
+
+def get_rss_bytes() -> Optional[int]:
+	"""Current resident set size of the process, or the peak one where the current one is not available"""
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError, IndexError, AttributeError):
+		pass
+
+	try:
+		import resource
+	except ImportError:
+		return None
+
+	max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+	return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class MemoryManager:
+	"""Decides after each step whether to run a garbage collection, according to the configured policy"""
+
+	def __init__(
+		self,
+		policy: MemoryPolicy = 'never',
+		every_n_steps: int = 10,
+		rss_threshold_mb: int = 2048,
+		rss_growth_mb: int = 256,
+	):
+		if policy not in ('never', 'every_n_steps', 'rss_threshold'):
+			raise ValueError(f'Unknown memory policy: {policy}')
+		if every_n_steps < 1:
+			raise ValueError('every_n_steps must be at least 1')
+
+		self.policy = policy
+		self.every_n_steps = every_n_steps
+		self.rss_threshold_bytes = rss_threshold_mb * 1024 * 1024
+		self.rss_growth_bytes = rss_growth_mb * 1024 * 1024
+		self.n_steps = 0
+		# Resident memory right after the last collection of this manager, above the threshold
+		self._rss_after_collection: Optional[int] = None
+
+	async def on_step(self) -> bool:
+		"""Count a step and collect if the policy asks for it. Returns whether a collection ran."""
+		self.n_steps += 1
+
+		if self.policy == 'never':
+			return False
+
+		if self.policy == 'every_n_steps':
+			if self.n_steps % self.every_n_steps != 0:
+				return False
+		elif self.policy == 'rss_threshold':
+			rss = get_rss_bytes()
+			_metrics.last_rss_bytes = rss
+			if rss is None or rss < self.rss_threshold_bytes:
+				self._rss_after_collection = None
+				return False
+			# A collection rarely brings the memory back under the threshold: collect again only once it has grown
+			if self._rss_after_collection is not None and rss < self._rss_after_collection + self.rss_growth_bytes:
+				return False
+
+			if not await collect():
+				return False
+			self._rss_after_collection = get_rss_bytes()
+			return True
+
+		return await collect()
+
+
+async def collect() -> bool:
+	"""
+	Run a full collection in a worker thread, unless one is already running in this process.
+
+	The collector still holds the GIL while it runs, but the calling coroutine does not block the
+	event loop while waiting for the thread, and concurrent callers do not stack up collections.
+	"""
+	if not _collection_lock.acquire(blocking=False):
+		_metrics.skipped_collections += 1
+		return False
+
+	try:
+		start = time.perf_counter()
+		collected = await asyncio.to_thread(gc.collect)
+		pause = time.perf_counter() - start
+	finally:
+		_collection_lock.release()
+
+	_metrics.collections += 1
+	_metrics.objects_collected += collected
+	_metrics.total_pause_seconds += pause
+	_metrics.last_pause_seconds = pause
+	_metrics.max_pause_seconds = max(_metrics.max_pause_seconds, pause)
+	logger.debug(f'Garbage collection freed {collected} objects in {pause:.3f} seconds')
+	return True
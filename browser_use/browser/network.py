@@ -0,0 +1,291 @@
+"""
+Long-lived tracking of the network activity of a page.
+
+A tracker is attached once per page, so requests that started before a step are known when the step waits
+for the page to load, and a page that has been quiet for long enough does not need to be waited for at all.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import weakref
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+	from playwright.async_api import Page, Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Requests that the page load waits for
+RELEVANT_RESOURCE_TYPES = {
+	'document',
+	'stylesheet',
+	'image',
+	'font',
+	'script',
+	'iframe',
+}
+
+RELEVANT_CONTENT_TYPE_PATTERN = re.compile(
+	'|'.join(
+		re.escape(content_type)
+		for content_type in [
+			'text/html',
+			'text/css',
+			'application/javascript',
+			'image/',
+			'font/',
+			'application/json',
+		]
+	)
+)
+
+STREAMING_CONTENT_TYPE_PATTERN = re.compile(
+	'|'.join(
+		re.escape(content_type)
+		for content_type in ['streaming', 'video', 'audio', 'webm', 'mp4', 'event-stream', 'websocket', 'protobuf']
+	)
+)
+
+# Requests that never count as page load, matched against the lowercased URL in a single pass
+IGNORED_URL_PATTERN = re.compile(
+	'|'.join(
+		re.escape(pattern)
+		for pattern in [
+			# Analytics and tracking
+			'analytics',
+			'tracking',
+			'telemetry',
+			'beacon',
+			'metrics',
+			# Ad-related
+			'doubleclick',
+			'adsystem',
+			'adserver',
+			'advertising',
+			# Social media widgets
+			'facebook.com/plugins',
+			'platform.twitter',
+			'linkedin.com/embed',
+			# Live chat and support
+			'livechat',
+			'zendesk',
+			'intercom',
+			'crisp.chat',
+			'hotjar',
+			# Push notifications
+			'push-notifications',
+			'onesignal',
+			'pushwoosh',
+			# Background sync/heartbeat
+			'heartbeat',
+			'ping',
+			'alive',
+			# WebRTC and streaming
+			'webrtc',
+			'rtmp://',
+			'wss://',
+			# Common CDNs for dynamic content
+			'cloudfront.net',
+			'fastly.net',
+		]
+	)
+)
+
+LARGE_RESPONSE_BYTES = 5 * 1024 * 1024
+
+
+@dataclass
+class OriginStats:
+	"""Requests of the page to one origin, relevant to the page load or not"""
+
+	requests: int = 0
+	responses: int = 0
+	failed: int = 0
+	bytes_received: int = 0
+	total_latency: float = 0.0
+	max_latency: float = 0.0
+
+	@property
+	def average_latency(self) -> float:
+		return self.total_latency / self.responses if self.responses > 0 else 0.0
+
+
+def is_relevant_request(request: 'Request') -> bool:
+	"""Whether the page load should wait for this request"""
+	# Filter by resource type
+	if request.resource_type not in RELEVANT_RESOURCE_TYPES:
+		return False
+
+	# Filter out by URL patterns
+	url = request.url.lower()
+	if IGNORED_URL_PATTERN.search(url):
+		return False
+
+	# Filter out data URLs and blob URLs
+	if url.startswith(('data:', 'blob:')):
+		return False
+
+	# Filter out requests with certain headers
+	headers = request.headers
+	if headers.get('purpose') == 'prefetch' or headers.get('sec-fetch-dest') in [
+		'video',
+		'audio',
+	]:
+		return False
+
+	return True
+
+
+def _content_length(response: 'Response') -> Optional[int]:
+	content_length = response.headers.get('content-length')
+	return int(content_length) if content_length and content_length.isdigit() else None
+
+
+def is_relevant_response(response: 'Response') -> bool:
+	"""Whether a response counts as activity. Streaming, irrelevant or large responses are not essential for page load."""
+	content_type = response.headers.get('content-type', '').lower()
+	if STREAMING_CONTENT_TYPE_PATTERN.search(content_type):
+		return False
+	if not RELEVANT_CONTENT_TYPE_PATTERN.search(content_type):
+		return False
+
+	content_length = _content_length(response)
+	return content_length is None or content_length <= LARGE_RESPONSE_BYTES
+
+
+class NetworkActivityTracker:
+	"""
+	Keeps the in-flight requests of a page and statistics per origin for as long as the page lives.
+
+	Requests leave the pending set on their response, or on 'requestfinished' / 'requestfailed' for the ones
+	that never get a response. Waiters are woken on every change, so `wait_for_idle` returns exactly when
+	the pending set is empty and the quiet window has passed.
+	"""
+
+	def __init__(self):
+		# Weak, so that keeping trackers per page does not keep closed pages alive
+		self._page: Optional[weakref.ref['Page']] = None
+		self.pending_requests: set['Request'] = set()
+		self.last_activity = time.monotonic()
+		self.origins: dict[str, OriginStats] = {}
+
+		self._started: dict['Request', float] = {}
+		self._waiters: set[asyncio.Event] = set()
+
+	@property
+	def page(self) -> Optional['Page']:
+		return self._page() if self._page is not None else None
+
+	def attach(self, page: 'Page') -> None:
+		self._page = weakref.ref(page)
+		page.on('request', self._on_request)
+		page.on('response', self._on_response)
+		page.on('requestfinished', self._on_request_finished)
+		page.on('requestfailed', self._on_request_failed)
+
+	def detach(self) -> None:
+		page = self.page
+		self._page = None
+		if page is None:
+			return
+
+		page.remove_listener('request', self._on_request)
+		page.remove_listener('response', self._on_response)
+		page.remove_listener('requestfinished', self._on_request_finished)
+		page.remove_listener('requestfailed', self._on_request_failed)
+
+	def idle_time(self, since: Optional[float] = None) -> float:
+		"""
+		Seconds since the last activity, or 0 while relevant requests are pending.
+
+		With `since`, a monotonic timestamp, only the quiet time after it counts: activity an action
+		starts may come with a delay, so the quiet time before the action says nothing about the page.
+		"""
+		if self.pending_requests:
+			return 0.0
+		return time.monotonic() - max(self.last_activity, since or 0.0)
+
+	async def wait_for_idle(self, idle_time: float, timeout: float, since: Optional[float] = None) -> bool:
+		"""Wait until no relevant request has been pending for `idle_time` seconds after `since`. Returns False on timeout."""
+		deadline = time.monotonic() + timeout
+
+		while True:
+			now = time.monotonic()
+			remaining_idle = None if self.pending_requests else max(self.last_activity, since or 0.0) + idle_time - now
+			if remaining_idle is not None and remaining_idle <= 0:
+				return True
+
+			remaining_timeout = deadline - now
+			if remaining_timeout <= 0:
+				return False
+
+			changed = asyncio.Event()
+			self._waiters.add(changed)
+			try:
+				wake_up = remaining_timeout if remaining_idle is None else min(remaining_idle, remaining_timeout)
+				await asyncio.wait_for(changed.wait(), timeout=wake_up)
+			except asyncio.TimeoutError:
+				pass
+			finally:
+				self._waiters.discard(changed)
+
+	def _notify(self) -> None:
+		for waiter in self._waiters:
+			waiter.set()
+
+	def _origin_stats(self, request: 'Request') -> OriginStats:
+		parsed_url = urlparse(request.url)
+		origin = f'{parsed_url.scheme}://{parsed_url.netloc}'
+		stats = self.origins.get(origin)
+		if stats is None:
+			stats = self.origins[origin] = OriginStats()
+		return stats
+
+	def _on_request(self, request: 'Request') -> None:
+		if request.url.startswith(('data:', 'blob:')):
+			return
+
+		self._started[request] = time.monotonic()
+		self._origin_stats(request).requests += 1
+
+		if not is_relevant_request(request):
+			return
+
+		self.pending_requests.add(request)
+		self.last_activity = time.monotonic()
+		self._notify()
+
+	def _resolve(self, request: 'Request', is_activity: bool) -> None:
+		if request not in self.pending_requests:
+			return
+
+		self.pending_requests.remove(request)
+		if is_activity:
+			self.last_activity = time.monotonic()
+		self._notify()
+
+	def _on_response(self, response: 'Response') -> None:
+		request = response.request
+		started = self._started.pop(request, None)
+		if started is not None:
+			stats = self._origin_stats(request)
+			latency = time.monotonic() - started
+			stats.responses += 1
+			stats.total_latency += latency
+			stats.max_latency = max(stats.max_latency, latency)
+			stats.bytes_received += _content_length(response) or 0
+
+		self._resolve(request, is_activity=is_relevant_response(response))
+
+	def _on_request_finished(self, request: 'Request') -> None:
+		self._started.pop(request, None)
+		self._resolve(request, is_activity=True)
+
+	def _on_request_failed(self, request: 'Request') -> None:
+		if self._started.pop(request, None) is not None:
+			self._origin_stats(request).failed += 1
+		self._resolve(request, is_activity=False)
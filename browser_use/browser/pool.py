@@ -0,0 +1,228 @@
+"""
+Pool of warm browser contexts for running many short tasks on one browser.
+
+Creating a context, loading its cookies and init scripts and waiting for its first page is a large part
+of the latency of a short task. The pool keeps `min_size` contexts ready, hands them out with `acquire`
+or `lease`, and recycles them on release with `BrowserContext.fast_reset`, which clears the cookies,
+storage and tabs a task left behind. Contexts that fail the reset or the health check, or that were used
+`max_uses` times, are closed and replaced.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+
+if TYPE_CHECKING:
+	from browser_use.browser.browser import Browser
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BrowserContextPoolConfig:
+	"""
+	Configuration for the BrowserContextPool.
+
+	Default values:
+		min_size: 1
+			Contexts kept warm, created by `start` and refilled when contexts are closed
+
+		max_size: 4
+			Contexts open at the same time, in use or idle. `acquire` waits for a release beyond that
+
+		max_uses: 50
+			Tasks a context runs before it is closed and replaced, to bound the memory it accumulates
+
+		health_check_timeout: 5.0
+			Seconds a context has to answer the health check after a reset
+
+		acquire_timeout: None
+			Seconds `acquire` waits for a free context before raising TimeoutError, None waits forever
+	"""
+
+	min_size: int = 1
+	max_size: int = 4
+	max_uses: int = 50
+	health_check_timeout: float = 5.0
+	acquire_timeout: float | None = None
+
+	def __post_init__(self):
+		if self.max_size < 1 or not 0 <= self.min_size <= self.max_size:
+			raise ValueError(f'Invalid pool size: min_size={self.min_size}, max_size={self.max_size}')
+
+
+class BrowserContextPool:
+	"""
+	Warm browser contexts of one browser, recycled between tasks.
+
+	Usage:
+		async with BrowserContextPool(browser) as pool:
+			async with pool.lease() as context:
+				await Agent(task=task, llm=llm, browser_context=context).run()
+	"""
+
+	def __init__(
+		self,
+		browser: 'Browser',
+		config: BrowserContextPoolConfig = BrowserContextPoolConfig(),
+		context_config: Optional[BrowserContextConfig] = None,
+	):
+		if browser.config.cdp_url or browser.config.chrome_instance_path:
+			# These browsers hand out their existing context to every BrowserContext
+			raise ValueError('A BrowserContextPool needs a browser that creates its own contexts')
+
+		self.browser = browser
+		self.config = config
+		self.context_config = context_config or browser.config.new_context_config
+
+		self._idle: deque[BrowserContext] = deque()
+		self._in_use: set[BrowserContext] = set()
+		self._uses: dict[BrowserContext, int] = {}
+		# Contexts being created count towards max_size, they are added to `_idle` or `_in_use` under the same lock
+		self._creating = 0
+		self._condition = asyncio.Condition()
+		self._closed = False
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.close()
+
+	@property
+	def size(self) -> int:
+		"""Contexts open or being created"""
+		return len(self._idle) + len(self._in_use) + self._creating
+
+	@property
+	def idle(self) -> int:
+		return len(self._idle)
+
+	async def start(self):
+		"""Create the contexts to keep warm"""
+		await self._fill()
+
+	async def acquire(self) -> BrowserContext:
+		"""Take a warm context, creating one if none is idle and the pool is not full"""
+		if self.config.acquire_timeout is None:
+			return await self._acquire()
+		return await asyncio.wait_for(self._acquire(), self.config.acquire_timeout)
+
+	async def _acquire(self) -> BrowserContext:
+		while True:
+			async with self._condition:
+				await self._condition.wait_for(lambda: self._closed or bool(self._idle) or self.size < self.config.max_size)
+				if self._closed:
+					raise RuntimeError('BrowserContextPool is closed')
+				if self._idle:
+					context = self._idle.popleft()
+					if context.session is None:
+						# Closed while idle, e.g. by a browser crash
+						self._uses.pop(context, None)
+						continue
+					self._in_use.add(context)
+					return context
+				self._creating += 1
+
+			try:
+				context = await self._create()
+			except BaseException:
+				async with self._condition:
+					self._creating -= 1
+					self._condition.notify_all()
+				raise
+			async with self._condition:
+				self._creating -= 1
+				self._in_use.add(context)
+			return context
+
+	async def release(self, context: BrowserContext):
+		"""Reset the context for the next task, or replace it if it is broken or used up"""
+		async with self._condition:
+			if context not in self._in_use:
+				raise ValueError(f'Browser context {context.context_id} is not in use in this pool')
+
+		self._uses[context] = self._uses.get(context, 0) + 1
+		keep = not self._closed and self._uses[context] < self.config.max_uses
+		if keep:
+			try:
+				await context.fast_reset()
+				keep = await context.is_healthy(self.config.health_check_timeout)
+			except Exception as e:
+				logger.warning(f'Failed to reset browser context {context.context_id}: {e}')
+				keep = False
+
+		if not keep:
+			await self._discard(context)
+			async with self._condition:
+				self._in_use.discard(context)
+				self._condition.notify_all()
+			await self._fill()
+			return
+
+		async with self._condition:
+			self._in_use.discard(context)
+			self._idle.append(context)
+			self._condition.notify_all()
+
+	@asynccontextmanager
+	async def lease(self) -> AsyncIterator[BrowserContext]:
+		"""Acquire a context for the duration of the block"""
+		context = await self.acquire()
+		try:
+			yield context
+		finally:
+			await self.release(context)
+
+	async def close(self):
+		"""Close the idle contexts, and the contexts in use when they are released"""
+		async with self._condition:
+			self._closed = True
+			idle = list(self._idle)
+			self._idle.clear()
+			self._condition.notify_all()
+		await asyncio.gather(*(self._discard(context) for context in idle))
+
+	async def _fill(self):
+		"""Create contexts until `min_size` are open"""
+		async with self._condition:
+			missing = 0 if self._closed else max(0, self.config.min_size - self.size)
+			self._creating += missing
+
+		results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+		discarded = []
+		async with self._condition:
+			self._creating -= missing
+			for result in results:
+				if isinstance(result, BaseException):
+					logger.warning(f'Failed to create a browser context for the pool: {result}')
+				elif self._closed:
+					discarded.append(result)
+				else:
+					self._idle.append(result)
+			self._condition.notify_all()
+		await asyncio.gather(*(self._discard(context) for context in discarded))
+
+	async def _create(self) -> BrowserContext:
+		"""Create a context and wait for its first page"""
+		context = BrowserContext(browser=self.browser, config=self.context_config)
+		try:
+			await context.get_session()
+		except BaseException:
+			await context.close()
+			raise
+		self._uses[context] = 0
+		return context
+
+	async def _discard(self, context: BrowserContext):
+		self._uses.pop(context, None)
+		try:
+			await context.close()
+		except Exception as e:
+			logger.debug(f'Failed to close browser context {context.context_id}: {e}')
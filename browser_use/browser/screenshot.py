@@ -0,0 +1,99 @@
+"""
+Encoding of the screenshots sent to the LLM and kept in the history.
+
+Playwright encodes PNG and JPEG itself. WebP and downscaling go through Pillow, which is optional:
+without it the screenshot is kept in the format Playwright produced.
+"""
+
+import base64
+import binascii
+import io
+import logging
+import struct
+from typing import Literal, Optional
+
+logger = logging.getLogger(__name__)
+
+ScreenshotFormat = Literal['png', 'jpeg', 'webp']
+
+_PIL_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+
+
+def image_mime_type(image_b64: str) -> str:
+	"""MIME type of a base64 encoded screenshot, from the magic bytes of its format"""
+	if image_b64.startswith('/9j/'):
+		return 'image/jpeg'
+	if image_b64.startswith('UklGR'):
+		return 'image/webp'
+	return 'image/png'
+
+
+def image_size(image_b64: str) -> Optional[tuple[int, int]]:
+	"""Width and height of a base64 encoded screenshot, read from its header without decoding the pixels"""
+	try:
+		mime_type = image_mime_type(image_b64)
+		if mime_type == 'image/png':
+			# The IHDR chunk comes first, right after the 8 byte signature
+			header = base64.b64decode(image_b64[:32])
+			if header[12:16] == b'IHDR':
+				return struct.unpack('>II', header[16:24])
+			return None
+
+		if mime_type == 'image/webp':
+			header = base64.b64decode(image_b64[:40])
+			chunk = header[12:16]
+			if chunk == b'VP8 ':
+				width, height = struct.unpack('<HH', header[26:30])
+				return width & 0x3FFF, height & 0x3FFF
+			if chunk == b'VP8L':
+				bits = int.from_bytes(header[21:25], 'little')
+				return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+			if chunk == b'VP8X':
+				return int.from_bytes(header[24:27], 'little') + 1, int.from_bytes(header[27:30], 'little') + 1
+			return None
+
+		# JPEG: walk the segments up to the start of frame marker
+		data = base64.b64decode(image_b64)
+		offset = 2
+		while offset + 9 <= len(data):
+			if data[offset] != 0xFF:
+				return None
+			marker = data[offset + 1]
+			if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+				height, width = struct.unpack('>HH', data[offset + 5 : offset + 9])
+				return width, height
+			offset += 2 + struct.unpack('>H', data[offset + 2 : offset + 4])[0]
+		return None
+	except (binascii.Error, struct.error, ValueError):
+		return None
+
+
+def needs_reencoding(image_format: ScreenshotFormat, max_width: Optional[int], max_height: Optional[int]) -> bool:
+	"""Whether Playwright cannot produce the screenshot on its own"""
+	return image_format == 'webp' or max_width is not None or max_height is not None
+
+
+def reencode_screenshot(
+	image: bytes,
+	image_format: ScreenshotFormat,
+	quality: Optional[int] = None,
+	max_width: Optional[int] = None,
+	max_height: Optional[int] = None,
+) -> bytes:
+	"""Downscale the image to fit in the maximum dimensions, keeping its aspect ratio, and encode it. Requires Pillow."""
+	from PIL import Image
+
+	with Image.open(io.BytesIO(image)) as img:
+		if max_width is not None or max_height is not None:
+			img.thumbnail((max_width or img.width, max_height or img.height), Image.Resampling.LANCZOS)
+
+		if image_format == 'jpeg' and img.mode not in ('RGB', 'L'):
+			img = img.convert('RGB')
+
+		options = {}
+		if quality is not None and image_format != 'png':
+			options['quality'] = quality
+
+		output = io.BytesIO()
+		img.save(output, format=_PIL_FORMATS[image_format], **options)
+		return output.getvalue()
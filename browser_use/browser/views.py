@@ -1,4 +1,6 @@
+import base64
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any, Optional
 
 from pydantic import BaseModel
@@ -25,6 +27,10 @@ class BrowserState(DOMState):
 	pixels_above: int = 0
 	pixels_below: int = 0
 	browser_errors: list[str] = field(default_factory=list)
+	# The screenshot is the same as the one of the previous state, see `skip_unchanged_screenshots`
+	screenshot_unchanged: bool = False
+	# Seconds spent in each phase of capturing the state, phases that run concurrently overlap
+	timings: dict[str, float] = field(default_factory=dict)
 
 
 @dataclass
@@ -34,11 +40,22 @@ class BrowserStateHistory:
 	tabs: list[TabInfo]
 	interacted_element: list[DOMHistoryElement | None] | list[None]
 	screenshot: Optional[str] = None
+	# Screenshot written to disk instead of kept in memory, see `Agent(screenshot_store_path=...)`
+	screenshot_path: Optional[str] = None
+
+	def get_screenshot(self) -> Optional[str]:
+		"""The base64 screenshot, read from disk if it is not kept in memory"""
+		if self.screenshot is not None:
+			return self.screenshot
+		if self.screenshot_path is not None:
+			return base64.b64encode(Path(self.screenshot_path).read_bytes()).decode('utf-8')
+		return None
 
 	def to_dict(self) -> dict[str, Any]:
 		data = {}
 		data['tabs'] = [tab.model_dump() for tab in self.tabs]
 		data['screenshot'] = self.screenshot
+		data['screenshot_path'] = self.screenshot_path
 		data['interacted_element'] = [el.to_dict() if el else None for el in self.interacted_element]
 		data['url'] = self.url
 		data['title'] = self.title
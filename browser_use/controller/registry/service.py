@@ -1,6 +1,6 @@
 import asyncio
 from inspect import iscoroutinefunction, signature
-from typing import Any, Callable, Dict, Generic, Optional, Type, TypeVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, Optional, Type, TypeVar
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from pydantic import BaseModel, Field, create_model
@@ -18,6 +18,9 @@ from browser_use.telemetry.views import (
 )
 from browser_use.utils import time_execution_async, time_execution_sync
 
+if TYPE_CHECKING:
+	from browser_use.agent.scheduler import LLMScheduler
+
 Context = TypeVar('Context')
 
 
@@ -28,6 +31,8 @@ class Registry(Generic[Context]):
 		self.registry = ActionRegistry()
 		self.telemetry = ProductTelemetry()
 		self.exclude_actions = exclude_actions
+		# Action models by included actions, with the registered actions they were created from
+		self._action_models: dict[Optional[frozenset[str]], tuple[tuple[RegisteredAction, ...], Type[ActionModel]]] = {}
 
 	@time_execution_sync('--create_param_model')
 	def _create_param_model(self, function: Callable) -> Type[BaseModel]:
@@ -36,7 +41,7 @@ class Registry(Generic[Context]):
 		params = {
 			name: (param.annotation, ... if param.default == param.empty else param.default)
 			for name, param in sig.parameters.items()
-			if name != 'browser' and name != 'page_extraction_llm' and name != 'available_file_paths'
+			if name not in ('browser', 'page_extraction_llm', 'available_file_paths', 'llm_scheduler')
 		}
 		# TODO: make the types here work
 		return create_model(
@@ -96,6 +101,7 @@ class Registry(Generic[Context]):
 		available_file_paths: Optional[list[str]] = None,
 		#
 		context: Context | None = None,
+		llm_scheduler: Optional['LLMScheduler'] = None,
 	) -> Any:
 		"""Execute a registered action"""
 		if action_name not in self.registry.actions:
@@ -136,6 +142,8 @@ class Registry(Generic[Context]):
 				extra_args['page_extraction_llm'] = page_extraction_llm
 			if 'available_file_paths' in parameter_names:
 				extra_args['available_file_paths'] = available_file_paths
+			if 'llm_scheduler' in parameter_names:
+				extra_args['llm_scheduler'] = llm_scheduler
 			if action_name == 'input_text' and sensitive_data:
 				extra_args['has_sensitive_data'] = True
 			if is_pydantic:
@@ -172,7 +180,17 @@ class Registry(Generic[Context]):
 
 	@time_execution_sync('--create_action_model')
 	def create_action_model(self, include_actions: Optional[list[str]] = None) -> Type[ActionModel]:
-		"""Creates a Pydantic model from registered actions"""
+		"""Creates a Pydantic model from registered actions
+
+		The model is reused as long as the registered actions do not change, so that agents sharing a
+		controller do not each build and validate the same model.
+		"""
+		key = frozenset(include_actions) if include_actions is not None else None
+		actions = tuple(self.registry.actions.values())
+		cached = self._action_models.get(key)
+		if cached is not None and len(cached[0]) == len(actions) and all(a is b for a, b in zip(cached[0], actions)):
+			return cached[1]
+
 		fields = {
 			name: (
 				Optional[action.param_model],
@@ -192,7 +210,9 @@ class Registry(Generic[Context]):
 			)
 		)
 
-		return create_model('ActionModel', __base__=ActionModel, **fields)  # type:ignore
+		action_model = create_model('ActionModel', __base__=ActionModel, **fields)  # type:ignore
+		self._action_models[key] = (actions, action_model)
+		return action_model
 
 	def get_prompt_description(self) -> str:
 		"""Get a description of all actions for the prompt"""
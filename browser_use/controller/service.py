@@ -1,6 +1,7 @@
 import asyncio
 import json
 import logging
+from concurrent.futures import Executor
 from typing import Dict, Generic, Optional, Type, TypeVar
 
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -9,6 +10,7 @@ from langchain_core.prompts import PromptTemplate
 # from lmnr.sdk.laminar import Laminar
 from pydantic import BaseModel
 
+from browser_use.agent.scheduler import LLMScheduler, get_model_name
 from browser_use.agent.views import ActionModel, ActionResult
 from browser_use.browser.context import BrowserContext
 from browser_use.controller.registry.service import Registry
@@ -37,8 +39,12 @@ class Controller(Generic[Context]):
 		self,
 		exclude_actions: list[str] = [],
 		output_model: Optional[Type[BaseModel]] = None,
+		markdown_executor: Optional[Executor] = None,
 	):
 		self.registry = Registry[Context](exclude_actions)
+		# Converting a large page to markdown takes long enough to stall every agent on the event loop.
+		# None runs it in the default thread pool, a ProcessPoolExecutor also frees the GIL for it.
+		self.markdown_executor = markdown_executor
 
 		"""Register all default browser actions"""
 
@@ -179,16 +185,27 @@ class Controller(Generic[Context]):
 		@self.registry.action(
 			'Extract page content to retrieve specific information from the page, e.g. all company names, a specifc description, all information about, links with companies in structured format or simply links',
 		)
-		async def extract_content(goal: str, browser: BrowserContext, page_extraction_llm: BaseChatModel):
+		async def extract_content(
+			goal: str, browser: BrowserContext, page_extraction_llm: BaseChatModel, llm_scheduler: Optional[LLMScheduler] = None
+		):
 			page = await browser.get_current_page()
 			import markdownify
 
-			content = markdownify.markdownify(await page.content())
+			html = await page.content()
+			content = await asyncio.get_running_loop().run_in_executor(self.markdown_executor, markdownify.markdownify, html)
 
 			prompt = 'Your task is to extract the content of the page. You will be given a page and a goal and you should extract all relevant information around this goal from the page. If the goal is vague, summarize the page. Respond in json format. Extraction goal: {goal}, Page: {page}'
 			template = PromptTemplate(input_variables=['goal', 'page'], template=prompt)
 			try:
-				output = page_extraction_llm.invoke(template.format(goal=goal, page=content))
+				prompt_text = template.format(goal=goal, page=content)
+				if llm_scheduler is not None:
+					output = await llm_scheduler.call(
+						get_model_name(page_extraction_llm),
+						lambda: page_extraction_llm.ainvoke(prompt_text),
+						tokens=len(prompt_text) // 3,
+					)
+				else:
+					output = await page_extraction_llm.ainvoke(prompt_text)
 				msg = f'📄  Extracted from page\n: {output.content}\n'
 				logger.info(msg)
 				return ActionResult(extracted_content=msg, include_in_memory=True)
@@ -485,12 +502,14 @@ class Controller(Generic[Context]):
 		available_file_paths: Optional[list[str]] = None,
 		#
 		context: Context | None = None,
+		llm_scheduler: Optional[LLMScheduler] = None,
 	) -> ActionResult:
 		"""Execute an action"""
 
 		try:
 			for action_name, params in action.model_dump(exclude_unset=True).items():
 				if params is not None:
+					browser_context.mark_action_start()
 					# with Laminar.start_as_current_span(
 					# 	name=action_name,
 					# 	input={
@@ -507,6 +526,7 @@ class Controller(Generic[Context]):
 						sensitive_data=sensitive_data,
 						available_file_paths=available_file_paths,
 						context=context,
+						llm_scheduler=llm_scheduler,
 					)
 
 					# Laminar.set_span_output(result)
@@ -0,0 +1,115 @@
+"""
+Packing the serialized elements of a page into a token budget.
+
+Every line of `clickable_elements_to_lines` gets a cheap relevance score. The best lines are kept until
+the budget is spent, then printed in page order, with a placeholder for every run of omitted lines, so
+the model knows that there is more to scroll to or extract.
+"""
+
+import re
+from typing import Callable, Hashable, Optional
+
+from browser_use.dom.views import DOMElementNode
+
+ElementLine = tuple[Optional[DOMElementNode], str]
+
+# Elements the agent usually has to fill in or press to make progress
+INPUT_TAGS = {'input', 'textarea', 'select', 'button'}
+LINK_TAGS = {'a'}
+
+IN_VIEWPORT_SCORE = 3.0
+TASK_WORD_SCORE = 1.0
+MAX_TASK_WORDS_SCORE = 3.0
+INPUT_SCORE = 1.5
+LINK_SCORE = 1.0
+CHANGED_SCORE = 2.0
+
+_WORD_PATTERN = re.compile(r'\w{3,}')
+_STOP_WORDS = {'the', 'and', 'for', 'with', 'from', 'that', 'this', 'then', 'you', 'are', 'all', 'into', 'its'}
+
+
+def task_words(text: str) -> set[str]:
+	"""Words of the task that count as overlap with an element"""
+	return {word.lower() for word in _WORD_PATTERN.findall(text)} - _STOP_WORDS
+
+
+def score_lines(
+	lines: list[ElementLine],
+	words: set[str],
+	changed_keys: Optional[set[Hashable]] = None,
+	keys: Optional[list[Hashable]] = None,
+) -> list[float]:
+	"""
+	Relevance of every line: in the viewport, sharing words with the task, an input or a link, and
+	new or changed since the previous step. Text lines take the viewport status of the element before them.
+	"""
+	scores = []
+	in_viewport = True
+	for i, (node, line) in enumerate(lines):
+		score = 0.0
+		if node is not None:
+			in_viewport = node.is_in_viewport
+			if node.tag_name in INPUT_TAGS:
+				score += INPUT_SCORE
+			elif node.tag_name in LINK_TAGS:
+				score += LINK_SCORE
+		if in_viewport:
+			score += IN_VIEWPORT_SCORE
+		if words:
+			overlap = sum(1 for word in _WORD_PATTERN.findall(line) if word.lower() in words)
+			score += min(MAX_TASK_WORDS_SCORE, TASK_WORD_SCORE * overlap)
+		if changed_keys and keys is not None and keys[i] in changed_keys:
+			score += CHANGED_SCORE
+		scores.append(score)
+	return scores
+
+
+def omitted_placeholder(count: int) -> str:
+	return (
+		f'... {count} less relevant {"element" if count == 1 else "elements"} omitted - scroll or extract content to see more ...'
+	)
+
+
+def pack_lines(
+	lines: list[ElementLine],
+	scores: list[float],
+	max_tokens: int,
+	count_tokens: Callable[[str], int],
+) -> list[ElementLine]:
+	"""
+	Keep the highest scoring lines that fit in `max_tokens`, in page order, with a placeholder for every
+	run of omitted lines. Ties keep the lines that come first on the page.
+
+	The placeholders count towards the budget: keeping a line can split a run of omitted lines in two or
+	end one, so its cost includes the placeholders it adds or saves, each at the cost of the longest one.
+	"""
+	if not lines:
+		return lines
+
+	placeholder_tokens = count_tokens(omitted_placeholder(len(lines))) + 1
+	kept = [False] * len(lines)
+	# Nothing kept yet: one placeholder for all the lines
+	used = placeholder_tokens
+	for i in sorted(range(len(lines)), key=lambda i: (-scores[i], i)):
+		omitted_neighbours = (i > 0 and not kept[i - 1]) + (i < len(lines) - 1 and not kept[i + 1])
+		tokens = count_tokens(lines[i][1]) + 1 + (omitted_neighbours - 1) * placeholder_tokens
+		if used + tokens <= max_tokens:
+			kept[i] = True
+			used += tokens
+
+	if all(kept):
+		return lines
+
+	packed: list[ElementLine] = []
+	omitted = 0
+	for line, keep in zip(lines, kept):
+		if keep:
+			if omitted:
+				packed.append((None, omitted_placeholder(omitted)))
+				omitted = 0
+			packed.append(line)
+		else:
+			omitted += 1
+	if omitted:
+		packed.append((None, omitted_placeholder(omitted)))
+	return packed
@@ -4,9 +4,18 @@
     focusHighlightIndex: -1,
     viewportExpansion: 0,
     debugMode: false,
+    incremental: false,
+    wireFormat: "json",
   }
 ) => {
-  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode } = args;
+  const {
+    doHighlightElements,
+    focusHighlightIndex,
+    viewportExpansion,
+    debugMode,
+    incremental = false,
+    wireFormat = "json",
+  } = args;
   let highlightIndex = 0; // Reset highlight index
 
   // Add timing stack to handle recursion
@@ -181,12 +190,148 @@
    *
    * @type {Object<string, any>}
    */
-  const DOM_HASH_MAP = {};
+  let DOM_HASH_MAP = {};
 
   const ID = { current: 0 };
 
   const HIGHLIGHT_CONTAINER_ID = "playwright-highlight-container";
 
+  /**
+   * Persistent extractor state for incremental mode, stored on the window of the
+   * current document. A MutationObserver marks changed nodes as dirty so that
+   * subsequent calls only have to rebuild the affected subtrees. Node ids are
+   * stable across calls. A navigation creates a new window and therefore always
+   * starts with a full extraction.
+   */
+  const STATE_KEY = "__browserUseDomState";
+  let STATE = null;
+
+  if (incremental) {
+    STATE = window[STATE_KEY];
+    if (!STATE || STATE.document !== document) {
+      STATE = createIncrementalState();
+      window[STATE_KEY] = STATE;
+    }
+  }
+
+  function isHighlightNode(node) {
+    const element = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+    return !!element && typeof element.closest === "function" && !!element.closest(`#${HIGHLIGHT_CONTAINER_ID}`);
+  }
+
+  function createIncrementalState() {
+    const state = {
+      document,
+      bodyElement: null,
+      nodeIds: new WeakMap(),
+      highlightIndices: new WeakMap(),
+      nodes: new Map(),
+      highlighted: new Set(),
+      observedRoots: new WeakSet(),
+      dirtyNodes: new Set(),
+      addedElements: new Set(),
+      requiresFullRebuild: true,
+      viewportKey: null,
+      rootId: null,
+      nextId: 0,
+      nextHighlightIndex: 0,
+      observer: null,
+    };
+
+    const recordMutations = (records) => {
+      for (const record of records) {
+        if (isHighlightNode(record.target)) continue;
+
+        if (record.type === "childList") {
+          const changed = [...record.addedNodes, ...record.removedNodes];
+          // Ignore our own highlight container being added or removed
+          if (changed.length > 0 && changed.every((n) => n.id === HIGHLIGHT_CONTAINER_ID)) continue;
+
+          for (const added of record.addedNodes) {
+            if (added.nodeType === Node.ELEMENT_NODE) state.addedElements.add(added);
+          }
+        }
+
+        // For childList records the target is the parent whose children changed,
+        // for attributes and characterData it is the changed node itself.
+        state.dirtyNodes.add(record.target);
+      }
+    };
+
+    state.recordMutations = recordMutations;
+    state.observer = new MutationObserver(recordMutations);
+
+    // Scrolling inside nested containers changes visibility without mutating the DOM
+    document.addEventListener(
+      "scroll",
+      (event) => {
+        if (event.target && event.target !== document) state.dirtyNodes.add(event.target);
+      },
+      { capture: true, passive: true }
+    );
+
+    return state;
+  }
+
+  function observeRoot(root) {
+    if (!STATE || !root || STATE.observedRoots.has(root)) return;
+    STATE.observer.observe(root, {
+      subtree: true,
+      childList: true,
+      attributes: true,
+      characterData: true,
+    });
+    STATE.observedRoots.add(root);
+  }
+
+  function nextNodeId(node) {
+    if (!STATE) return `${ID.current++}`;
+
+    let id = STATE.nodeIds.get(node);
+    if (id === undefined) {
+      id = `${STATE.nextId++}`;
+      STATE.nodeIds.set(node, id);
+    }
+    return id;
+  }
+
+  function nextHighlightIndex(node) {
+    if (!STATE) return highlightIndex++;
+
+    // Elements keep their highlight index for as long as the document lives
+    let index = STATE.highlightIndices.get(node);
+    if (index === undefined) {
+      index = STATE.nextHighlightIndex++;
+      STATE.highlightIndices.set(node, index);
+    }
+    return index;
+  }
+
+  function registerNode(id, node, nodeData, parentIframe) {
+    DOM_HASH_MAP[id] = nodeData;
+    if (!STATE) return;
+
+    const children = nodeData.children || [];
+    const previous = STATE.nodes.get(id);
+    STATE.nodes.set(id, {
+      node,
+      parentId: previous ? previous.parentId : null,
+      children,
+      parentIframe,
+      highlightIndex: nodeData.highlightIndex,
+    });
+    for (const childId of children) {
+      const child = STATE.nodes.get(childId);
+      if (child) child.parentId = id;
+    }
+
+    if (nodeData.highlightIndex !== undefined) {
+      STATE.highlighted.add(id);
+    } else {
+      STATE.highlighted.delete(id);
+    }
+  }
+
   /**
    * Highlights an element in the DOM and returns the index of the next element.
    */
@@ -815,8 +960,8 @@
         if (domElement) nodeData.children.push(domElement);
       }
 
-      const id = `${ID.current++}`;
-      DOM_HASH_MAP[id] = nodeData;
+      const id = nextNodeId(node);
+      registerNode(id, node, nodeData, parentIframe);
       if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
       return id;
     }
@@ -842,12 +987,12 @@
         return null;
       }
 
-      const id = `${ID.current++}`;
-      DOM_HASH_MAP[id] = {
+      const id = nextNodeId(node);
+      registerNode(id, node, {
         type: "TEXT_NODE",
         text: textContent,
         isVisible: isTextNodeVisible(node),
-      };
+      }, parentIframe);
       if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
       return id;
     }
@@ -907,9 +1052,10 @@
           nodeData.isInteractive = isInteractiveElement(node);
           if (nodeData.isInteractive) {
             nodeData.isInViewport = true;
-            nodeData.highlightIndex = highlightIndex++;
+            nodeData.highlightIndex = nextHighlightIndex(node);
 
-            if (doHighlightElements) {
+            // In incremental mode all highlights are drawn after the extraction
+            if (doHighlightElements && !STATE) {
               if (focusHighlightIndex >= 0) {
                 if (focusHighlightIndex === nodeData.highlightIndex) {
                   highlightElement(node, nodeData.highlightIndex, parentIframe);
@@ -932,6 +1078,7 @@
         try {
           const iframeDoc = node.contentDocument || node.contentWindow?.document;
           if (iframeDoc) {
+            observeRoot(iframeDoc);
             for (const child of iframeDoc.childNodes) {
               const domElement = buildDomTree(child, node);
               if (domElement) nodeData.children.push(domElement);
@@ -958,6 +1105,7 @@
       // Handle shadow DOM
       else if (node.shadowRoot) {
         nodeData.shadowRoot = true;
+        observeRoot(node.shadowRoot);
         for (const child of node.shadowRoot.childNodes) {
           const domElement = buildDomTree(child, parentIframe);
           if (domElement) nodeData.children.push(domElement);
@@ -978,12 +1126,242 @@
       return null;
     }
 
-    const id = `${ID.current++}`;
-    DOM_HASH_MAP[id] = nodeData;
+    const id = nextNodeId(node);
+    registerNode(id, node, nodeData, parentIframe);
     if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
     return id;
   }
 
+  function getViewportKey() {
+    return [window.scrollX, window.scrollY, window.innerWidth, window.innerHeight, viewportExpansion].join(":");
+  }
+
+  /**
+   * Returns the closest ancestor (or the node itself) that is part of the previous
+   * extraction. Returns undefined if the change can be ignored and null if the
+   * change cannot be attributed to a subtree.
+   */
+  function getExtractedAncestor(node) {
+    let current = node;
+    while (current) {
+      const id = STATE.nodeIds.get(current);
+      if (id !== undefined && STATE.nodes.get(id)?.node === current) return current;
+
+      if (current === document) return undefined; // e.g. changes in <head>
+
+      if (current.parentNode) {
+        current = current.parentNode;
+      } else if (current instanceof ShadowRoot) {
+        current = current.host;
+      } else if (current.nodeType === Node.DOCUMENT_NODE && current.defaultView?.frameElement) {
+        current = current.defaultView.frameElement;
+      } else {
+        return null;
+      }
+    }
+    return null;
+  }
+
+  function getDepth(id) {
+    let depth = 0;
+    let entry = STATE.nodes.get(id);
+    while (entry && entry.parentId !== null) {
+      depth++;
+      entry = STATE.nodes.get(entry.parentId);
+    }
+    return depth;
+  }
+
+  function collectSubtreeIds(id, out) {
+    const entry = STATE.nodes.get(id);
+    if (!entry) return out;
+    out.push(id);
+    for (const childId of entry.children) collectSubtreeIds(childId, out);
+    return out;
+  }
+
+  /**
+   * Turns the recorded mutations into the set of subtree roots that have to be
+   * rebuilt. Returns null if a full extraction is required.
+   */
+  function collectDirtyRoots() {
+    // Process mutations that have not been delivered to the observer callback yet
+    STATE.recordMutations(STATE.observer.takeRecords());
+
+    // New fixed or sticky elements (modals, overlays) can occlude unrelated elements
+    for (const element of STATE.addedElements) {
+      if (!element.isConnected) continue;
+      const position = getCachedComputedStyle(element)?.position;
+      if (position === "fixed" || position === "sticky") return null;
+    }
+
+    const roots = new Map();
+    for (const node of STATE.dirtyNodes) {
+      // Removed nodes are handled through the childList change of their parent
+      if (!node.isConnected) continue;
+
+      const ancestor = getExtractedAncestor(node);
+      if (ancestor === undefined) continue;
+      if (ancestor === null) return null;
+
+      const id = STATE.nodeIds.get(ancestor);
+      roots.set(id, ancestor);
+    }
+
+    return [...roots.keys()].sort((a, b) => getDepth(a) - getDepth(b));
+  }
+
+  /**
+   * Rebuilds the subtree of the given node id. If the node itself is no longer
+   * extracted, the rebuild moves up to its parent. Returns the id of the node
+   * that was actually rebuilt or null if the root was reached.
+   */
+  function rebuildSubtree(id) {
+    while (id !== null) {
+      const entry = STATE.nodes.get(id);
+      if (!entry) return null;
+
+      if (buildDomTree(entry.node, entry.parentIframe) !== null) return id;
+
+      id = entry.parentId;
+    }
+    return null;
+  }
+
+  function updateIncrementalState(dirtyRoots) {
+    const previousIds = new Set();
+    const rebuiltRoots = [];
+
+    for (const rootId of dirtyRoots) {
+      if (previousIds.has(rootId)) continue; // already covered by an ancestor
+
+      for (const id of collectSubtreeIds(rootId, [])) previousIds.add(id);
+
+      const rebuiltId = rebuildSubtree(rootId);
+      if (rebuiltId === null) return null;
+
+      if (rebuiltId !== rootId) {
+        for (const id of collectSubtreeIds(rebuiltId, [])) previousIds.add(id);
+      }
+      rebuiltRoots.push(rebuiltId);
+    }
+
+    // Keep only the outermost rebuilt roots
+    const currentIds = new Set();
+    const finalRoots = [];
+    for (const rootId of rebuiltRoots.sort((a, b) => getDepth(a) - getDepth(b))) {
+      if (currentIds.has(rootId)) continue;
+      finalRoots.push(rootId);
+      for (const id of collectSubtreeIds(rootId, [])) currentIds.add(id);
+    }
+
+    // Anything that was built but is not part of the final subtrees is gone
+    for (const id of Object.keys(DOM_HASH_MAP)) {
+      if (!currentIds.has(id)) {
+        delete DOM_HASH_MAP[id];
+        STATE.nodes.delete(id);
+        STATE.highlighted.delete(id);
+      }
+    }
+
+    const removed = [];
+    for (const id of previousIds) {
+      if (!currentIds.has(id)) {
+        removed.push(id);
+        STATE.nodes.delete(id);
+        STATE.highlighted.delete(id);
+      }
+    }
+
+    return { dirtyRoots: finalRoots, removed };
+  }
+
+  const NODE_FLAGS = {
+    TEXT: 1,
+    VISIBLE: 2,
+    INTERACTIVE: 4,
+    TOP_ELEMENT: 8,
+    IN_VIEWPORT: 16,
+    SHADOW_ROOT: 32,
+  };
+
+  /**
+   * Encodes the node map as parallel arrays with a shared string table, which is
+   * much smaller to serialize than one object with repeated keys per node.
+   */
+  function encodeColumnar(map) {
+    const strings = [];
+    const stringIndices = new Map();
+    const intern = (value) => {
+      let index = stringIndices.get(value);
+      if (index === undefined) {
+        index = strings.length;
+        strings.push(value);
+        stringIndices.set(value, index);
+      }
+      return index;
+    };
+
+    const columns = {
+      strings,
+      ids: [],
+      flags: [],
+      tags: [],
+      xpaths: [],
+      texts: [],
+      highlightIndices: [],
+      attributeOffsets: [0],
+      attributes: [],
+      childOffsets: [0],
+      children: [],
+    };
+
+    for (const [id, nodeData] of Object.entries(map)) {
+      columns.ids.push(Number(id));
+
+      if (nodeData.type === "TEXT_NODE") {
+        columns.flags.push(NODE_FLAGS.TEXT | (nodeData.isVisible ? NODE_FLAGS.VISIBLE : 0));
+        columns.tags.push(-1);
+        columns.xpaths.push(-1);
+        columns.texts.push(intern(nodeData.text));
+        columns.highlightIndices.push(-1);
+      } else {
+        columns.flags.push(
+          (nodeData.isVisible ? NODE_FLAGS.VISIBLE : 0) |
+          (nodeData.isInteractive ? NODE_FLAGS.INTERACTIVE : 0) |
+          (nodeData.isTopElement ? NODE_FLAGS.TOP_ELEMENT : 0) |
+          (nodeData.isInViewport ? NODE_FLAGS.IN_VIEWPORT : 0) |
+          (nodeData.shadowRoot ? NODE_FLAGS.SHADOW_ROOT : 0)
+        );
+        columns.tags.push(intern(nodeData.tagName));
+        columns.xpaths.push(intern(nodeData.xpath));
+        columns.texts.push(-1);
+        columns.highlightIndices.push(nodeData.highlightIndex ?? -1);
+
+        for (const [name, value] of Object.entries(nodeData.attributes)) {
+          columns.attributes.push(intern(name), intern(value ?? ""));
+        }
+        for (const childId of nodeData.children) {
+          columns.children.push(Number(childId));
+        }
+      }
+
+      columns.attributeOffsets.push(columns.attributes.length);
+      columns.childOffsets.push(columns.children.length);
+    }
+
+    return columns;
+  }
+
+  function drawIncrementalHighlights() {
+    for (const id of STATE.highlighted) {
+      const entry = STATE.nodes.get(id);
+      if (!entry) continue;
+      if (focusHighlightIndex >= 0 && focusHighlightIndex !== entry.highlightIndex) continue;
+      highlightElement(entry.node, entry.highlightIndex, entry.parentIframe);
+    }
+  }
+
   // After all functions are defined, wrap them with performance measurement
   // Remove buildDomTree from here as we measure it separately
   highlightElement = measureTime(highlightElement);
@@ -994,7 +1372,46 @@
   isTextNodeVisible = measureTime(isTextNodeVisible);
   getEffectiveScroll = measureTime(getEffectiveScroll);
 
-  const rootId = buildDomTree(document.body);
+  let rootId = null;
+  let incrementalResult = null;
+
+  if (STATE) {
+    const viewportKey = getViewportKey();
+    const canPatch =
+      !STATE.requiresFullRebuild &&
+      STATE.rootId !== null &&
+      STATE.viewportKey === viewportKey &&
+      STATE.bodyElement === document.body;
+
+    const dirtyRoots = canPatch ? collectDirtyRoots() : null;
+    STATE.dirtyNodes.clear();
+    STATE.addedElements.clear();
+
+    if (dirtyRoots !== null) {
+      incrementalResult = updateIncrementalState(dirtyRoots);
+    }
+
+    if (incrementalResult === null) {
+      // Full extraction - start over with fresh highlight indices
+      DOM_HASH_MAP = {};
+      STATE.nodes = new Map();
+      STATE.highlighted = new Set();
+      STATE.highlightIndices = new WeakMap();
+      STATE.nextHighlightIndex = 0;
+      observeRoot(document);
+
+      STATE.rootId = buildDomTree(document.body);
+      STATE.bodyElement = document.body;
+      STATE.requiresFullRebuild = false;
+    }
+
+    STATE.viewportKey = viewportKey;
+    rootId = STATE.rootId;
+
+    if (doHighlightElements) drawIncrementalHighlights();
+  } else {
+    rootId = buildDomTree(document.body);
+  }
 
   // Clear the cache before starting
   DOM_CACHE.clearCache();
@@ -1049,7 +1466,22 @@
     }
   }
 
-  return debugMode ?
-    { rootId, map: DOM_HASH_MAP, perfMetrics: PERF_METRICS } :
+  const result = wireFormat === "columnar" ?
+    { rootId, columns: encodeColumnar(DOM_HASH_MAP) } :
     { rootId, map: DOM_HASH_MAP };
+
+  if (STATE) {
+    result.full = incrementalResult === null;
+    result.dirtyRoots = incrementalResult ? incrementalResult.dirtyRoots : [];
+    result.removed = incrementalResult ? incrementalResult.removed : [];
+  }
+
+  if (debugMode) {
+    result.perfMetrics = PERF_METRICS;
+  }
+
+  // The observer callback keeps this scope alive, so drop the reference to the map
+  DOM_HASH_MAP = null;
+
+  return result;
 };
@@ -0,0 +1,69 @@
+"""
+Differences between two serializations of the interactive elements of a page.
+
+Highlighted elements are matched by the hash of their branch path and xpath, and by the xpaths of the
+iframes and shadow hosts they are in, since their xpath only starts at the innermost of those. Text lines
+are matched by their content. An element whose attributes, text or index changed is reported as changed
+rather than as removed and added.
+"""
+
+from dataclasses import dataclass, field
+from typing import Hashable, Optional
+
+from browser_use.dom.views import DOMElementNode
+
+ElementLines = dict[Hashable, str]
+
+
+def _root_path(node: DOMElementNode) -> tuple[str, ...]:
+	"""Xpaths of the iframes and shadow hosts the element is in, outermost first"""
+	path = []
+	parent = node.parent
+	while parent is not None:
+		if parent.tag_name == 'iframe' or parent.shadow_root:
+			path.append(parent.xpath)
+		parent = parent.parent
+	return tuple(reversed(path))
+
+
+def line_keys(lines: list[tuple[Optional[DOMElementNode], str]]) -> list[Hashable]:
+	"""Key of every line of `clickable_elements_to_lines` that identifies it across steps"""
+	keys: list[Hashable] = []
+	text_occurrences: dict[str, int] = {}
+	for node, line in lines:
+		if node is not None:
+			keys.append((node.hash.branch_path_hash, node.hash.xpath_hash, _root_path(node)))
+		else:
+			# Repeated texts are told apart by their occurrence
+			occurrence = text_occurrences.get(line, 0)
+			text_occurrences[line] = occurrence + 1
+			keys.append(('text', line, occurrence))
+	return keys
+
+
+def element_lines(lines: list[tuple[Optional[DOMElementNode], str]]) -> ElementLines:
+	"""Key the lines of `clickable_elements_to_lines`, keeping their order"""
+	return dict(zip(line_keys(lines), (line for _, line in lines)))
+
+
+@dataclass
+class ElementsDiff:
+	added: list[str] = field(default_factory=list)
+	removed: list[str] = field(default_factory=list)
+	changed: list[str] = field(default_factory=list)
+
+	def __len__(self) -> int:
+		return len(self.added) + len(self.removed) + len(self.changed)
+
+
+def diff_elements(baseline: ElementLines, current: ElementLines) -> ElementsDiff:
+	"""Lines added, removed and changed since the baseline, each in page order"""
+	diff = ElementsDiff()
+	for key, line in current.items():
+		baseline_line = baseline.get(key)
+		if baseline_line is None:
+			diff.added.append(line)
+		elif baseline_line != line:
+			diff.changed.append(line)
+	diff.removed = [line for key, line in baseline.items() if key not in current]
+	return diff
@@ -1,8 +1,8 @@
 import hashlib
-from typing import Optional
+from typing import Literal, Optional
 
 from browser_use.dom.history_tree_processor.view import DOMHistoryElement, HashedDomElement
-from browser_use.dom.views import DOMElementNode
+from browser_use.dom.views import DOMElementNode, SelectorMap
 
 
 class HistoryTreeProcessor:
@@ -10,8 +10,13 @@ class HistoryTreeProcessor:
 	Operations on the DOM elements
 
 	@dev be careful - text nodes can change even if elements stay the same
+
+	The hashes are only compared within a process (the history stores the raw branch path, attributes and xpath),
+	so `hash_algorithm` can be set to 'fast' to use xxhash if it is installed, or blake2b otherwise, instead of sha256.
 	"""
 
+	hash_algorithm: Literal['sha256', 'fast'] = 'sha256'
+
 	@staticmethod
 	def convert_dom_element_to_history_element(dom_element: DOMElementNode) -> DOMHistoryElement:
 		from browser_use.browser.context import BrowserContext
@@ -37,8 +42,7 @@ class HistoryTreeProcessor:
 
 		def process_node(node: DOMElementNode):
 			if node.highlight_index is not None:
-				hashed_node = HistoryTreeProcessor._hash_dom_element(node)
-				if hashed_node == hashed_dom_history_element:
+				if node.hash == hashed_dom_history_element:
 					return node
 			for child in node.children:
 				if isinstance(child, DOMElementNode):
@@ -49,6 +53,22 @@ class HistoryTreeProcessor:
 
 		return process_node(tree)
 
+	@staticmethod
+	def find_history_element_in_index(
+		dom_history_element: DOMHistoryElement, hash_index: dict[HashedDomElement, DOMElementNode]
+	) -> Optional[DOMElementNode]:
+		"""Same as `find_history_element_in_tree`, with the index of `DOMState.hash_index` instead of a tree scan"""
+		return hash_index.get(HistoryTreeProcessor._hash_dom_history_element(dom_history_element))
+
+	@staticmethod
+	def build_hash_index(selector_map: SelectorMap) -> dict[HashedDomElement, DOMElementNode]:
+		"""Index the highlighted elements by hash. If several elements share a hash, the first one in the page wins."""
+		hash_index: dict[HashedDomElement, DOMElementNode] = {}
+		for highlight_index in sorted(selector_map):
+			element = selector_map[highlight_index]
+			hash_index.setdefault(element.hash, element)
+		return hash_index
+
 	@staticmethod
 	def compare_history_element_and_dom_element(dom_history_element: DOMHistoryElement, dom_element: DOMElementNode) -> bool:
 		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
@@ -66,14 +86,53 @@ class HistoryTreeProcessor:
 
 	@staticmethod
 	def _hash_dom_element(dom_element: DOMElementNode) -> HashedDomElement:
-		parent_branch_path = HistoryTreeProcessor._get_parent_branch_path(dom_element)
-		branch_path_hash = HistoryTreeProcessor._parent_branch_path_hash(parent_branch_path)
+		branch_path_hash = HistoryTreeProcessor._branch_path_hasher(dom_element).hexdigest()
 		attributes_hash = HistoryTreeProcessor._attributes_hash(dom_element.attributes)
 		xpath_hash = HistoryTreeProcessor._xpath_hash(dom_element.xpath)
 		# text_hash = DomTreeProcessor._text_hash(dom_element)
 
 		return HashedDomElement(branch_path_hash, attributes_hash, xpath_hash)
 
+	@staticmethod
+	def _new_hasher():
+		if HistoryTreeProcessor.hash_algorithm == 'fast':
+			try:
+				import xxhash
+
+				return xxhash.xxh3_128()
+			except ImportError:
+				return hashlib.blake2b(digest_size=16)
+		return hashlib.sha256()
+
+	@staticmethod
+	def _branch_path_hasher(dom_element: DOMElementNode):
+		"""
+		Hasher fed with the branch path of the element, memoized on the nodes.
+
+		The hasher of an element is a copy of its parent's one extended with its own tag, so every node
+		of the tree is hashed once no matter how many of its descendants are looked up.
+		"""
+		pending: list[DOMElementNode] = []
+		current = dom_element
+		while current._branch_path_hasher is None and current.parent is not None:
+			pending.append(current)
+			current = current.parent
+
+		if current._branch_path_hasher is None:
+			# The root is not part of the branch path
+			current._branch_path_hasher = HistoryTreeProcessor._new_hasher()
+
+		hasher = current._branch_path_hasher
+		for node in reversed(pending):
+			hasher = hasher.copy()
+			# Same as '/'.join() of the branch path: no separator before the first tag
+			if node.parent is not None and node.parent.parent is not None:
+				hasher.update(b'/')
+			hasher.update(node.tag_name.encode())
+			node._branch_path_hasher = hasher
+
+		return hasher
+
 	@staticmethod
 	def _get_parent_branch_path(dom_element: DOMElementNode) -> list[str]:
 		parents: list[DOMElementNode] = []
@@ -89,16 +148,22 @@ class HistoryTreeProcessor:
 	@staticmethod
 	def _parent_branch_path_hash(parent_branch_path: list[str]) -> str:
 		parent_branch_path_string = '/'.join(parent_branch_path)
-		return hashlib.sha256(parent_branch_path_string.encode()).hexdigest()
+		hasher = HistoryTreeProcessor._new_hasher()
+		hasher.update(parent_branch_path_string.encode())
+		return hasher.hexdigest()
 
 	@staticmethod
 	def _attributes_hash(attributes: dict[str, str]) -> str:
 		attributes_string = ''.join(f'{key}={value}' for key, value in attributes.items())
-		return hashlib.sha256(attributes_string.encode()).hexdigest()
+		hasher = HistoryTreeProcessor._new_hasher()
+		hasher.update(attributes_string.encode())
+		return hasher.hexdigest()
 
 	@staticmethod
 	def _xpath_hash(xpath: str) -> str:
-		return hashlib.sha256(xpath.encode()).hexdigest()
+		hasher = HistoryTreeProcessor._new_hasher()
+		hasher.update(xpath.encode())
+		return hasher.hexdigest()
 
 	@staticmethod
 	def _text_hash(dom_element: DOMElementNode) -> str:
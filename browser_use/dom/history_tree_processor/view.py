@@ -1,10 +1,10 @@
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Optional
+from typing import Optional
 
 from pydantic import BaseModel
 
 
-@dataclass
+@dataclass(frozen=True)
 class HashedDomElement:
 	"""
 	Hash of the dom element to be used as a unique identifier
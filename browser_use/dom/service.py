@@ -1,6 +1,6 @@
-import gc
 import json
 import logging
+import weakref
 from dataclasses import dataclass
 from importlib import resources
 from typing import TYPE_CHECKING, Optional
@@ -13,6 +13,7 @@ from browser_use.dom.views import (
 	DOMElementNode,
 	DOMState,
 	DOMTextNode,
+	PageSnapshot,
 	SelectorMap,
 )
 from browser_use.utils import time_execution_async
@@ -26,12 +27,60 @@ class ViewportInfo:
 	height: int
 
 
+# Entry point of the extractor in the page, returns the DOM map together with scroll info, title and url
+SNAPSHOT_FUNCTION = 'window.__browserUseSnapshot'
+
+SNAPSHOT_SCRIPT = """
+if (window.top === window) {
+  %(function)s = ((buildDomTree) => (args) => {
+    if (args.removeHighlights) {
+      // Remove the highlight container and all its contents
+      document.getElementById('playwright-highlight-container')?.remove();
+
+      // Remove highlight attributes from elements
+      document.querySelectorAll('[browser-user-highlight-id^="playwright-highlight-"]').forEach((el) => {
+        el.removeAttribute('browser-user-highlight-id');
+      });
+    }
+
+    return {
+      ...buildDomTree(args),
+      scroll: [window.scrollY, window.innerHeight, document.documentElement.scrollHeight],
+      title: document.title,
+      url: window.location.href,
+    };
+  })(%(build_dom_tree)s);
+}
+"""
+
+# Pages that install the extractor in every new document, see `DomService._install_snapshot_script`
+_pages_with_snapshot_script: 'weakref.WeakSet[Page]' = weakref.WeakSet()
+
+
+# Bit flags of the `columnar` wire format, see `encodeColumnar` in buildDomTree.js
+NODE_FLAG_TEXT = 1
+NODE_FLAG_VISIBLE = 2
+NODE_FLAG_INTERACTIVE = 4
+NODE_FLAG_TOP_ELEMENT = 8
+NODE_FLAG_IN_VIEWPORT = 16
+NODE_FLAG_SHADOW_ROOT = 32
+
+
 class DomService:
 	def __init__(self, page: 'Page'):
 		self.page = page
 		self.xpath_cache = {}
 
 		self.js_code = resources.read_text('browser_use.dom', 'buildDomTree.js')
+		self.snapshot_script = SNAPSHOT_SCRIPT % {
+			'function': SNAPSHOT_FUNCTION,
+			'build_dom_tree': self.js_code.strip().rstrip(';'),
+		}
+
+		# Result of the previous incremental extraction, patched in place on the next call
+		self._node_map: dict[str, DOMBaseNode] = {}
+		self._element_tree: Optional[DOMElementNode] = None
+		self._selector_map: SelectorMap = {}
 
 	# region - Clickable elements
 	@time_execution_async('--get_clickable_elements')
@@ -40,20 +89,62 @@ class DomService:
 		highlight_elements: bool = True,
 		focus_element: int = -1,
 		viewport_expansion: int = 0,
+		incremental: bool = False,
+		wire_format: str = 'json',
 	) -> DOMState:
-		element_tree, selector_map = await self._build_dom_tree(highlight_elements, focus_element, viewport_expansion)
-		return DOMState(element_tree=element_tree, selector_map=selector_map)
+		"""
+		Extract the clickable elements of the page.
+
+		With `incremental=True` the extractor stays installed in the page and only rebuilds the subtrees
+		that changed since the previous call on this service. The previous element tree is patched in place.
+
+		`wire_format='columnar'` makes the extractor return the nodes as parallel arrays with a shared
+		string table instead of one object per node, which is cheaper to transfer and decode on large pages.
+		"""
+		snapshot = await self.get_page_snapshot(
+			highlight_elements, focus_element, viewport_expansion, incremental, wire_format, remove_highlights=False
+		)
+		return snapshot.dom_state
+
+	@time_execution_async('--get_page_snapshot')
+	async def get_page_snapshot(
+		self,
+		highlight_elements: bool = True,
+		focus_element: int = -1,
+		viewport_expansion: int = 0,
+		incremental: bool = False,
+		wire_format: str = 'json',
+		remove_highlights: bool = True,
+	) -> PageSnapshot:
+		"""
+		Extract the clickable elements of the page together with its scroll position, title and url in one round-trip.
+
+		With `remove_highlights=True` the highlights of the previous extraction are removed first, in the same call.
+		"""
+		eval_page = await self._evaluate_snapshot(
+			highlight_elements, focus_element, viewport_expansion, incremental, wire_format, remove_highlights
+		)
+		element_tree, selector_map = await self._construct_dom_tree(eval_page)
+
+		scroll_y, viewport_height, total_height = eval_page['scroll']
+		return PageSnapshot(
+			dom_state=DOMState(element_tree=element_tree, selector_map=selector_map),
+			url=eval_page['url'],
+			title=eval_page['title'],
+			pixels_above=scroll_y,
+			pixels_below=total_height - (scroll_y + viewport_height),
+		)
 
-	@time_execution_async('--build_dom_tree')
-	async def _build_dom_tree(
+	@time_execution_async('--evaluate_snapshot')
+	async def _evaluate_snapshot(
 		self,
 		highlight_elements: bool,
 		focus_element: int,
 		viewport_expansion: int,
-	) -> tuple[DOMElementNode, SelectorMap]:
-		if await self.page.evaluate('1+1') != 2:
-			raise ValueError('The page cannot evaluate javascript code properly')
-
+		incremental: bool = False,
+		wire_format: str = 'json',
+		remove_highlights: bool = False,
+	) -> dict:
 		# NOTE: We execute JS code in the browser to extract important DOM information.
 		#       The returned hash map contains information about the DOM tree and the
 		#       relationship between the DOM elements.
@@ -63,10 +154,24 @@ class DomService:
 			'focusHighlightIndex': focus_element,
 			'viewportExpansion': viewport_expansion,
 			'debugMode': debug_mode,
+			'incremental': incremental,
+			'wireFormat': wire_format,
+			'removeHighlights': remove_highlights,
 		}
 
+		await self._install_snapshot_script()
+
 		try:
-			eval_page = await self.page.evaluate(self.js_code, args)
+			# The extractor is installed in every document by the init script, only send its source when it is missing
+			eval_page = await self.page.evaluate(
+				f'(args) => {SNAPSHOT_FUNCTION} ? {SNAPSHOT_FUNCTION}(args) : null',
+				args,
+			)
+			if eval_page is None:
+				eval_page = await self.page.evaluate(
+					f'(args) => {{ {self.snapshot_script}; return {SNAPSHOT_FUNCTION}(args); }}',
+					args,
+				)
 		except Exception as e:
 			logger.error('Error evaluating JavaScript: %s', e)
 			raise
@@ -75,18 +180,42 @@ class DomService:
 		if debug_mode and 'perfMetrics' in eval_page:
 			logger.debug('DOM Tree Building Performance Metrics:\n%s', json.dumps(eval_page['perfMetrics'], indent=2))
 
-		return await self._construct_dom_tree(eval_page)
+		return eval_page
+
+	async def _install_snapshot_script(self) -> None:
+		"""Register the extractor once per page, so every document loaded in it already has it installed"""
+		if self.page in _pages_with_snapshot_script:
+			return
+
+		await self.page.add_init_script(self.snapshot_script)
+		_pages_with_snapshot_script.add(self.page)
 
 	@time_execution_async('--construct_dom_tree')
 	async def _construct_dom_tree(
 		self,
 		eval_page: dict,
 	) -> tuple[DOMElementNode, SelectorMap]:
-		js_node_map = eval_page['map']
-		js_root_id = eval_page['rootId']
+		if 'full' not in eval_page:
+			return self._construct_full_tree(eval_page)
 
-		selector_map = {}
-		node_map = {}
+		if eval_page['full'] or self._element_tree is None:
+			element_tree, selector_map = self._construct_full_tree(eval_page, keep_node_map=True)
+		else:
+			element_tree, selector_map = self._patch_dom_tree(eval_page)
+
+		self._element_tree = element_tree
+		self._selector_map = selector_map
+		return element_tree, selector_map
+
+	def _parse_nodes(self, eval_page: dict) -> dict[str, DOMBaseNode]:
+		if 'columns' in eval_page:
+			return self._parse_columnar_node_map(eval_page['columns'])
+		return self._parse_node_map(eval_page['map'])
+
+	def _parse_node_map(self, js_node_map: dict) -> dict[str, DOMBaseNode]:
+		"""Parse all nodes first and link them afterwards, so the order of the ids does not matter."""
+		node_map: dict[str, DOMBaseNode] = {}
+		children_map: dict[str, list] = {}
 
 		for id, node_data in js_node_map.items():
 			node, children_ids = self._parse_node(node_data)
@@ -94,30 +223,137 @@ class DomService:
 				continue
 
 			node_map[id] = node
+			if children_ids:
+				children_map[id] = children_ids
+
+		for id, children_ids in children_map.items():
+			node = node_map[id]
+			if not isinstance(node, DOMElementNode):
+				continue
+
+			for child_id in children_ids:
+				child_node = node_map.get(str(child_id))
+				if child_node is None:
+					continue
+
+				child_node.parent = node
+				node.children.append(child_node)
+
+		return node_map
+
+	def _parse_columnar_node_map(self, columns: dict) -> dict[str, DOMBaseNode]:
+		"""Decode the `columnar` wire format, where every node is a position in a set of parallel arrays."""
+		strings = columns['strings']
+		flags = columns['flags']
+		tags = columns['tags']
+		xpaths = columns['xpaths']
+		texts = columns['texts']
+		highlight_indices = columns['highlightIndices']
+		attribute_offsets = columns['attributeOffsets']
+		attributes = columns['attributes']
+		child_offsets = columns['childOffsets']
+		children = columns['children']
+
+		nodes_by_id: dict[int, DOMBaseNode] = {}
+		elements: list[tuple[DOMElementNode, int]] = []
+
+		for i, id in enumerate(columns['ids']):
+			flag = flags[i]
+
+			if flag & NODE_FLAG_TEXT:
+				nodes_by_id[id] = DOMTextNode(
+					text=strings[texts[i]],
+					is_visible=bool(flag & NODE_FLAG_VISIBLE),
+					parent=None,
+				)
+				continue
+
+			highlight_index = highlight_indices[i]
+			element_node = DOMElementNode(
+				tag_name=strings[tags[i]],
+				xpath=strings[xpaths[i]],
+				attributes={
+					strings[attributes[j]]: strings[attributes[j + 1]]
+					for j in range(attribute_offsets[i], attribute_offsets[i + 1], 2)
+				},
+				children=[],
+				is_visible=bool(flag & NODE_FLAG_VISIBLE),
+				is_interactive=bool(flag & NODE_FLAG_INTERACTIVE),
+				is_top_element=bool(flag & NODE_FLAG_TOP_ELEMENT),
+				is_in_viewport=bool(flag & NODE_FLAG_IN_VIEWPORT),
+				highlight_index=highlight_index if highlight_index >= 0 else None,
+				shadow_root=bool(flag & NODE_FLAG_SHADOW_ROOT),
+				parent=None,
+			)
+			nodes_by_id[id] = element_node
+			elements.append((element_node, i))
+
+		for element_node, i in elements:
+			for child_id in children[child_offsets[i] : child_offsets[i + 1]]:
+				child_node = nodes_by_id.get(child_id)
+				if child_node is None:
+					continue
+
+				child_node.parent = element_node
+				element_node.children.append(child_node)
 
+		return {str(id): node for id, node in nodes_by_id.items()}
+
+	def _construct_full_tree(self, eval_page: dict, keep_node_map: bool = False) -> tuple[DOMElementNode, SelectorMap]:
+		node_map = self._parse_nodes(eval_page)
+
+		selector_map = {}
+		for node in node_map.values():
 			if isinstance(node, DOMElementNode) and node.highlight_index is not None:
 				selector_map[node.highlight_index] = node
 
-			# NOTE: We know that we are building the tree bottom up
-			#       and all children are already processed.
-			if isinstance(node, DOMElementNode):
-				for child_id in children_ids:
-					if child_id not in node_map:
-						continue
+		html_to_dict = node_map.get(str(eval_page['rootId']))
 
-					child_node = node_map[child_id]
+		if keep_node_map:
+			self._node_map = node_map
 
-					child_node.parent = node
-					node.children.append(child_node)
+		if html_to_dict is None or not isinstance(html_to_dict, DOMElementNode):
+			raise ValueError('Failed to parse HTML to dictionary')
+
+		return html_to_dict, selector_map
+
+	def _patch_dom_tree(self, eval_page: dict) -> tuple[DOMElementNode, SelectorMap]:
+		"""Replace the rebuilt subtrees of the previous extraction with the new ones."""
+		new_nodes = self._parse_nodes(eval_page)
+		node_map = self._node_map
+		selector_map = dict(self._selector_map)
+
+		def forget(node: Optional[DOMBaseNode]) -> None:
+			if isinstance(node, DOMElementNode) and node.highlight_index is not None:
+				if selector_map.get(node.highlight_index) is node:
+					del selector_map[node.highlight_index]
 
-		html_to_dict = node_map[str(js_root_id)]
+		for id in eval_page.get('removed', []):
+			forget(node_map.pop(id, None))
 
-		del node_map
-		del js_node_map
-		del js_root_id
+		for id in new_nodes:
+			forget(node_map.get(id))
 
-		gc.collect()
+		for id in eval_page.get('dirtyRoots', []):
+			old_node = node_map.get(id)
+			new_node = new_nodes.get(id)
+			if old_node is None or new_node is None or old_node.parent is None:
+				continue
+
+			siblings = old_node.parent.children
+			for i, sibling in enumerate(siblings):
+				if sibling is old_node:
+					siblings[i] = new_node
+					new_node.parent = old_node.parent
+					break
+
+		node_map.update(new_nodes)
+
+		for node in new_nodes.values():
+			if isinstance(node, DOMElementNode) and node.highlight_index is not None:
+				selector_map[node.highlight_index] = node
 
+		html_to_dict = node_map.get(str(eval_page['rootId']))
 		if html_to_dict is None or not isinstance(html_to_dict, DOMElementNode):
 			raise ValueError('Failed to parse HTML to dictionary')
 
@@ -1,6 +1,5 @@
-from dataclasses import dataclass
-from functools import cached_property
-from typing import TYPE_CHECKING, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from browser_use.dom.history_tree_processor.view import CoordinateSet, HashedDomElement, ViewportInfo
 from browser_use.utils import time_execution_sync
@@ -10,14 +9,16 @@ if TYPE_CHECKING:
 	from .views import DOMElementNode
 
 
-@dataclass(frozen=False)
+# Nodes are slotted and compared by identity: a large page creates tens of thousands of them per step,
+# and field-wise equality would walk the `parent`/`children` references of the whole tree.
+@dataclass(frozen=False, slots=True, eq=False)
 class DOMBaseNode:
 	is_visible: bool
 	# Use None as default and set parent later to avoid circular reference issues
 	parent: Optional['DOMElementNode']
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True, eq=False)
 class DOMTextNode(DOMBaseNode):
 	text: str
 	type: str = 'TEXT_NODE'
@@ -43,7 +44,7 @@ class DOMTextNode(DOMBaseNode):
 		return self.parent.is_top_element
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True, eq=False)
 class DOMElementNode(DOMBaseNode):
 	"""
 	xpath: the xpath of the element from the last root node (shadow root or iframe OR document if no shadow root or iframe).
@@ -62,6 +63,8 @@ class DOMElementNode(DOMBaseNode):
 	viewport_coordinates: Optional[CoordinateSet] = None
 	page_coordinates: Optional[CoordinateSet] = None
 	viewport_info: Optional[ViewportInfo] = None
+	_hash: Optional[HashedDomElement] = field(default=None, init=False, repr=False)
+	_branch_path_hasher: Any = field(default=None, init=False, repr=False)
 
 	def __repr__(self) -> str:
 		tag_str = f'<{self.tag_name}'
@@ -89,13 +92,15 @@ class DOMElementNode(DOMBaseNode):
 
 		return tag_str
 
-	@cached_property
+	@property
 	def hash(self) -> HashedDomElement:
-		from browser_use.dom.history_tree_processor.service import (
-			HistoryTreeProcessor,
-		)
+		if self._hash is None:
+			from browser_use.dom.history_tree_processor.service import (
+				HistoryTreeProcessor,
+			)
 
-		return HistoryTreeProcessor._hash_dom_element(self)
+			self._hash = HistoryTreeProcessor._hash_dom_element(self)
+		return self._hash
 
 	def get_all_text_till_next_clickable_element(self, max_depth: int = -1) -> str:
 		text_parts = []
@@ -120,49 +125,71 @@ class DOMElementNode(DOMBaseNode):
 	@time_execution_sync('--clickable_elements_to_string')
 	def clickable_elements_to_string(self, include_attributes: list[str] = []) -> str:
 		"""Convert the processed DOM content to HTML."""
-		formatted_text = []
+		return '\n'.join(line for _, line in self.clickable_elements_to_lines(include_attributes))
 
-		def process_node(node: DOMBaseNode, depth: int) -> None:
+	def clickable_elements_to_lines(self, include_attributes: list[str] = []) -> list[tuple[Optional['DOMElementNode'], str]]:
+		"""The lines of `clickable_elements_to_string`, each with its highlighted element, or None for text lines"""
+		formatted_text: list[tuple[Optional[DOMElementNode], str]] = []
+
+		# Text nodes inside a highlighted element are part of that element's line, not listed on their own.
+		# `text_parts` collects the text of the nearest highlighted ancestor and is None outside of them.
+		def process_node(node: DOMBaseNode, text_parts: Optional[list[str]]) -> None:
 			if isinstance(node, DOMElementNode):
-				# Add element with highlight_index
-				if node.highlight_index is not None:
-					attributes_str = ''
-					text = node.get_all_text_till_next_clickable_element()
-					if include_attributes:
-						attributes = list(
-							set(
-								[
-									str(value)
-									for key, value in node.attributes.items()
-									if key in include_attributes and value != node.tag_name
-								]
-							)
+				if node.highlight_index is None:
+					for child in node.children:
+						process_node(child, text_parts)
+					return
+
+				# Reserve the line of the element, its text is only known once the children are processed
+				line_index = len(formatted_text)
+				formatted_text.append((node, ''))
+				own_text_parts: list[str] = []
+				for child in node.children:
+					process_node(child, own_text_parts)
+
+				text = '\n'.join(own_text_parts).strip()
+				attributes_str = ''
+				if include_attributes:
+					attributes = list(
+						set(
+							[
+								str(value)
+								for key, value in node.attributes.items()
+								if key in include_attributes and value != node.tag_name
+							]
 						)
-						if text in attributes:
-							attributes.remove(text)
-						attributes_str = ';'.join(attributes)
-					line = f'[{node.highlight_index}]<{node.tag_name} '
+					)
+					if text in attributes:
+						attributes.remove(text)
+					attributes_str = ';'.join(attributes)
+				line = f'[{node.highlight_index}]<{node.tag_name} '
+				if attributes_str:
+					line += f'{attributes_str}'
+				if text:
 					if attributes_str:
-						line += f'{attributes_str}'
-					if text:
-						if attributes_str:
-							line += f'>{text}'
-						else:
-							line += f'{text}'
-					line += '/>'
-					formatted_text.append(line)
-
-				# Process children regardless
-				for child in node.children:
-					process_node(child, depth + 1)
+						line += f'>{text}'
+					else:
+						line += f'{text}'
+				line += '/>'
+				formatted_text[line_index] = (node, line)
 
 			elif isinstance(node, DOMTextNode):
-				# Add text only if it doesn't have a highlighted parent
-				if not node.has_parent_with_highlight_index() and node.is_visible:  # and node.is_parent_top_element()
-					formatted_text.append(f'{node.text}')
+				if text_parts is not None:
+					text_parts.append(node.text)
+				elif node.is_visible:
+					formatted_text.append((None, f'{node.text}'))
 
-		process_node(self, 0)
-		return '\n'.join(formatted_text)
+		# The ancestors of this node can already be highlighted when serializing a subtree
+		inside_highlighted_element = False
+		current = self.parent
+		while current is not None:
+			if current.highlight_index is not None:
+				inside_highlighted_element = True
+				break
+			current = current.parent
+
+		process_node(self, [] if inside_highlighted_element else None)
+		return formatted_text
 
 	def get_file_upload_element(self, check_siblings: bool = True) -> Optional['DOMElementNode']:
 		# Check if current element is a file input
@@ -194,3 +221,24 @@ SelectorMap = dict[int, DOMElementNode]
 class DOMState:
 	element_tree: DOMElementNode
 	selector_map: SelectorMap
+	_hash_index: Optional[dict[HashedDomElement, DOMElementNode]] = field(default=None, init=False, repr=False, compare=False)
+
+	@property
+	def hash_index(self) -> dict[HashedDomElement, DOMElementNode]:
+		"""Highlighted elements by hash, built on first access"""
+		if self._hash_index is None:
+			from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+
+			self._hash_index = HistoryTreeProcessor.build_hash_index(self.selector_map)
+		return self._hash_index
+
+
+@dataclass
+class PageSnapshot:
+	"""Everything the extractor returns from the page in a single call"""
+
+	dom_state: DOMState
+	url: str
+	title: str
+	pixels_above: int
+	pixels_below: int
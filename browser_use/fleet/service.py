@@ -0,0 +1,403 @@
+"""
+Fleet of worker processes, each running a bounded number of agents on its own browser.
+
+In one process, every agent shares one event loop and one core for its DOM parsing, prompt building and
+GIF rendering. The fleet starts `workers` processes, each with its own `Browser`, and shards the tasks
+over them: a task goes to the least loaded worker that has a free agent slot, and waits in the fleet
+otherwise. `submit` waits while `max_queued` tasks are waiting. Crashed or unresponsive workers are
+restarted, and the tasks they were running are sent again.
+
+The agents are built in the workers by `agent_factory`, which is pickled to them: it has to be a
+module-level function. LLM clients and controllers are created there rather than sent over.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Literal, Optional
+
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.memory import get_rss_bytes
+from browser_use.fleet.views import FleetMetrics, FleetResult, FleetTask, WorkerMetrics
+
+if TYPE_CHECKING:
+	from browser_use.agent.service import Agent
+	from browser_use.browser.context import BrowserContext
+
+logger = logging.getLogger(__name__)
+
+AgentFactory = Callable[[FleetTask, 'BrowserContext'], 'Agent']
+
+
+@dataclass
+class FleetConfig:
+	"""
+	Configuration for the Fleet.
+
+	Default values:
+		workers: number of CPUs
+			Worker processes, each with its own browser
+
+		agents_per_worker: 4
+			Agents running at the same time in one worker
+
+		max_queued: 100
+			Tasks waiting for a free agent before `submit` waits
+
+		browser_config: BrowserConfig(headless=True)
+			Configuration of the browser of every worker
+
+		context_pool: True
+			Keep `agents_per_worker` warm browser contexts in every worker, recycled between tasks
+
+		max_task_attempts: 2
+			Times a task is sent to a worker when its worker crashes while running it
+
+		max_restarts: 10
+			Times a worker is restarted before it is given up
+
+		heartbeat_interval: 5.0
+			Seconds between the metrics a worker sends while it is running
+
+		heartbeat_timeout: 120.0
+			Seconds without a message after which a worker is considered hung and restarted
+
+		start_method: 'spawn'
+			Multiprocessing start method. Forking a process that already runs an event loop is not safe
+	"""
+
+	workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+	agents_per_worker: int = 4
+	max_queued: int = 100
+	browser_config: BrowserConfig = field(default_factory=lambda: BrowserConfig(headless=True))
+	context_pool: bool = True
+	max_task_attempts: int = 2
+	max_restarts: int = 10
+	heartbeat_interval: float = 5.0
+	heartbeat_timeout: float = 120.0
+	start_method: Literal['spawn', 'forkserver', 'fork'] = 'spawn'
+
+	def __post_init__(self):
+		if self.workers < 1 or self.agents_per_worker < 1 or self.max_queued < 1:
+			raise ValueError('workers, agents_per_worker and max_queued must be at least 1')
+
+
+@dataclass
+class _Submission:
+	task: FleetTask
+	future: asyncio.Future[FleetResult]
+	attempts: int = 0
+
+
+@dataclass
+class _Worker:
+	worker_id: int
+	process: BaseProcess
+	inbox: Any
+	# Every worker has its own pipe: a process killed while writing to a shared queue would leave it locked
+	connection: Connection
+	metrics: WorkerMetrics
+	last_seen: float = field(default_factory=time.monotonic)
+	in_flight: dict[str, _Submission] = field(default_factory=dict)
+	restarts: int = 0
+	given_up: bool = False
+
+
+class Fleet:
+	"""
+	Runs agents in worker processes.
+
+	Usage:
+		def make_agent(task: FleetTask, browser_context: BrowserContext) -> Agent:
+			return Agent(task=task.task, llm=ChatOpenAI(model='gpt-4o'), browser_context=browser_context)
+
+		async with Fleet(make_agent, FleetConfig(workers=16)) as fleet:
+			results = await fleet.run(FleetTask(task) for task in tasks)
+	"""
+
+	def __init__(self, agent_factory: AgentFactory, config: FleetConfig = FleetConfig()):
+		self.agent_factory = agent_factory
+		self.config = config
+
+		self._mp = multiprocessing.get_context(config.start_method)
+		self._workers: dict[int, _Worker] = {}
+		self._pending: deque[_Submission] = deque()
+		self._changed = asyncio.Condition()
+		self._monitor: Optional[asyncio.Task] = None
+		self._closed = False
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.close(wait=exc_type is None)
+
+	async def start(self):
+		"""Start the worker processes"""
+		if self._monitor is not None:
+			return
+		for worker_id in range(self.config.workers):
+			self._workers[worker_id] = self._start_worker(worker_id)
+		self._monitor = asyncio.create_task(self._run_monitor())
+
+	async def submit(self, task: FleetTask) -> asyncio.Future[FleetResult]:
+		"""Queue a task, waiting while `max_queued` tasks are queued. Returns the future of its result."""
+		if self._monitor is None:
+			await self.start()
+
+		async with self._changed:
+			await self._changed.wait_for(lambda: self._closed or len(self._pending) < self.config.max_queued)
+			if self._closed:
+				raise RuntimeError('Fleet is closed')
+			future: asyncio.Future[FleetResult] = asyncio.get_running_loop().create_future()
+			self._pending.append(_Submission(task=task, future=future))
+			self._dispatch()
+		return future
+
+	async def run(self, tasks: Iterable[FleetTask]) -> list[FleetResult]:
+		"""Run the tasks and return their results in the same order"""
+		futures = [await self.submit(task) for task in tasks]
+		return list(await asyncio.gather(*futures))
+
+	def metrics(self) -> FleetMetrics:
+		"""Latest metrics of every worker, with the number of tasks waiting in the fleet"""
+		workers = [
+			replace(worker.metrics, restarts=worker.restarts, assigned=len(worker.in_flight)) for worker in self._workers.values()
+		]
+		return FleetMetrics(workers=workers, queued=len(self._pending), restarts=sum(w.restarts for w in self._workers.values()))
+
+	async def close(self, wait: bool = True):
+		"""Stop the workers, after the submitted tasks are done if `wait`"""
+		if wait:
+			futures = [s.future for s in self._pending] + [s.future for w in self._workers.values() for s in w.in_flight.values()]
+			await asyncio.gather(*futures, return_exceptions=True)
+
+		async with self._changed:
+			self._closed = True
+			self._changed.notify_all()
+
+		if self._monitor is not None:
+			self._monitor.cancel()
+			try:
+				await self._monitor
+			except asyncio.CancelledError:
+				pass
+
+		for worker in self._workers.values():
+			if worker.process.is_alive():
+				worker.inbox.put(None)
+		await asyncio.gather(*(asyncio.to_thread(self._stop_worker, worker) for worker in self._workers.values()))
+
+		error = 'Fleet closed before the task ran'
+		for submission in list(self._pending) + [s for w in self._workers.values() for s in w.in_flight.values()]:
+			if not submission.future.done():
+				submission.future.set_result(FleetResult(task_id=submission.task.task_id, worker_id=-1, error=error))
+		self._pending.clear()
+
+	def _start_worker(self, worker_id: int, restarts: int = 0) -> _Worker:
+		inbox = self._mp.Queue()
+		connection, worker_connection = self._mp.Pipe(duplex=False)
+		process = self._mp.Process(
+			target=_worker_main,
+			args=(worker_id, self.agent_factory, self.config, inbox, worker_connection),
+			name=f'browser-use-worker-{worker_id}',
+			daemon=True,
+		)
+		process.start()
+		# Only the worker writes to the pipe, so that reading from it ends when the worker exits
+		worker_connection.close()
+		logger.debug(f'Started fleet worker {worker_id} with pid {process.pid}')
+		return _Worker(
+			worker_id=worker_id,
+			process=process,
+			inbox=inbox,
+			connection=connection,
+			metrics=WorkerMetrics(worker_id=worker_id, pid=process.pid or 0),
+			restarts=restarts,
+		)
+
+	def _stop_worker(self, worker: _Worker):
+		worker.process.join(timeout=30)
+		if worker.process.is_alive():
+			worker.process.kill()
+			worker.process.join()
+		worker.connection.close()
+
+	def _dispatch(self):
+		"""Send the queued tasks to the least loaded workers with a free agent slot. Called under `_changed`."""
+		workers = [worker for worker in self._workers.values() if not worker.given_up]
+		while self._pending and workers:
+			worker = min(workers, key=lambda w: len(w.in_flight))
+			if len(worker.in_flight) >= self.config.agents_per_worker:
+				break
+			submission = self._pending.popleft()
+			if submission.future.done():
+				continue
+			submission.attempts += 1
+			worker.in_flight[submission.task.task_id] = submission
+			worker.inbox.put(submission.task)
+
+		if not workers:
+			# Every worker was given up, nothing can run the queued tasks
+			while self._pending:
+				self._fail(self._pending.popleft(), 'No fleet worker left to run the task')
+		self._changed.notify_all()
+
+	async def _run_monitor(self):
+		"""Collect the messages of the workers and restart the crashed and hung ones"""
+		while True:
+			workers = {worker.connection: worker for worker in self._workers.values() if not worker.given_up}
+			ready = await asyncio.to_thread(wait, list(workers), 0.5)
+
+			async with self._changed:
+				for connection in ready:
+					self._receive(workers[connection])
+				self._check_workers()
+				self._dispatch()
+
+	def _receive(self, worker: _Worker):
+		try:
+			while worker.connection.poll():
+				kind, payload = worker.connection.recv()
+				self._handle_message(worker, kind, payload)
+		except (EOFError, OSError):
+			# The worker exited, `_check_workers` restarts it
+			pass
+
+	def _handle_message(self, worker: _Worker, kind: str, payload: Any):
+		worker.last_seen = time.monotonic()
+		if kind == 'heartbeat':
+			worker.metrics = payload
+		elif kind == 'result':
+			result, worker.metrics = payload
+			submission = worker.in_flight.pop(result.task_id, None)
+			if submission is not None and not submission.future.done():
+				result.attempts = submission.attempts
+				submission.future.set_result(result)
+
+	def _check_workers(self):
+		now = time.monotonic()
+		for worker_id, worker in list(self._workers.items()):
+			if worker.given_up:
+				continue
+			alive = worker.process.is_alive()
+			if alive and now - worker.last_seen < self.config.heartbeat_timeout:
+				continue
+
+			if alive:
+				logger.warning(f'Fleet worker {worker_id} sent nothing for {self.config.heartbeat_timeout}s, restarting it')
+				worker.process.kill()
+				worker.process.join()
+			else:
+				logger.warning(f'Fleet worker {worker_id} exited with code {worker.process.exitcode}, restarting it')
+
+			# Send the tasks it was running again, ahead of the queued ones
+			for submission in reversed(list(worker.in_flight.values())):
+				if submission.attempts >= self.config.max_task_attempts:
+					self._fail(submission, f'Fleet worker crashed while running the task, {submission.attempts} attempts')
+				else:
+					self._pending.appendleft(submission)
+			worker.in_flight.clear()
+			worker.connection.close()
+
+			if worker.restarts >= self.config.max_restarts:
+				logger.error(f'Fleet worker {worker_id} crashed {worker.restarts + 1} times, giving it up')
+				worker.given_up = True
+				continue
+			self._workers[worker_id] = self._start_worker(worker_id, restarts=worker.restarts + 1)
+
+	def _fail(self, submission: _Submission, error: str):
+		if not submission.future.done():
+			result = FleetResult(task_id=submission.task.task_id, worker_id=-1, attempts=submission.attempts, error=error)
+			submission.future.set_result(result)
+
+
+def _worker_main(worker_id: int, agent_factory: AgentFactory, config: FleetConfig, inbox: Any, connection: Connection):
+	"""Entry point of a worker process"""
+	asyncio.run(_run_worker(worker_id, agent_factory, config, inbox, connection))
+
+
+async def _run_worker(worker_id: int, agent_factory: AgentFactory, config: FleetConfig, inbox: Any, connection: Connection):
+	from browser_use.browser.browser import Browser
+	from browser_use.browser.context import BrowserContext
+	from browser_use.browser.pool import BrowserContextPool, BrowserContextPoolConfig
+
+	metrics = WorkerMetrics(worker_id=worker_id, pid=os.getpid())
+	browser = Browser(config=config.browser_config)
+	context_config = config.browser_config.new_context_config
+	pool = None
+	if config.context_pool:
+		pool_config = BrowserContextPoolConfig(min_size=config.agents_per_worker, max_size=config.agents_per_worker)
+		pool = BrowserContextPool(browser, pool_config, context_config=context_config)
+
+	def send(kind: str, payload: Any):
+		connection.send((kind, payload))
+
+	def snapshot() -> WorkerMetrics:
+		metrics.rss_bytes = get_rss_bytes()
+		return replace(metrics)
+
+	async def heartbeat():
+		while True:
+			send('heartbeat', snapshot())
+			await asyncio.sleep(config.heartbeat_interval)
+
+	async def run_agent(task: FleetTask, browser_context: BrowserContext):
+		agent = agent_factory(task, browser_context)
+		return await agent.run(max_steps=task.max_steps)
+
+	async def run_task(task: FleetTask):
+		metrics.running += 1
+		start = time.monotonic()
+		try:
+			if pool is not None:
+				async with pool.lease() as browser_context:
+					history = await run_agent(task, browser_context)
+			else:
+				browser_context = BrowserContext(browser=browser, config=context_config)
+				try:
+					history = await run_agent(task, browser_context)
+				finally:
+					await browser_context.close()
+			result = FleetResult.from_history(task.task_id, worker_id, history, time.monotonic() - start)
+			metrics.tasks_completed += 1
+		except Exception as e:
+			logger.error(f'Task {task.task_id} failed in fleet worker {worker_id}: {type(e).__name__}: {e}')
+			result = FleetResult(
+				task_id=task.task_id,
+				worker_id=worker_id,
+				duration_seconds=time.monotonic() - start,
+				error=f'{type(e).__name__}: {e}',
+			)
+			metrics.tasks_failed += 1
+		metrics.running -= 1
+		metrics.busy_seconds += result.duration_seconds
+		send('result', (result, snapshot()))
+
+	heartbeat_task = asyncio.create_task(heartbeat())
+	running: set[asyncio.Task] = set()
+	try:
+		if pool is not None:
+			await pool.start()
+		while True:
+			task = await asyncio.to_thread(inbox.get)
+			if task is None:
+				break
+			running_task = asyncio.create_task(run_task(task))
+			running.add(running_task)
+			running_task.add_done_callback(running.discard)
+		await asyncio.gather(*running)
+	finally:
+		heartbeat_task.cancel()
+		if pool is not None:
+			await pool.close()
+		await browser.close()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+	from browser_use.agent.views import AgentHistoryList
+
+
+@dataclass
+class FleetTask:
+	"""A task for one agent of the fleet. It is pickled to the worker process, so `payload` must be picklable."""
+
+	task: str
+	max_steps: int = 100
+	payload: dict[str, Any] = field(default_factory=dict)
+	task_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+
+@dataclass
+class FleetResult:
+	"""Outcome of a task. The full history stays in the worker, use `save_history_path` to keep it."""
+
+	task_id: str
+	worker_id: int
+	is_done: bool = False
+	is_successful: Optional[bool] = None
+	final_result: Optional[str] = None
+	errors: list[str] = field(default_factory=list)
+	n_steps: int = 0
+	total_input_tokens: int = 0
+	duration_seconds: float = 0.0
+	attempts: int = 1
+	# Set when the agent could not run, or its worker crashed on every attempt
+	error: Optional[str] = None
+
+	@classmethod
+	def from_history(cls, task_id: str, worker_id: int, history: AgentHistoryList, duration_seconds: float) -> FleetResult:
+		return cls(
+			task_id=task_id,
+			worker_id=worker_id,
+			is_done=history.is_done(),
+			is_successful=history.is_successful(),
+			final_result=history.final_result(),
+			errors=[error for error in history.errors() if error],
+			n_steps=history.number_of_steps(),
+			total_input_tokens=history.total_input_tokens(),
+			duration_seconds=duration_seconds,
+		)
+
+
+@dataclass
+class WorkerMetrics:
+	"""Counters of one worker process, sent with every result and heartbeat"""
+
+	worker_id: int
+	pid: int
+	tasks_completed: int = 0
+	tasks_failed: int = 0
+	running: int = 0
+	busy_seconds: float = 0.0
+	rss_bytes: Optional[int] = None
+	# Set by the fleet
+	restarts: int = 0
+	assigned: int = 0
+
+
+@dataclass
+class FleetMetrics:
+	workers: list[WorkerMetrics]
+	queued: int
+	restarts: int
+
+	@property
+	def tasks_completed(self) -> int:
+		return sum(worker.tasks_completed for worker in self.workers)
+
+	@property
+	def tasks_failed(self) -> int:
+		return sum(worker.tasks_failed for worker in self.workers)
+
+	@property
+	def running(self) -> int:
+		return sum(worker.running for worker in self.workers)
+
+	@property
+	def rss_bytes(self) -> int:
+		return sum(worker.rss_bytes or 0 for worker in self.workers)
@@ -0,0 +1,111 @@
+"""
+Tests for running a batch of agents with shared resources.
+
+@dev You can run this test with: pytest tests/test_batch.py
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from pydantic import BaseModel
+
+from browser_use.agent.batch import AgentBatch, BatchMetrics, BatchResult
+from browser_use.agent.views import ActionResult, AgentHistory, AgentHistoryList, StepMetadata
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.views import BrowserStateHistory
+from browser_use.controller.service import Controller
+
+
+class RecordingBatch(AgentBatch):
+	"""Runs fake agents that take `steps` steps of 0.1 seconds, and records how many run at a time"""
+
+	running = 0
+	max_running = 0
+
+	async def _run_agent(self, task, browser, browser_context):
+		self.running += 1
+		self.max_running = max(self.max_running, self.running)
+		try:
+			steps = int(task.split()[-1])
+			await asyncio.sleep(0.05 * steps)
+			if steps == 0:
+				raise RuntimeError('browser crashed')
+			state = BrowserStateHistory(url='', title='', tabs=[], interacted_element=[])
+			return AgentHistoryList(
+				history=[
+					AgentHistory(
+						model_output=None,
+						result=[ActionResult(is_done=step == steps - 1)],
+						state=state,
+						metadata=StepMetadata(
+							step_start_time=0, step_end_time=0.1 * (step + 1), input_tokens=100, step_number=step
+						),
+					)
+					for step in range(steps)
+				]
+			)
+		finally:
+			self.running -= 1
+
+
+def _batch(tasks: list[str], **kwargs) -> RecordingBatch:
+	# A browser that is never launched: the fake agents do not use their context, which is only opened on use
+	browser = Browser(BrowserConfig())
+	return RecordingBatch(tasks, llm=FakeListChatModel(responses=['']), browser=browser, reuse_browser_contexts=False, **kwargs)
+
+
+async def test_results_are_streamed_as_tasks_finish():
+	batch = _batch(['steps 4', 'steps 1', 'steps 0', 'steps 2'], max_concurrent_agents=4)
+
+	results = [result async for result in batch.stream()]
+	assert [result.index for result in results] == [2, 1, 3, 0]
+	assert results[0].history is None and results[0].error == 'RuntimeError: browser crashed'
+	assert batch.max_running == 4
+
+
+async def test_concurrency_limit_and_metrics():
+	batch = _batch([f'steps {i % 3 + 1}' for i in range(9)], max_concurrent_agents=2)
+
+	results = await batch.run()
+	assert [result.task for result in results] == batch.tasks
+	assert batch.max_running == 2
+
+	metrics = batch.metrics
+	assert metrics.tasks_completed == 9 and metrics.steps == 18
+	assert metrics.input_tokens == 1800
+	assert metrics.p50_step_latency == pytest.approx(0.1) and metrics.p95_step_latency == pytest.approx(0.3)
+	assert metrics.tasks_per_minute > 0
+
+
+def test_percentiles_of_failed_tasks():
+	metrics = BatchMetrics()
+	metrics.record(BatchResult(index=0, task='task', history=None, error='failed'))
+	assert metrics.tasks_failed == 1 and metrics.p95_step_latency is None
+
+
+def test_agents_share_the_controller_and_its_action_models():
+	batch = AgentBatch(['a', 'b'], llm=FakeListChatModel(responses=['']), max_concurrent_llm_calls=2)
+	browser = Browser(BrowserConfig())
+	agents = [batch._create_agent(task, browser, None) for task in batch.tasks]  # type: ignore
+
+	assert agents[0].controller is agents[1].controller is batch.controller
+	assert agents[0].ActionModel is agents[1].ActionModel
+	assert agents[0].AgentOutput is agents[1].AgentOutput
+	assert agents[0].llm_semaphore is agents[1].llm_semaphore is not None
+
+
+def test_action_model_is_rebuilt_after_registering_an_action():
+	controller = Controller()
+	action_model = controller.registry.create_action_model()
+	assert controller.registry.create_action_model() is action_model
+
+	class Params(BaseModel):
+		text: str
+
+	@controller.action('Echo a text', param_model=Params)
+	async def echo(params: Params):
+		return ActionResult(extracted_content=params.text)
+
+	assert 'echo' in controller.registry.create_action_model().model_fields
+	assert 'echo' not in action_model.model_fields
@@ -0,0 +1,137 @@
+"""
+Tests for compacting the older steps of the message history into a summary.
+
+@dev You can run this test with: pytest tests/test_compaction.py
+"""
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from browser_use.agent.message_manager.compaction import SUMMARY_HEADER, merge_summaries
+from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
+from browser_use.agent.message_manager.tokens import EstimateTokenCounter
+from browser_use.agent.prompts import ELEMENTS_BASELINE_HEADER
+from browser_use.agent.views import MessageManagerState
+
+
+def _message_manager(**settings) -> MessageManager:
+	return MessageManager(
+		task='Find the cheapest flight',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(
+			max_input_tokens=2000, compaction_keep_steps=2, compaction_summary_max_chars=1500, **settings
+		),
+		state=MessageManagerState(),
+		token_counter=EstimateTokenCounter(),
+	)
+
+
+def _add_step(message_manager: MessageManager, step: int) -> None:
+	tool_call = {
+		'name': 'AgentOutput',
+		'args': {
+			'current_state': {
+				'evaluation_previous_goal': 'Success',
+				'memory': f'Visited {step} pages',
+				'next_goal': f'Open result {step}',
+			},
+			'action': [{'click_element': {'index': step}}],
+		},
+		'id': str(message_manager.state.tool_id),
+		'type': 'tool_call',
+	}
+	message_manager._add_message_with_tokens(AIMessage(content='', tool_calls=[tool_call]))
+	message_manager.add_tool_message(content='')
+	message_manager._add_message_with_tokens(HumanMessage(content=f'Action result: price {step} ' + 'x' * 300))
+
+
+def _tool_calls_are_answered(message_manager: MessageManager) -> bool:
+	messages = message_manager.get_messages()
+	return all(
+		isinstance(next_message, ToolMessage) and next_message.tool_call_id == message.tool_calls[0]['id']
+		for message, next_message in zip(messages, messages[1:])
+		if isinstance(message, AIMessage) and message.tool_calls
+	)
+
+
+async def test_history_stays_bounded():
+	message_manager = _message_manager(compaction_threshold=0.5)
+	init_messages = message_manager.state.init_messages
+
+	for step in range(40):
+		_add_step(message_manager, step)
+		await message_manager.compact_history()
+		assert message_manager.state.history.current_tokens < 1500
+
+	messages = message_manager.get_messages()
+	assert messages[:init_messages] == [m.message for m in message_manager.state.history.messages[:init_messages]]
+	assert messages[init_messages].content.startswith(SUMMARY_HEADER)
+	assert 'Memory after these steps: Visited 37 pages' in messages[init_messages].content
+	# The last steps are kept as they are
+	assert messages[-1].content.startswith('Action result: price 39')
+	assert _tool_calls_are_answered(message_manager)
+	assert message_manager.state.history.current_tokens == sum(m.metadata.tokens for m in message_manager.state.history.messages)
+
+
+async def test_no_compaction_below_threshold_or_by_default():
+	for settings in [{'compaction_threshold': 0.99}, {}]:
+		message_manager = _message_manager(**settings)
+		for step in range(3):
+			_add_step(message_manager, step)
+		assert not await message_manager.compact_history()
+
+
+async def test_new_task_is_kept_verbatim():
+	message_manager = _message_manager(compaction_threshold=0.5)
+	init_messages = message_manager.state.init_messages
+	new_task = 'Also book a hotel near the airport for the night of the arrival, ' + 'and check the cancellation policy ' * 20
+
+	_add_step(message_manager, 0)
+	message_manager.add_new_task(new_task)
+	for step in range(1, 40):
+		_add_step(message_manager, step)
+		await message_manager.compact_history()
+
+	messages = message_manager.get_messages()
+	assert messages[init_messages].content.startswith(SUMMARY_HEADER)
+	assert new_task not in messages[init_messages].content
+	assert [m.content for m in messages if new_task in m.content] == [messages[init_messages + 1].content]
+	assert message_manager.state.history.current_tokens == sum(m.metadata.tokens for m in message_manager.state.history.messages)
+
+
+async def test_browser_states_are_left_out_of_the_summary():
+	message_manager = _message_manager(compaction_threshold=0.1)
+	message_manager._add_message_with_tokens(
+		HumanMessage(content=f'{ELEMENTS_BASELINE_HEADER}\nCurrent url: https://flights.example.com\n[1]<button>Search</button>'),
+		kind='elements',
+	)
+	_add_step(message_manager, 0)
+	message_manager._add_message_with_tokens(
+		HumanMessage(content='Current url: https://flights.example.com/results'), kind='state'
+	)
+	for step in range(1, 4):
+		_add_step(message_manager, step)
+
+	assert await message_manager.compact_history()
+	assert 'Action result: price 0' in message_manager.state.summary
+	assert 'flights.example.com' not in message_manager.state.summary
+
+
+async def test_summary_from_llm():
+	message_manager = _message_manager(compaction_threshold=0.1)
+	message_manager.summarizer_llm = FakeListChatModel(responses=['Compared the prices of 3 flights.'])
+	for step in range(4):
+		_add_step(message_manager, step)
+
+	assert await message_manager.compact_history()
+	assert message_manager.state.summary == 'Compared the prices of 3 flights.'
+
+
+def test_merge_summaries_drops_oldest_lines():
+	summary = merge_summaries(None, [f'- step {i}' for i in range(10)] + ['Memory after these steps: a'], max_chars=60)
+	summary = merge_summaries(summary, ['- step 10', 'Memory after these steps: b'], max_chars=60)
+
+	lines = summary.splitlines()
+	assert lines[0] == '... earlier steps omitted ...'
+	assert lines[-2:] == ['- step 10', 'Memory after these steps: b']
+	assert 'Memory after these steps: a' not in lines
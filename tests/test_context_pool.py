@@ -0,0 +1,176 @@
+"""
+Tests for the pool of warm browser contexts.
+
+@dev You can run this test with: pytest tests/test_context_pool.py
+"""
+
+import asyncio
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.context import BrowserContextConfig
+from browser_use.browser.pool import BrowserContextPool, BrowserContextPoolConfig
+
+
+class FakePage:
+	def __init__(self, context: 'FakeContext'):
+		self.context = context
+		self.url = 'about:blank'
+		self.closed = False
+
+	def on(self, event, listener):
+		pass
+
+	def is_closed(self):
+		return self.closed
+
+	async def bring_to_front(self):
+		pass
+
+	async def wait_for_load_state(self, state='load'):
+		pass
+
+	async def evaluate(self, script):
+		if not self.context.responsive:
+			await asyncio.sleep(10)
+		return 1
+
+	async def close(self):
+		self.closed = True
+		self.context.pages.remove(self)
+		self.context.events.append('close page')
+
+
+class FakeCDPSession:
+	def __init__(self, context: 'FakeContext'):
+		self.context = context
+
+	async def send(self, method, params):
+		self.context.cleared_origins.append(params['origin'])
+		self.context.events.append('clear storage')
+
+	async def detach(self):
+		pass
+
+
+class FakeContext:
+	def __init__(self):
+		self.pages: list[FakePage] = []
+		self.listeners = defaultdict(list)
+		self.cookies = ['session=1']
+		self.cleared_origins: list[str] = []
+		self.events: list[str] = []
+		self.responsive = True
+		self.closed = False
+
+	def on(self, event, listener):
+		self.listeners[event].append(listener)
+
+	def remove_listener(self, event, listener):
+		self.listeners[event].remove(listener)
+
+	async def add_init_script(self, script):
+		pass
+
+	async def new_page(self):
+		page = FakePage(self)
+		self.pages.append(page)
+		return page
+
+	async def new_cdp_session(self, page):
+		return FakeCDPSession(self)
+
+	async def clear_cookies(self):
+		self.cookies = []
+
+	async def clear_permissions(self):
+		pass
+
+	async def close(self):
+		self.closed = True
+
+	def visit(self, url: str):
+		for listener in self.listeners['request']:
+			listener(SimpleNamespace(url=url, resource_type='document'))
+
+
+class FakeBrowser:
+	"""The part of the Browser the pool and its contexts use"""
+
+	def __init__(self):
+		self.config = BrowserConfig(new_context_config=BrowserContextConfig())
+		self.contexts: list[FakeContext] = []
+
+	async def get_playwright_browser(self):
+		return self
+
+	async def new_context(self, **kwargs):
+		context = FakeContext()
+		self.contexts.append(context)
+		return context
+
+
+def _pool(**config) -> tuple[BrowserContextPool, FakeBrowser]:
+	browser = FakeBrowser()
+	return BrowserContextPool(browser, BrowserContextPoolConfig(**config)), browser  # type: ignore
+
+
+async def test_contexts_are_warm_and_reset_between_tasks():
+	pool, browser = _pool(min_size=2, max_size=2)
+	await pool.start()
+	assert len(browser.contexts) == 2 and pool.idle == 2
+
+	async with pool.lease() as context:
+		playwright_context = context.session.context
+		first_page = playwright_context.pages[0]
+		await playwright_context.new_page()
+		playwright_context.visit('https://shop.example.com/cart?item=1')
+		playwright_context.visit('data:text/html,<p>')
+
+	# No new context was created, and nothing of the task is left in the reused one
+	assert len(browser.contexts) == 2 and pool.idle == 2
+	assert playwright_context.cleared_origins == ['https://shop.example.com']
+	assert playwright_context.cookies == []
+	assert first_page.closed and len(playwright_context.pages) == 1
+	assert context.session.cached_state is None
+	# The pages of the task are closed first, so that they cannot write the storage again
+	assert playwright_context.events == ['close page', 'close page', 'clear storage']
+
+	await pool.close()
+	assert all(context.closed for context in browser.contexts)
+	# The listeners of the closed BrowserContexts are removed
+	assert not any(playwright_context.listeners.values())
+
+
+async def test_acquire_waits_when_the_pool_is_full():
+	pool, browser = _pool(min_size=0, max_size=1, acquire_timeout=0.1)
+	context = await pool.acquire()
+	with pytest.raises(asyncio.TimeoutError):
+		await pool.acquire()
+
+	pool.config.acquire_timeout = None
+	waiting = asyncio.ensure_future(pool.acquire())
+	await asyncio.sleep(0)
+	assert not waiting.done()
+
+	await pool.release(context)
+	assert await waiting is context
+	assert len(browser.contexts) == 1
+
+
+async def test_broken_and_used_up_contexts_are_replaced():
+	pool, browser = _pool(min_size=1, max_size=1, max_uses=2, health_check_timeout=0.05)
+
+	context = await pool.acquire()
+	context.session.context.responsive = False
+	await pool.release(context)
+	assert browser.contexts[0].closed and len(browser.contexts) == 2
+
+	for _ in range(2):
+		async with pool.lease():
+			pass
+	assert browser.contexts[1].closed and len(browser.contexts) == 3
+	assert pool.size == pool.idle == 1
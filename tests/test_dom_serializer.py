@@ -0,0 +1,149 @@
+"""
+Tests and benchmark for serializing the element tree into the text the LLM sees.
+
+@dev You can run this test with: pytest tests/test_dom_serializer.py -s
+"""
+
+import random
+import time
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, DOMTextNode
+
+INCLUDE_ATTRIBUTES = ['title', 'type', 'name', 'role', 'aria-label', 'placeholder', 'value']
+
+
+def _legacy_clickable_elements_to_string(root: DOMElementNode, include_attributes: list[str] = []) -> str:
+	"""Previous implementation, which walks the tree again for every highlighted element and text node"""
+	formatted_text = []
+
+	def process_node(node: DOMBaseNode) -> None:
+		if isinstance(node, DOMElementNode):
+			if node.highlight_index is not None:
+				attributes_str = ''
+				text = node.get_all_text_till_next_clickable_element()
+				if include_attributes:
+					attributes = list(
+						set(
+							[
+								str(value)
+								for key, value in node.attributes.items()
+								if key in include_attributes and value != node.tag_name
+							]
+						)
+					)
+					if text in attributes:
+						attributes.remove(text)
+					attributes_str = ';'.join(attributes)
+				line = f'[{node.highlight_index}]<{node.tag_name} '
+				if attributes_str:
+					line += f'{attributes_str}'
+				if text:
+					if attributes_str:
+						line += f'>{text}'
+					else:
+						line += f'{text}'
+				line += '/>'
+				formatted_text.append(line)
+
+			for child in node.children:
+				process_node(child)
+
+		elif isinstance(node, DOMTextNode):
+			if not node.has_parent_with_highlight_index() and node.is_visible:
+				formatted_text.append(f'{node.text}')
+
+	process_node(root)
+	return '\n'.join(formatted_text)
+
+
+def _element(parent: DOMElementNode | None, tag: str, highlight_index: int | None = None, **attributes: str) -> DOMElementNode:
+	node = DOMElementNode(
+		is_visible=True,
+		parent=parent,
+		tag_name=tag,
+		xpath=tag,
+		attributes=attributes,
+		children=[],
+		highlight_index=highlight_index,
+	)
+	if parent is not None:
+		parent.children.append(node)
+	return node
+
+
+def _text(parent: DOMElementNode, text: str, is_visible: bool = True) -> DOMTextNode:
+	node = DOMTextNode(is_visible=is_visible, parent=parent, text=text)
+	parent.children.append(node)
+	return node
+
+
+def _random_tree(seed: int, n_nodes: int) -> DOMElementNode:
+	rng = random.Random(seed)
+	root = _element(None, 'body')
+	elements = [root]
+	highlight_index = 0
+
+	for i in range(n_nodes):
+		parent = rng.choice(elements)
+		kind = rng.random()
+		if kind < 0.35:
+			_text(parent, rng.choice(['Open', ' Close ', 'menu', '', 'Sign in\n']), is_visible=rng.random() > 0.1)
+		elif kind < 0.6:
+			element = _element(parent, 'button', highlight_index, title=rng.choice(['Open', 'button', 'Go']), type='button')
+			highlight_index += 1
+			elements.append(element)
+		else:
+			elements.append(_element(parent, rng.choice(['div', 'span', 'li']), role=rng.choice(['menu', 'list'])))
+
+	return root
+
+
+def _nested_tree(depth: int, width: int) -> DOMElementNode:
+	"""A chain of `depth` nested containers, every level holding `width` texts and highlighted links"""
+	root = _element(None, 'body')
+	current = root
+	highlight_index = 0
+	for level in range(depth):
+		for i in range(width):
+			_text(current, f'text {level}.{i}')
+			link = _element(current, 'a', highlight_index, title=f'link {level}.{i}')
+			highlight_index += 1
+			_text(link, f'label {level}.{i}')
+		current = _element(current, 'div')
+	return root
+
+
+def test_output_matches_previous_implementation():
+	for seed in range(20):
+		root = _random_tree(seed, 300)
+		assert root.clickable_elements_to_string() == _legacy_clickable_elements_to_string(root)
+		assert root.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == _legacy_clickable_elements_to_string(
+			root, INCLUDE_ATTRIBUTES
+		)
+
+
+def test_subtree_below_highlighted_element():
+	root = _element(None, 'body')
+	button = _element(root, 'button', 0)
+	span = _element(button, 'span')
+	_text(span, 'Inside')
+	_text(root, 'Outside')
+
+	assert span.clickable_elements_to_string() == _legacy_clickable_elements_to_string(span) == ''
+	assert root.clickable_elements_to_string() == '[0]<button Inside/>\nOutside'
+
+
+def test_benchmark_deep_and_wide_trees():
+	for name, root in [('deep', _nested_tree(depth=600, width=5)), ('wide', _nested_tree(depth=5, width=3000))]:
+		start = time.perf_counter()
+		legacy = _legacy_clickable_elements_to_string(root, INCLUDE_ATTRIBUTES)
+		legacy_time = time.perf_counter() - start
+
+		start = time.perf_counter()
+		current = root.clickable_elements_to_string(INCLUDE_ATTRIBUTES)
+		current_time = time.perf_counter() - start
+
+		print(f'{name} tree: legacy {legacy_time * 1000:.1f}ms, single pass {current_time * 1000:.1f}ms')
+		assert current == legacy
+		if name == 'deep':
+			assert current_time < legacy_time
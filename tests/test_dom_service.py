@@ -0,0 +1,232 @@
+"""
+Tests for building the element tree from the output of buildDomTree.js.
+
+@dev You can run this test with: pytest tests/test_dom_service.py
+"""
+
+from browser_use.dom.service import DomService
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+def _element(tag: str, xpath: str, children: list[str], highlight_index: int | None = None) -> dict:
+	node = {'tagName': tag, 'xpath': xpath, 'attributes': {}, 'children': children, 'isVisible': True}
+	if highlight_index is not None:
+		node['highlightIndex'] = highlight_index
+		node['isInteractive'] = True
+	return node
+
+
+def _text(text: str) -> dict:
+	return {'type': 'TEXT_NODE', 'text': text, 'isVisible': True}
+
+
+def _initial_page() -> dict:
+	return {
+		'rootId': '0',
+		'full': True,
+		'dirtyRoots': [],
+		'removed': [],
+		'map': {
+			'0': _element('body', '/body', ['1', '4']),
+			'1': _element('div', 'body/div[1]', ['2']),
+			'2': _element('button', 'body/div[1]/button', ['3'], highlight_index=0),
+			'3': _text('Open'),
+			'4': _element('div', 'body/div[2]', ['5']),
+			'5': _element('a', 'body/div[2]/a', [], highlight_index=1),
+		},
+	}
+
+
+async def test_construct_tree_independent_of_id_order():
+	eval_page = _initial_page()
+	# Parents before children, as produced by stable ids in incremental mode
+	eval_page['map'] = dict(sorted(eval_page['map'].items()))
+	del eval_page['full']
+
+	root, selector_map = await DomService(None)._construct_dom_tree(eval_page)  # type: ignore
+
+	assert root.tag_name == 'body'
+	assert [child.xpath for child in root.children] == ['body/div[1]', 'body/div[2]']  # type: ignore
+	assert set(selector_map) == {0, 1}
+	assert selector_map[0].parent is root.children[0]
+
+
+async def test_patch_replaces_only_dirty_subtree():
+	service = DomService(None)  # type: ignore
+	root, selector_map = await service._construct_dom_tree(_initial_page())
+	untouched = root.children[1]
+
+	# The first div was re-rendered: the button was replaced by an input
+	patch = {
+		'rootId': '0',
+		'full': False,
+		'dirtyRoots': ['1'],
+		'removed': ['2', '3'],
+		'map': {
+			'1': _element('div', 'body/div[1]', ['6']),
+			'6': _element('input', 'body/div[1]/input', [], highlight_index=2),
+		},
+	}
+	patched_root, patched_map = await service._construct_dom_tree(patch)
+
+	assert patched_root is root
+	assert root.children[1] is untouched
+	assert isinstance(root.children[0], DOMElementNode)
+	assert root.children[0].children[0].tag_name == 'input'  # type: ignore
+	assert root.children[0].parent is root
+	assert set(patched_map) == {1, 2}
+	assert patched_map[1] is selector_map[1]
+
+	# The selector map of the previous state is left untouched
+	assert set(selector_map) == {0, 1}
+
+
+async def test_full_result_resets_tree():
+	service = DomService(None)  # type: ignore
+	await service._construct_dom_tree(_initial_page())
+
+	fresh = {
+		'rootId': '7',
+		'full': True,
+		'dirtyRoots': [],
+		'removed': [],
+		'map': {'7': _element('body', '/body', ['8']), '8': _text('Loading')},
+	}
+	root, selector_map = await service._construct_dom_tree(fresh)
+
+	assert selector_map == {}
+	assert isinstance(root.children[0], DOMTextNode)
+	assert root.children[0].text == 'Loading'
+
+
+def _to_columnar(eval_page: dict) -> dict:
+	"""Mirror of `encodeColumnar` in buildDomTree.js"""
+	strings: list[str] = []
+
+	def intern(value: str) -> int:
+		if value not in strings:
+			strings.append(value)
+		return strings.index(value)
+
+	columns = {
+		'strings': strings,
+		'ids': [],
+		'flags': [],
+		'tags': [],
+		'xpaths': [],
+		'texts': [],
+		'highlightIndices': [],
+		'attributeOffsets': [0],
+		'attributes': [],
+		'childOffsets': [0],
+		'children': [],
+	}
+	for id, node in eval_page['map'].items():
+		columns['ids'].append(int(id))
+		if node.get('type') == 'TEXT_NODE':
+			columns['flags'].append(1 | (2 if node['isVisible'] else 0))
+			columns['tags'].append(-1)
+			columns['xpaths'].append(-1)
+			columns['texts'].append(intern(node['text']))
+			columns['highlightIndices'].append(-1)
+		else:
+			columns['flags'].append((2 if node.get('isVisible') else 0) | (4 if node.get('isInteractive') else 0))
+			columns['tags'].append(intern(node['tagName']))
+			columns['xpaths'].append(intern(node['xpath']))
+			columns['texts'].append(-1)
+			columns['highlightIndices'].append(node.get('highlightIndex', -1))
+			for name, value in node['attributes'].items():
+				columns['attributes'] += [intern(name), intern(value)]
+			columns['children'] += [int(child_id) for child_id in node['children']]
+		columns['attributeOffsets'].append(len(columns['attributes']))
+		columns['childOffsets'].append(len(columns['children']))
+
+	columnar = {key: value for key, value in eval_page.items() if key != 'map'}
+	columnar['columns'] = columns
+	return columnar
+
+
+async def test_columnar_wire_format_matches_json():
+	eval_page = _initial_page()
+	eval_page['map']['5']['attributes'] = {'href': '/docs', 'class': 'link'}
+
+	json_root, json_map = await DomService(None)._construct_dom_tree(eval_page)  # type: ignore
+	columnar_root, columnar_map = await DomService(None)._construct_dom_tree(_to_columnar(eval_page))  # type: ignore
+
+	assert columnar_root.clickable_elements_to_string() == json_root.clickable_elements_to_string()
+	assert set(columnar_map) == set(json_map)
+	for index, node in json_map.items():
+		assert columnar_map[index].xpath == node.xpath
+		assert columnar_map[index].attributes == node.attributes
+		assert columnar_map[index].is_interactive == node.is_interactive
+		assert columnar_map[index].parent.xpath == node.parent.xpath  # type: ignore
+	assert isinstance(columnar_root.children[0].children[0].children[0], DOMTextNode)  # type: ignore
+
+
+async def test_columnar_patch():
+	service = DomService(None)  # type: ignore
+	root, _ = await service._construct_dom_tree(_to_columnar(_initial_page()))
+
+	patch = {
+		'rootId': '0',
+		'full': False,
+		'dirtyRoots': ['4'],
+		'removed': ['5'],
+		'map': {'4': _element('div', 'body/div[2]', ['9']), '9': _text('Gone')},
+	}
+	patched_root, patched_map = await service._construct_dom_tree(_to_columnar(patch))
+
+	assert patched_root is root
+	assert root.children[1].children[0].text == 'Gone'  # type: ignore
+	assert set(patched_map) == {0}
+
+
+async def test_nodes_are_slotted_and_hash_is_memoized():
+	_, selector_map = await DomService(None)._construct_dom_tree(_initial_page())  # type: ignore
+	button = selector_map[0]
+
+	assert not hasattr(button, '__dict__')
+	assert button.hash is button.hash
+
+
+class _SnapshotPage:
+	"""Page whose documents lose the extractor until the init script runs on the next navigation"""
+
+	def __init__(self):
+		self.init_scripts: list[str] = []
+		self.installed = False
+		self.evaluated: list[str] = []
+
+	async def add_init_script(self, script: str):
+		self.init_scripts.append(script)
+
+	async def evaluate(self, expression: str, args: dict):
+		self.evaluated.append(expression)
+		if not self.installed and 'return window.__browserUseSnapshot' not in expression:
+			return None
+		self.installed = True
+		eval_page = _initial_page()
+		eval_page['scroll'] = [100, 800, 3000]
+		eval_page['title'] = 'Example'
+		eval_page['url'] = 'https://example.com/'
+		return eval_page
+
+
+async def test_page_snapshot_sends_extractor_source_only_once():
+	page = _SnapshotPage()
+	service = DomService(page)  # type: ignore
+
+	snapshot = await service.get_page_snapshot()
+	assert (snapshot.url, snapshot.title, snapshot.pixels_above, snapshot.pixels_below) == (
+		'https://example.com/',
+		'Example',
+		100,
+		2100,
+	)
+	assert snapshot.dom_state.element_tree.tag_name == 'body'
+	assert len(page.evaluated) == 2
+
+	await DomService(page).get_clickable_elements()  # type: ignore
+	assert len(page.init_scripts) == 1
+	assert len(page.evaluated) == 3
+	assert len(page.evaluated[2]) < 200
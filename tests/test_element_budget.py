@@ -0,0 +1,98 @@
+"""
+Tests for packing the elements of large pages into a token budget.
+
+@dev You can run this test with: pytest tests/test_element_budget.py
+"""
+
+from langchain_core.messages import SystemMessage
+
+from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
+from browser_use.agent.message_manager.tokens import EstimateTokenCounter
+from browser_use.agent.views import MessageManagerState
+from browser_use.browser.views import BrowserState, TabInfo
+from browser_use.dom.budget import omitted_placeholder, pack_lines, score_lines, task_words
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+def _page(n_links: int, search_in_viewport: bool = False) -> DOMElementNode:
+	"""Many links, of which only the first ones are in the viewport, and a search input at the bottom"""
+	root = DOMElementNode(is_visible=True, parent=None, tag_name='body', xpath='/body', attributes={}, children=[])
+	for i in range(n_links + 1):
+		is_search = i == n_links
+		node = DOMElementNode(
+			is_visible=True,
+			parent=root,
+			tag_name='input' if is_search else 'a',
+			xpath=f'/body/*[{i + 1}]',
+			attributes={},
+			children=[],
+			highlight_index=i,
+			is_in_viewport=search_in_viewport if is_search else i < 5,
+		)
+		node.children.append(DOMTextNode(is_visible=True, parent=node, text='Search flights' if is_search else f'Article {i}'))
+		root.children.append(node)
+	return root
+
+
+def _count_tokens(text: str) -> int:
+	return len(text) // 3
+
+
+def test_pack_keeps_best_lines_in_page_order():
+	lines = _page(50).clickable_elements_to_lines()
+	scores = score_lines(lines, task_words('Search for flights to Rome'))
+
+	packed = pack_lines(lines, scores, max_tokens=70, count_tokens=_count_tokens)
+	texts = [line for _, line in packed]
+
+	# The links in the viewport, then a placeholder for the links below it, then the search input
+	assert texts[:5] == [f'[{i}]<a Article {i}/>' for i in range(5)]
+	assert texts[5] == omitted_placeholder(45)
+	assert texts[-1] == '[50]<input Search flights/>'
+	assert sum(_count_tokens(text) + 1 for _, text in packed) <= 70
+
+
+def test_placeholders_count_towards_the_budget():
+	lines = _page(200).clickable_elements_to_lines()
+	# Scattered scores, so that every kept line would need a placeholder of its own
+	scores = [float(i % 2 == 0 and i % 7 == 0) for i in range(len(lines))]
+
+	for max_tokens in [60, 150, 400]:
+		packed = pack_lines(lines, scores, max_tokens=max_tokens, count_tokens=_count_tokens)
+		assert sum(_count_tokens(text) + 1 for _, text in packed) <= max_tokens
+		assert any(node is not None for node, _ in packed)
+
+
+def test_everything_fits():
+	lines = _page(3).clickable_elements_to_lines()
+	assert pack_lines(lines, score_lines(lines, set()), max_tokens=1000, count_tokens=_count_tokens) == lines
+
+
+def test_changed_elements_rank_higher():
+	lines = _page(20).clickable_elements_to_lines()
+	keys = list(range(len(lines)))
+	scores = score_lines(lines, set(), changed_keys={15}, keys=keys)
+	assert scores[15] > scores[14]
+
+
+def test_state_message_is_budgeted():
+	message_manager = MessageManager(
+		task='Search flights',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(max_elements_tokens=100),
+		state=MessageManagerState(),
+		token_counter=EstimateTokenCounter(),
+	)
+	state = BrowserState(
+		url='https://test.com',
+		title='Test Page',
+		element_tree=_page(500),
+		selector_map={},
+		tabs=[TabInfo(page_id=1, url='https://test.com', title='Test Page')],
+	)
+	message_manager.add_state_message(state, use_vision=False)
+
+	content = message_manager.get_messages()[-1].content
+	assert '[500]<input Search flights/>' in content
+	assert 'less relevant elements omitted' in content
+	assert '[400]<a' not in content
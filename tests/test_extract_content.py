@@ -0,0 +1,89 @@
+"""
+Tests that extracting the content of a page does not block the event loop.
+
+@dev You can run this test with: pytest tests/test_extract_content.py
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from browser_use.controller.service import Controller
+
+
+class FakePage:
+	def __init__(self, html: str):
+		self.html = html
+
+	async def content(self) -> str:
+		return self.html
+
+
+class FakeBrowserContext:
+	def __init__(self, html: str):
+		self.page = FakePage(html)
+
+	async def get_current_page(self) -> FakePage:
+		return self.page
+
+
+async def _ticks_while(awaitable) -> tuple[object, int]:
+	"""Result of the awaitable, and how often the event loop ran another task meanwhile"""
+	ticks = 0
+	done = False
+
+	async def tick():
+		nonlocal ticks
+		while not done:
+			ticks += 1
+			await asyncio.sleep(0.01)
+
+	ticker = asyncio.create_task(tick())
+	try:
+		return await awaitable, ticks
+	finally:
+		done = True
+		await ticker
+
+
+async def test_slow_extraction_does_not_block_other_agents():
+	controller = Controller()
+	llm = FakeListChatModel(responses=['{"prices": ["12 EUR"]}'], sleep=0.3)
+
+	result, ticks = await _ticks_while(
+		controller.registry.execute_action(
+			'extract_content',
+			{'goal': 'prices'},
+			browser=FakeBrowserContext('<h1>Flights</h1><p>12 EUR</p>'),  # type: ignore
+			page_extraction_llm=llm,
+		)
+	)
+	assert '12 EUR' in result.extracted_content
+	# The other task kept running while the model answered
+	assert ticks >= 10
+
+
+async def test_markdown_is_converted_in_the_executor():
+	executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='markdown')
+	submitted = []
+	submit = executor.submit
+
+	def record_submit(fn, *args, **kwargs):
+		submitted.append(fn.__name__)
+		return submit(fn, *args, **kwargs)
+
+	executor.submit = record_submit  # type: ignore
+	controller = Controller(markdown_executor=executor)
+
+	# The model fails, so the action returns the markdown of the page itself
+	llm = FakeListChatModel(responses=[])
+	result = await controller.registry.execute_action(
+		'extract_content',
+		{'goal': 'title'},
+		browser=FakeBrowserContext('<h1>Flights</h1>'),  # type: ignore
+		page_extraction_llm=llm,
+	)
+	assert 'Flights\n=======' in result.extracted_content
+	assert submitted == ['markdownify']
+	executor.shutdown()
@@ -0,0 +1,86 @@
+"""
+Tests for running agents in a fleet of worker processes.
+
+The workers build the agents with a module-level factory. These agents do not open the browser, so the
+tests run without one.
+
+@dev You can run this test with: pytest tests/test_fleet.py
+"""
+
+import asyncio
+import os
+
+from browser_use.agent.views import ActionResult, AgentHistory, AgentHistoryList
+from browser_use.browser.views import BrowserStateHistory
+from browser_use.fleet.service import Fleet, FleetConfig
+from browser_use.fleet.views import FleetTask
+
+
+class EchoAgent:
+	def __init__(self, task: FleetTask):
+		self.task = task
+
+	async def run(self, max_steps: int = 100) -> AgentHistoryList:
+		await asyncio.sleep(self.task.payload.get('sleep', 0))
+		if 'crash_marker' in self.task.payload and not os.path.exists(self.task.payload['crash_marker']):
+			# Crash the worker on the first attempt only
+			open(self.task.payload['crash_marker'], 'w').close()
+			os._exit(1)
+		if self.task.payload.get('fail'):
+			raise ValueError('bad task')
+
+		state = BrowserStateHistory(url='', title='', tabs=[], interacted_element=[])
+		result = ActionResult(is_done=True, success=True, extracted_content=f'{self.task.task} in {os.getpid()}')
+		return AgentHistoryList(history=[AgentHistory(model_output=None, result=[result], state=state)])
+
+
+def make_agent(task, browser_context):
+	return EchoAgent(task)
+
+
+def _config(**config) -> FleetConfig:
+	return FleetConfig(**{'workers': 2, 'agents_per_worker': 2, 'context_pool': False, 'heartbeat_interval': 0.2, **config})
+
+
+async def test_tasks_are_sharded_over_the_workers():
+	async with Fleet(make_agent, _config()) as fleet:
+		tasks = [FleetTask(f'task {i}', payload={'sleep': 0.2}) for i in range(8)]
+		results = await fleet.run(tasks)
+
+		assert [result.task_id for result in results] == [task.task_id for task in tasks]
+		assert all(result.is_successful and result.final_result.startswith(task.task) for result, task in zip(results, tasks))
+		assert len({result.final_result.split(' in ')[1] for result in results}) == 2
+
+		metrics = fleet.metrics()
+		assert metrics.tasks_completed == 8 and metrics.queued == metrics.running == 0
+		assert sorted(worker.tasks_completed for worker in metrics.workers) == [4, 4]
+
+
+async def test_back_pressure_and_failures():
+	async with Fleet(make_agent, _config(workers=1, agents_per_worker=1, max_queued=1)) as fleet:
+		first = await fleet.submit(FleetTask('slow', payload={'sleep': 0.5}))
+		await fleet.submit(FleetTask('queued'))
+
+		# One task runs and one is queued, the next one has to wait
+		third = asyncio.ensure_future(fleet.submit(FleetTask('failing', payload={'fail': True})))
+		await asyncio.sleep(0.2)
+		assert not third.done()
+
+		assert (await first).is_successful
+		result = await (await third)
+		assert result.error == 'ValueError: bad task'
+		assert fleet.metrics().tasks_failed == 1
+
+
+async def test_crashed_worker_is_restarted(tmp_path):
+	async with Fleet(make_agent, _config(workers=1)) as fleet:
+		results = await fleet.run(
+			[
+				FleetTask('crashing', payload={'crash_marker': str(tmp_path / 'crashed')}),
+				FleetTask('other', payload={'sleep': 0.1}),
+			]
+		)
+
+		assert results[0].is_successful and results[0].attempts == 2
+		assert results[1].is_successful
+		assert fleet.metrics().restarts == 1
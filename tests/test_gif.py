@@ -0,0 +1,82 @@
+"""
+Tests for rendering the agent history into a GIF or a video.
+
+@dev You can run this test with: pytest tests/test_gif.py
+"""
+
+import base64
+import io
+import shutil
+
+import pytest
+from PIL import Image, ImageSequence
+
+from browser_use.agent.gif import _load_fonts, create_history_gif
+from browser_use.agent.views import AgentHistory, AgentHistoryList
+from browser_use.browser.views import BrowserStateHistory
+
+
+def _screenshot(color: tuple[int, int, int], size: tuple[int, int] = (320, 200)) -> str:
+	output = io.BytesIO()
+	Image.new('RGB', size, color).save(output, format='PNG')
+	return base64.b64encode(output.getvalue()).decode('utf-8')
+
+
+def _history(screenshots: list[str | None]) -> AgentHistoryList:
+	return AgentHistoryList(
+		history=[
+			AgentHistory(
+				model_output=None,
+				result=[],
+				state=BrowserStateHistory(
+					url='https://example.com', title='Example', tabs=[], interacted_element=[None], screenshot=screenshot
+				),
+			)
+			for screenshot in screenshots
+		]
+	)
+
+
+def test_gif_has_one_frame_per_screenshot(tmp_path):
+	colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+	# A screenshot of another size is fitted to the canvas of the first one
+	history = _history([_screenshot(colors[0]), None, _screenshot(colors[1]), _screenshot(colors[2], size=(640, 400))])
+	output_path = tmp_path / 'history.gif'
+
+	create_history_gif('Find the colors', history, output_path=str(output_path), show_task=False, duration=500)
+
+	with Image.open(output_path) as gif:
+		assert gif.size == (320, 200)
+		assert gif.info['loop'] == 0
+		frames = [frame.convert('RGB') for frame in ImageSequence.Iterator(gif)]
+		assert len(frames) == 3
+		assert [frame.getpixel((10, 10)) for frame in frames] == colors
+		assert gif.info['duration'] == 500
+
+
+def test_task_frame_and_cached_fonts(tmp_path):
+	history = _history([_screenshot((255, 255, 255))])
+	output_path = tmp_path / 'history.gif'
+
+	create_history_gif('Find the colors', history, output_path=str(output_path))
+	create_history_gif('Find the colors', history, output_path=str(output_path))
+
+	with Image.open(output_path) as gif:
+		assert gif.n_frames == 2
+	assert _load_fonts.cache_info().hits >= 1
+
+
+def test_no_screenshots(tmp_path):
+	output_path = tmp_path / 'history.gif'
+	create_history_gif('Find the colors', _history([None]), output_path=str(output_path))
+	assert not output_path.exists()
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg is not installed')
+def test_video(tmp_path):
+	history = _history([_screenshot((255, 0, 0)), _screenshot((0, 255, 0))])
+	output_path = tmp_path / 'history.mp4'
+
+	create_history_gif('Find the colors', history, output_path=str(output_path), duration=500)
+
+	assert output_path.stat().st_size > 0
@@ -0,0 +1,111 @@
+"""
+Tests for keeping the agent history and its screenshots on disk.
+
+@dev You can run this test with: pytest tests/test_history_storage.py
+"""
+
+import base64
+import json
+
+from browser_use.agent.storage import HistoryWriter, ScreenshotStore, iter_history_file
+from browser_use.agent.views import AgentHistory, AgentHistoryList, AgentOutput
+from browser_use.browser.views import BrowserStateHistory
+
+PNG_B64 = base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'\x00' * 32).decode('utf-8')
+JPEG_B64 = base64.b64encode(b'\xff\xd8\xff\xe0' + b'\x00' * 32).decode('utf-8')
+
+
+def _history_item(screenshot: str | None = None, screenshot_path: str | None = None) -> AgentHistory:
+	state = BrowserStateHistory(
+		url='https://example.com',
+		title='Example',
+		tabs=[],
+		interacted_element=[None],
+		screenshot=screenshot,
+		screenshot_path=screenshot_path,
+	)
+	return AgentHistory(model_output=None, result=[], state=state)
+
+
+def test_store_is_content_addressed(tmp_path):
+	store = ScreenshotStore(tmp_path)
+
+	png_path = store.put(PNG_B64)
+	assert png_path.endswith('.png')
+	assert store.put(PNG_B64) == png_path
+	assert store.put(JPEG_B64).endswith('.jpg')
+
+	assert len([path for path in tmp_path.rglob('*') if path.is_file()]) == 2
+	assert not list(tmp_path.rglob('*.tmp'))
+
+
+def test_history_reads_screenshots_lazily(tmp_path):
+	store = ScreenshotStore(tmp_path)
+	history = AgentHistoryList(
+		history=[
+			_history_item(screenshot=PNG_B64),
+			_history_item(screenshot_path=store.put(JPEG_B64)),
+			_history_item(),
+		]
+	)
+
+	assert history.history[1].state.screenshot is None
+	assert history.screenshots() == [PNG_B64, JPEG_B64, None]
+	assert list(history.iter_screenshots()) == history.screenshots()
+
+
+def test_saved_history_keeps_screenshot_paths(tmp_path):
+	store = ScreenshotStore(tmp_path / 'screenshots')
+	history = AgentHistoryList(history=[_history_item(screenshot_path=store.put(PNG_B64))])
+
+	history_file = tmp_path / 'history.json'
+	history.save_to_file(history_file)
+	assert PNG_B64 not in history_file.read_text()
+	assert json.loads(history_file.read_text())['history'][0]['state']['screenshot_path'] == store.put(PNG_B64)
+
+	loaded = AgentHistoryList.load_from_file(history_file, AgentOutput)
+	assert loaded.screenshots() == [PNG_B64]
+
+
+def test_jsonl_history_is_appended_and_streamed(tmp_path):
+	history_file = tmp_path / 'history.jsonl'
+	writer = HistoryWriter(history_file)
+	for screenshot in [PNG_B64, None, JPEG_B64]:
+		writer.append(_history_item(screenshot=screenshot))
+
+	assert len(history_file.read_text().splitlines()) == 3
+	steps = iter_history_file(history_file, AgentOutput)
+	assert next(steps).state.screenshot == PNG_B64
+	assert [h.state.screenshot for h in steps] == [None, JPEG_B64]
+
+	loaded = AgentHistoryList.load_from_file(history_file, AgentOutput)
+	assert loaded.screenshots() == [PNG_B64, None, JPEG_B64]
+
+	rewritten = tmp_path / 'rewritten.jsonl'
+	loaded.save_to_file(rewritten)
+	assert rewritten.read_text() == history_file.read_text()
+
+
+def test_truncated_last_step_is_skipped(tmp_path):
+	history_file = tmp_path / 'history.jsonl'
+	writer = HistoryWriter(history_file)
+	writer.append(_history_item(screenshot=PNG_B64))
+	writer.append(_history_item(screenshot=JPEG_B64))
+
+	content = history_file.read_text()
+	history_file.write_text(content[: len(content) - 20])
+
+	assert [h.state.screenshot for h in iter_history_file(history_file, AgentOutput)] == [PNG_B64]
+
+
+def test_new_run_starts_a_new_history(tmp_path):
+	history_file = tmp_path / 'history.jsonl'
+	HistoryWriter(history_file).append(_history_item(screenshot=PNG_B64))
+
+	writer = HistoryWriter(history_file)
+	writer.append(_history_item(screenshot=JPEG_B64))
+	assert [h.state.screenshot for h in iter_history_file(history_file, AgentOutput)] == [JPEG_B64]
+
+	# A resumed run continues the history
+	HistoryWriter(history_file, append=True).append(_history_item())
+	assert [h.state.screenshot for h in iter_history_file(history_file, AgentOutput)] == [JPEG_B64, None]
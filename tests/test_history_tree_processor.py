@@ -0,0 +1,77 @@
+"""
+Tests for hashing DOM elements and finding them again when replaying a history.
+
+@dev You can run this test with: pytest tests/test_history_tree_processor.py
+"""
+
+import hashlib
+
+import pytest
+
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.views import DOMElementNode, DOMState
+
+
+def _element(parent: DOMElementNode | None, tag: str, highlight_index: int | None = None) -> DOMElementNode:
+	node = DOMElementNode(
+		is_visible=True,
+		parent=parent,
+		tag_name=tag,
+		xpath=f'{parent.xpath}/{tag}' if parent else tag,
+		attributes={'class': tag},
+		children=[],
+		highlight_index=highlight_index,
+	)
+	if parent is not None:
+		parent.children.append(node)
+	return node
+
+
+def _page() -> tuple[DOMElementNode, dict[int, DOMElementNode]]:
+	html = _element(None, 'html')
+	body = _element(html, 'body')
+	form = _element(body, 'form')
+	first = _element(form, 'button', 0)
+	second = _element(form, 'input', 1)
+	link = _element(body, 'a', 2)
+	return html, {0: first, 1: second, 2: link}
+
+
+@pytest.fixture(params=['sha256', 'fast'])
+def hash_algorithm(request, monkeypatch):
+	monkeypatch.setattr(HistoryTreeProcessor, 'hash_algorithm', request.param)
+	return request.param
+
+
+def test_branch_path_hash_matches_full_path():
+	_, selector_map = _page()
+
+	assert selector_map[1].hash.branch_path_hash == hashlib.sha256(b'body/form/input').hexdigest()
+	assert selector_map[2].hash.branch_path_hash == hashlib.sha256(b'body/a').hexdigest()
+
+
+def test_history_element_is_found_again(hash_algorithm):
+	tree, selector_map = _page()
+	history_element = HistoryTreeProcessor.convert_dom_element_to_history_element(selector_map[1])
+
+	# Same page, rendered again with other highlight indices
+	new_tree, new_selector_map = _page()
+	new_selector_map = {index + 10: element for index, element in new_selector_map.items()}
+	state = DOMState(element_tree=new_tree, selector_map=new_selector_map)
+
+	found = HistoryTreeProcessor.find_history_element_in_index(history_element, state.hash_index)
+	assert found is new_selector_map[11]
+	assert HistoryTreeProcessor.find_history_element_in_tree(history_element, new_tree) is found
+	assert HistoryTreeProcessor.compare_history_element_and_dom_element(history_element, found)
+
+
+def test_hash_index_keeps_first_element():
+	tree, selector_map = _page()
+	duplicate = _element(tree.children[0].children[0], 'button', 3)
+	duplicate.attributes = dict(selector_map[0].attributes)
+	duplicate.xpath = selector_map[0].xpath
+
+	hash_index = HistoryTreeProcessor.build_hash_index({**selector_map, 3: duplicate})
+
+	assert len(hash_index) == 3
+	assert hash_index[selector_map[0].hash] is selector_map[0]
@@ -0,0 +1,80 @@
+"""
+Tests for the garbage collection policy of browser contexts.
+
+@dev You can run this test with: pytest tests/test_memory.py
+"""
+
+import pytest
+
+from browser_use.browser import memory
+from browser_use.browser.memory import MemoryManager, get_memory_metrics
+
+
+async def test_never_policy_does_not_collect():
+	manager = MemoryManager(policy='never')
+	before = get_memory_metrics().collections
+
+	for _ in range(5):
+		assert not await manager.on_step()
+
+	assert get_memory_metrics().collections == before
+
+
+async def test_every_n_steps_policy():
+	manager = MemoryManager(policy='every_n_steps', every_n_steps=3)
+	before = get_memory_metrics()
+
+	ran = [await manager.on_step() for _ in range(6)]
+
+	assert ran == [False, False, True, False, False, True]
+	after = get_memory_metrics()
+	assert after.collections == before.collections + 2
+	assert after.total_pause_seconds >= before.total_pause_seconds
+	assert after.max_pause_seconds >= after.last_pause_seconds
+
+
+async def test_rss_threshold_policy(monkeypatch):
+	monkeypatch.setattr(memory, 'get_rss_bytes', lambda: 100 * 1024 * 1024)
+
+	assert not await MemoryManager(policy='rss_threshold', rss_threshold_mb=200).on_step()
+	assert await MemoryManager(policy='rss_threshold', rss_threshold_mb=50).on_step()
+	assert get_memory_metrics().last_rss_bytes == 100 * 1024 * 1024
+
+
+async def test_rss_threshold_collects_again_only_after_growth(monkeypatch):
+	rss_mb = [100]
+	monkeypatch.setattr(memory, 'get_rss_bytes', lambda: rss_mb[0] * 1024 * 1024)
+	manager = MemoryManager(policy='rss_threshold', rss_threshold_mb=50, rss_growth_mb=20)
+
+	assert await manager.on_step()
+	# Still above the threshold after the collection, but it has not grown
+	assert not await manager.on_step()
+	rss_mb[0] = 115
+	assert not await manager.on_step()
+	rss_mb[0] = 125
+	assert await manager.on_step()
+	# Back under the threshold, the next time above it collects at once
+	rss_mb[0] = 40
+	assert not await manager.on_step()
+	rss_mb[0] = 60
+	assert await manager.on_step()
+
+
+async def test_concurrent_collections_are_shared():
+	assert memory._collection_lock.acquire(blocking=False)
+	try:
+		before = get_memory_metrics().skipped_collections
+		assert not await memory.collect()
+		assert get_memory_metrics().skipped_collections == before + 1
+	finally:
+		memory._collection_lock.release()
+
+
+def test_rss_is_available():
+	rss = memory.get_rss_bytes()
+	assert rss is None or rss > 0
+
+
+def test_invalid_policy():
+	with pytest.raises(ValueError):
+		MemoryManager(policy='always')  # type: ignore
@@ -0,0 +1,172 @@
+"""
+Tests for the messages sent to the LLM for the browser state.
+
+@dev You can run this test with: pytest tests/test_message_manager.py
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
+from browser_use.agent.views import AgentBrain, AgentOutput, MessageManagerState
+from browser_use.browser.views import BrowserState, TabInfo
+from browser_use.dom.views import DOMElementNode
+
+
+def _message_manager(prompt_caching: bool = False) -> MessageManager:
+	return MessageManager(
+		task='Test task',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(prompt_caching=prompt_caching),
+		state=MessageManagerState(),
+	)
+
+
+def _state(screenshot: str | None = 'iVBORw0KGgoAAAA', screenshot_unchanged: bool = False) -> BrowserState:
+	return BrowserState(
+		url='https://test.com',
+		title='Test Page',
+		element_tree=DOMElementNode(
+			tag_name='div',
+			attributes={},
+			children=[],
+			is_visible=True,
+			parent=None,
+			xpath='//div',
+		),
+		selector_map={},
+		tabs=[TabInfo(page_id=1, url='https://test.com', title='Test Page')],
+		screenshot=screenshot,
+		screenshot_unchanged=screenshot_unchanged,
+	)
+
+
+def _has_image(message_manager: MessageManager) -> bool:
+	content = message_manager.get_messages()[-1].content
+	return isinstance(content, list) and any('image_url' in item for item in content)
+
+
+def _images(message_manager: MessageManager) -> list[str]:
+	return [
+		item['image_url']['url']
+		for message in message_manager.get_messages()
+		if isinstance(message.content, list)
+		for item in message.content
+		if 'image_url' in item
+	]
+
+
+def test_unchanged_screenshot_is_not_sent_again():
+	message_manager = _message_manager()
+
+	message_manager.add_state_message(_state())
+	assert _has_image(message_manager)
+	message_manager._remove_last_state_message()
+
+	for _ in range(2):
+		message_manager.add_state_message(_state(screenshot_unchanged=True))
+		assert not _has_image(message_manager)
+		assert 'not attached again' in message_manager.get_messages()[-1].content
+		# The screenshot the note refers to is still in the messages, once
+		assert _images(message_manager) == ['data:image/png;base64,iVBORw0KGgoAAAA']
+		message_manager._remove_last_state_message()
+
+	# Once the page changes, the kept screenshot is replaced by the new one in the state message
+	message_manager.add_state_message(_state(screenshot='iVBORw0KGgoBBBB'))
+	assert _has_image(message_manager)
+	assert _images(message_manager) == ['data:image/png;base64,iVBORw0KGgoBBBB']
+
+
+def test_unchanged_screenshot_is_sent_if_previous_state_was_not():
+	message_manager = _message_manager()
+
+	message_manager.add_state_message(_state(screenshot='iVBORw0KGgoBBBB'))
+	message_manager._remove_last_state_message()
+
+	# Unchanged compared to a state taken between two actions, which the LLM never saw
+	message_manager.add_state_message(_state(screenshot_unchanged=True))
+	assert _images(message_manager) == ['data:image/png;base64,iVBORw0KGgoAAAA']
+
+
+def _cache_breakpoints(messages) -> list[int]:
+	return [
+		i
+		for i, message in enumerate(messages)
+		if isinstance(message.content, list) and any('cache_control' in item for item in message.content)
+	]
+
+
+def test_cache_breakpoints_on_stable_prefix():
+	message_manager = _message_manager(prompt_caching=True)
+	message_manager._add_message_with_tokens(HumanMessage(content='Action result: found it'))
+	message_manager.add_state_message(_state(screenshot=None))
+
+	messages = message_manager.get_messages()
+	# The system prompt and the last message before the state message
+	assert _cache_breakpoints(messages) == [0, len(messages) - 2]
+	assert messages[-2].content[0]['text'] == 'Action result: found it'
+
+	# The stored history is not modified
+	assert _cache_breakpoints([m.message for m in message_manager.state.history.messages]) == []
+
+
+def test_prefix_is_stable_across_steps():
+	message_manager = _message_manager(prompt_caching=True)
+
+	message_manager.add_state_message(_state(screenshot=None))
+	first_step = message_manager.get_messages()
+	message_manager._remove_last_state_message()
+	message_manager._add_message_with_tokens(AIMessage(content='plan'))
+
+	message_manager.add_state_message(_state(screenshot=None))
+	second_step = message_manager.get_messages()
+
+	assert [m.content for m in second_step[: len(first_step) - 1]] == [m.content for m in first_step[:-1]]
+
+
+def _agent_output(goal: str) -> AgentOutput:
+	return AgentOutput(
+		current_state=AgentBrain(evaluation_previous_goal='Success', memory='', next_goal=goal),
+		action=[],
+	)
+
+
+def test_cache_breakpoint_moves_with_the_steps():
+	message_manager = _message_manager(prompt_caching=True)
+	breakpoints = []
+
+	for step in range(3):
+		message_manager.add_state_message(_state(screenshot=None))
+		messages = message_manager.get_messages()
+		breakpoints.append(_cache_breakpoints(messages))
+		message_manager._remove_last_state_message()
+		message_manager.add_model_output(_agent_output(f'goal {step}'))
+		if step == 1:
+			message_manager._add_message_with_tokens(HumanMessage(content='Action result: found it'))
+
+	messages = message_manager.state.history.get_messages()
+	start = message_manager.state.init_messages
+	assert breakpoints[0] == [0, start - 1]
+	# The last message before the state message, here the empty tool message after the model output. The
+	# previous breakpoint is kept, so its cached prefix is read.
+	assert breakpoints[1] == [0, start - 1, start + 1]
+	assert isinstance(messages[start + 1], ToolMessage)
+	assert breakpoints[2] == [0, start + 1, start + 4]
+	assert messages[start + 4].content == 'Action result: found it'
+
+	message_manager.add_state_message(_state(screenshot=None))
+	marked = message_manager.get_messages()[len(messages) - 1]
+	assert marked.content == [
+		{
+			'type': 'tool_result',
+			'content': '',
+			'tool_use_id': marked.tool_call_id,
+			'is_error': False,
+			'cache_control': {'type': 'ephemeral'},
+		}
+	]
+
+
+def test_no_cache_breakpoints_by_default():
+	message_manager = _message_manager()
+	message_manager.add_state_message(_state(screenshot=None))
+	assert _cache_breakpoints(message_manager.get_messages()) == []
@@ -0,0 +1,128 @@
+"""
+Tests for the network activity tracker that decides when a page has finished loading.
+
+@dev You can run this test with: pytest tests/test_network.py
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+
+from browser_use.browser.network import NetworkActivityTracker
+
+
+class EventEmitter:
+	"""The part of the Playwright page the tracker listens to"""
+
+	def __init__(self):
+		self.listeners = defaultdict(list)
+
+	def on(self, event, listener):
+		self.listeners[event].append(listener)
+
+	def remove_listener(self, event, listener):
+		self.listeners[event].remove(listener)
+
+	def emit(self, event, payload):
+		for listener in list(self.listeners[event]):
+			listener(payload)
+
+
+class Request:
+	def __init__(self, url: str, resource_type: str = 'script'):
+		self.url = url
+		self.resource_type = resource_type
+		self.headers = {}
+
+
+class Response:
+	def __init__(self, request: Request, content_type: str = 'application/javascript', content_length: str = '100'):
+		self.request = request
+		self.headers = {'content-type': content_type, 'content-length': content_length}
+
+
+def _tracker() -> tuple[NetworkActivityTracker, EventEmitter]:
+	page = EventEmitter()
+	tracker = NetworkActivityTracker()
+	tracker.attach(page)  # type: ignore
+	return tracker, page
+
+
+async def test_idle_page_does_not_wait():
+	tracker, _ = _tracker()
+	tracker.last_activity -= 10
+
+	start = time.monotonic()
+	assert await tracker.wait_for_idle(idle_time=0.5, timeout=5)
+	assert time.monotonic() - start < 0.05
+
+
+async def test_only_quiet_time_after_the_action_counts():
+	tracker, page = _tracker()
+	tracker.last_activity -= 10
+	action_start = time.monotonic()
+	assert tracker.idle_time() >= 10
+	assert tracker.idle_time(since=action_start) < 0.05
+
+	async def delayed_navigation():
+		await asyncio.sleep(0.1)
+		request = Request('https://example.com/next', resource_type='document')
+		page.emit('request', request)
+		await asyncio.sleep(0.1)
+		page.emit('requestfinished', request)
+
+	start = time.monotonic()
+	_, idle = await asyncio.gather(delayed_navigation(), tracker.wait_for_idle(idle_time=0.15, timeout=5, since=action_start))
+
+	# The request the action started was waited for, the quiet time before the action was not used
+	assert idle
+	assert time.monotonic() - start > 0.3
+
+
+async def test_failed_request_ends_the_wait():
+	tracker, page = _tracker()
+	request = Request('https://example.com/app.js')
+	page.emit('request', request)
+	page.emit('request', Request('https://www.google-analytics.com/collect'))
+	assert len(tracker.pending_requests) == 1
+
+	async def fail_request():
+		await asyncio.sleep(0.1)
+		page.emit('requestfailed', request)
+
+	start = time.monotonic()
+	_, idle = await asyncio.gather(fail_request(), tracker.wait_for_idle(idle_time=0.2, timeout=5))
+
+	# A failure is not activity, so the quiet window started with the request
+	assert idle
+	assert 0.15 < time.monotonic() - start < 1
+	assert tracker.origins['https://example.com'].failed == 1
+
+
+async def test_wait_times_out_with_pending_requests():
+	tracker, page = _tracker()
+	page.emit('request', Request('https://example.com/slow.css', resource_type='stylesheet'))
+
+	assert not await tracker.wait_for_idle(idle_time=0.1, timeout=0.2)
+
+
+async def test_origin_stats():
+	tracker, page = _tracker()
+	requests = [
+		Request('https://example.com/a.js'),
+		Request('https://example.com/b.js'),
+		Request('https://cdn.net/c.png', 'image'),
+	]
+	for request in requests:
+		page.emit('request', request)
+	for request in requests:
+		page.emit('response', Response(request))
+		page.emit('requestfinished', request)
+
+	stats = tracker.origins['https://example.com']
+	assert (stats.requests, stats.responses, stats.bytes_received) == (2, 2, 200)
+	assert stats.average_latency <= stats.max_latency
+	assert not tracker.pending_requests
+
+	tracker.detach()
+	assert not any(page.listeners.values())
@@ -0,0 +1,178 @@
+"""
+Tests for the scheduler of the model calls of all agents.
+
+@dev You can run this test with: pytest tests/test_scheduler.py
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from browser_use.agent.scheduler import (
+	LLMScheduler,
+	ModelLimits,
+	TokenBucket,
+	get_model_name,
+	is_rate_limit_error,
+	retry_after_seconds,
+)
+from browser_use.agent.service import Agent
+from browser_use.browser.browser import Browser, BrowserConfig
+
+
+class RateLimitError(Exception):
+	"""Named like the rate limit errors of the OpenAI and Anthropic clients"""
+
+	def __init__(self, headers: dict[str, str]):
+		super().__init__('429 Too Many Requests')
+		self.response = SimpleNamespace(status_code=429, headers=headers)
+
+
+def test_token_bucket_refills_over_time():
+	now = [0.0]
+	bucket = TokenBucket(rate_per_minute=60, clock=lambda: now[0])
+
+	bucket.consume(60)
+	assert bucket.wait_time(1) == pytest.approx(1)
+	now[0] = 30
+	assert bucket.wait_time(30) == 0
+	# Larger than the bucket: waits for a full bucket rather than forever
+	assert bucket.wait_time(1000) == pytest.approx(30)
+
+
+async def test_calls_go_in_order_of_priority():
+	scheduler = LLMScheduler(default_limits=ModelLimits(max_concurrent=1))
+	order = []
+
+	async def invoke(name: str):
+		order.append(name)
+		await asyncio.sleep(0.05)
+		return AIMessage(content=name)
+
+	first = asyncio.create_task(scheduler.call('gpt-4o', lambda: invoke('first')))
+	await asyncio.sleep(0.01)
+	calls = [
+		asyncio.create_task(scheduler.call('gpt-4o', lambda: invoke('background'), priority=1)),
+		asyncio.create_task(scheduler.call('gpt-4o', lambda: invoke('new agent'), priority=0, progress=1)),
+		asyncio.create_task(scheduler.call('gpt-4o', lambda: invoke('agent at step 10'), priority=0, progress=10)),
+	]
+	await asyncio.gather(first, *calls)
+	assert order == ['first', 'agent at step 10', 'new agent', 'background']
+
+
+async def test_requests_per_minute_budget():
+	scheduler = LLMScheduler(default_limits=ModelLimits(requests_per_minute=600))
+	# The bucket holds a minute of budget, start it empty
+	scheduler._get_state('gpt-4o').requests.consume(600)  # type: ignore
+
+	async def invoke():
+		return AIMessage(content='')
+
+	start = time.monotonic()
+	await asyncio.gather(*(scheduler.call('gpt-4o', invoke) for _ in range(3)))
+	# 10 requests per second
+	assert 0.25 < time.monotonic() - start < 0.6
+
+
+async def test_rate_limit_pauses_every_call_and_retries():
+	scheduler = LLMScheduler()
+	started = []
+	failures = [RateLimitError({'retry-after': '0.3', 'x-ratelimit-limit-requests': '5000'})]
+
+	async def invoke(name: str):
+		started.append((name, time.monotonic()))
+		if name == 'limited' and failures:
+			raise failures.pop()
+		return AIMessage(content=name, usage_metadata={'input_tokens': 10, 'output_tokens': 5, 'total_tokens': 15})
+
+	start = time.monotonic()
+	limited = asyncio.create_task(scheduler.call('claude', lambda: invoke('limited')))
+	await asyncio.sleep(0.05)
+	other = asyncio.create_task(scheduler.call('claude', lambda: invoke('other')))
+
+	assert (await limited).content == 'limited'
+	assert (await other).content == 'other'
+	# The other call waited for the pause, and the retried call went first
+	assert [name for name, _ in started] == ['limited', 'limited', 'other']
+	assert started[1][1] - start >= 0.3
+
+	metrics = scheduler.metrics()['claude']
+	assert metrics.rate_limited == 1 and metrics.input_tokens == 20
+	# The limit the provider reported is adopted
+	assert scheduler._get_state('claude').requests.rate_per_minute == 5000  # type: ignore
+
+
+async def test_gives_up_after_max_retries():
+	scheduler = LLMScheduler(max_retries=1, base_backoff=0.01)
+
+	async def invoke():
+		raise RateLimitError({})
+
+	with pytest.raises(RateLimitError):
+		await scheduler.call('gpt-4o', invoke)
+	assert scheduler.metrics()['gpt-4o'].rate_limited == 1
+
+
+async def test_agent_takes_its_slot_before_the_scheduler():
+	scheduler = LLMScheduler(default_limits=ModelLimits(max_concurrent=1))
+	semaphore = asyncio.Semaphore(1)
+	llm = FakeListChatModel(responses=['plan'])
+	agent = Agent(task='task', llm=llm, browser=Browser(BrowserConfig()), llm_semaphore=semaphore, llm_scheduler=scheduler)
+
+	async with semaphore:
+		call = asyncio.create_task(agent._invoke_llm(lambda: llm.ainvoke('next step'), llm))
+		await asyncio.sleep(0.1)
+		# Waiting for the slot of the batch, the call does not hold the only concurrent call of the model
+		assert scheduler.metrics() == {}
+		other = await scheduler.call(get_model_name(llm), lambda: asyncio.sleep(0, AIMessage(content='other')))
+		assert other.content == 'other'
+
+	assert (await call).content == 'plan'
+	# Unnamed models are keyed like in extract_content, so they share one budget
+	assert list(scheduler.metrics()) == [get_model_name(llm)]
+	assert scheduler.metrics()[get_model_name(llm)].requests == 2
+	assert scheduler.metrics()[get_model_name(llm)].queued_seconds < 0.1
+
+
+async def test_compaction_goes_through_the_scheduler():
+	scheduler = LLMScheduler()
+	llm = FakeListChatModel(responses=['next step'])
+	compaction_llm = FakeListChatModel(responses=['Compared the prices of 3 flights.'])
+	agent = Agent(
+		task='task',
+		llm=llm,
+		browser=Browser(BrowserConfig()),
+		llm_scheduler=scheduler,
+		compaction_llm=compaction_llm,
+		compaction_threshold=0.01,
+	)
+	message_manager = agent._message_manager
+	for step in range(8):
+		tool_call = {'name': 'AgentOutput', 'args': {}, 'id': str(message_manager.state.tool_id), 'type': 'tool_call'}
+		message_manager._add_message_with_tokens(AIMessage(content='', tool_calls=[tool_call]))
+		message_manager.add_tool_message(content='')
+		message_manager._add_message_with_tokens(HumanMessage(content=f'Action result: price {step}'))
+
+	assert await message_manager.compact_history(invoke_llm=agent._invoke_llm)
+	assert message_manager.state.summary == 'Compared the prices of 3 flights.'
+	assert list(scheduler.metrics()) == [get_model_name(compaction_llm)]
+	assert scheduler.metrics()[get_model_name(compaction_llm)].requests == 1
+
+
+def test_retry_after_from_headers():
+	assert retry_after_seconds({'Retry-After': '2'}) == 2
+	assert retry_after_seconds({'retry-after-ms': '250'}) == 0.25
+	assert retry_after_seconds({'x-ratelimit-remaining-tokens': '0', 'x-ratelimit-reset-tokens': '1m30s'}) == 90
+	assert retry_after_seconds({'x-ratelimit-remaining-tokens': '10', 'x-ratelimit-reset-tokens': '1m30s'}) is None
+
+	reset = (datetime.now(timezone.utc) + timedelta(seconds=20)).isoformat().replace('+00:00', 'Z')
+	delay = retry_after_seconds({'anthropic-ratelimit-requests-remaining': '0', 'anthropic-ratelimit-requests-reset': reset})
+	assert delay is not None and 18 < delay <= 20
+
+	assert is_rate_limit_error(RateLimitError({}))
+	assert not is_rate_limit_error(ValueError('Could not parse response.'))
@@ -0,0 +1,48 @@
+"""
+Tests for encoding screenshots before they are sent to the LLM.
+
+@dev You can run this test with: pytest tests/test_screenshot.py
+"""
+
+import base64
+import io
+
+import pytest
+
+from browser_use.browser.screenshot import image_mime_type, needs_reencoding, reencode_screenshot
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def _png(width: int, height: int) -> bytes:
+	output = io.BytesIO()
+	Image.new('RGBA', (width, height), (200, 30, 30, 255)).save(output, format='PNG')
+	return output.getvalue()
+
+
+def test_needs_reencoding():
+	assert not needs_reencoding('png', None, None)
+	assert not needs_reencoding('jpeg', None, None)
+	assert needs_reencoding('webp', None, None)
+	assert needs_reencoding('jpeg', 640, None)
+
+
+@pytest.mark.parametrize('image_format, mime_type', [('png', 'image/png'), ('jpeg', 'image/jpeg'), ('webp', 'image/webp')])
+def test_reencode_and_detect_mime_type(image_format, mime_type):
+	image = reencode_screenshot(_png(1280, 1100), image_format, quality=60)
+
+	assert image_mime_type(base64.b64encode(image).decode('utf-8')) == mime_type
+	with Image.open(io.BytesIO(image)) as img:
+		assert img.size == (1280, 1100)
+
+
+def test_downscale_keeps_aspect_ratio():
+	image = reencode_screenshot(_png(1280, 1100), 'jpeg', max_width=640)
+
+	with Image.open(io.BytesIO(image)) as img:
+		assert img.size == (640, 550)
+
+	# Images are never upscaled
+	image = reencode_screenshot(_png(320, 200), 'png', max_width=640, max_height=480)
+	with Image.open(io.BytesIO(image)) as img:
+		assert img.size == (320, 200)
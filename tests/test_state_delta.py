@@ -0,0 +1,137 @@
+"""
+Tests for sending only the changes to the interactive elements in the state messages.
+
+@dev You can run this test with: pytest tests/test_state_delta.py
+"""
+
+from langchain_core.messages import SystemMessage
+
+from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
+from browser_use.agent.message_manager.tokens import EstimateTokenCounter
+from browser_use.agent.prompts import ELEMENTS_BASELINE_HEADER
+from browser_use.agent.views import MessageManagerState
+from browser_use.browser.views import BrowserState, TabInfo
+from browser_use.dom.diff import diff_elements, element_lines
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+def _page(labels: list[str], menu_open: bool = False) -> DOMElementNode:
+	"""A list of buttons, and a dropdown whose `aria-expanded` changes"""
+	root = DOMElementNode(is_visible=True, parent=None, tag_name='body', xpath='/body', attributes={}, children=[])
+	elements = [('button', label, {}) for label in labels]
+	elements.append(('select', 'Sort', {'aria-expanded': str(menu_open).lower()}))
+	for i, (tag, label, attributes) in enumerate(elements):
+		node = DOMElementNode(
+			is_visible=True,
+			parent=root,
+			tag_name=tag,
+			xpath=f'/body/{tag}[{i + 1}]',
+			attributes=attributes,
+			children=[],
+			highlight_index=i,
+		)
+		node.children.append(DOMTextNode(is_visible=True, parent=node, text=label))
+		root.children.append(node)
+	root.children.append(DOMTextNode(is_visible=True, parent=root, text='Results'))
+	return root
+
+
+def _state(element_tree: DOMElementNode, url: str = 'https://test.com') -> BrowserState:
+	return BrowserState(
+		url=url,
+		title='Test Page',
+		element_tree=element_tree,
+		selector_map={},
+		tabs=[TabInfo(page_id=1, url=url, title='Test Page')],
+	)
+
+
+def _message_manager() -> MessageManager:
+	return MessageManager(
+		task='Test task',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(state_delta=True, include_attributes=['aria-expanded']),
+		state=MessageManagerState(),
+		token_counter=EstimateTokenCounter(),
+	)
+
+
+def _step(message_manager: MessageManager, state: BrowserState) -> tuple[list[str], str]:
+	"""Baseline messages in the history and the state message of a step"""
+	message_manager.add_state_message(state, use_vision=False)
+	messages = message_manager.get_messages()
+	message_manager._remove_last_state_message()
+	baselines = [m.content for m in messages if isinstance(m.content, str) and m.content.startswith(ELEMENTS_BASELINE_HEADER)]
+	return baselines, messages[-1].content
+
+
+def test_diff_matches_elements_by_hash():
+	labels = [f'Item {i}' for i in range(10)]
+	before = element_lines(_page(labels).clickable_elements_to_lines())
+	after = element_lines(_page(labels[:9] + ['Item 10']).clickable_elements_to_lines())
+
+	diff = diff_elements(before, after)
+	assert diff.changed == ['[9]<button Item 10/>']
+	assert diff.added == diff.removed == []
+
+
+def _frames(labels: list[str]) -> DOMElementNode:
+	"""Two iframes with the same content, whose elements have the same xpath within their frame"""
+	root = DOMElementNode(is_visible=True, parent=None, tag_name='body', xpath='/body', attributes={}, children=[])
+	for i, label in enumerate(labels):
+		iframe = DOMElementNode(
+			is_visible=True, parent=root, tag_name='iframe', xpath=f'/body/iframe[{i + 1}]', attributes={}, children=[]
+		)
+		button = DOMElementNode(
+			is_visible=True,
+			parent=iframe,
+			tag_name='button',
+			xpath='/html/body/button',
+			attributes={},
+			children=[],
+			highlight_index=i,
+		)
+		button.children.append(DOMTextNode(is_visible=True, parent=button, text=label))
+		iframe.children.append(button)
+		root.children.append(iframe)
+	return root
+
+
+def test_identical_elements_in_different_frames_are_told_apart():
+	before = element_lines(_frames(['Accept', 'Accept']).clickable_elements_to_lines())
+	assert len(before) == 2
+
+	after = element_lines(_frames(['Accept', 'Accepted']).clickable_elements_to_lines())
+	diff = diff_elements(before, after)
+	assert diff.changed == ['[1]<button Accepted/>']
+	assert diff.added == diff.removed == []
+
+
+def test_only_changes_are_sent():
+	message_manager = _message_manager()
+	labels = [f'Item {i}' for i in range(10)]
+
+	baselines, state_message = _step(message_manager, _state(_page(labels)))
+	assert len(baselines) == 1 and '[3]<button Item 3/>' in baselines[0]
+	assert 'No changes since' in state_message
+	assert 'Item 3' not in state_message
+
+	baselines, state_message = _step(message_manager, _state(_page(labels, menu_open=True)))
+	assert len(baselines) == 1
+	assert 'Changed:\n[10]<select true>Sort/>' in state_message
+	assert 'Item 3' not in state_message
+
+
+def test_new_baseline_after_navigation_or_large_changes():
+	message_manager = _message_manager()
+	labels = [f'Item {i}' for i in range(10)]
+
+	_step(message_manager, _state(_page(labels)))
+	baselines, state_message = _step(message_manager, _state(_page(labels), url='https://test.com/next'))
+	assert len(baselines) == 1 and 'https://test.com/next' in baselines[0]
+	assert 'No changes since' in state_message
+
+	baselines, state_message = _step(message_manager, _state(_page(['Other'] * 10), url='https://test.com/next'))
+	assert len(baselines) == 1 and '[3]<button Other/>' in baselines[0]
+	assert 'No changes since' in state_message
+	assert message_manager.state.history.current_tokens == sum(m.metadata.tokens for m in message_manager.state.history.messages)
@@ -0,0 +1,147 @@
+"""
+Tests for the token accounting of the message manager.
+
+@dev You can run this test with: pytest tests/test_token_counter.py
+"""
+
+import base64
+import io
+import threading
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from PIL import Image
+
+from browser_use.agent.message_manager import tokens
+from browser_use.agent.message_manager.service import MessageManager, MessageManagerSettings
+from browser_use.agent.message_manager.tokens import (
+	EstimateTokenCounter,
+	TiktokenCounter,
+	TokenCounter,
+	anthropic_image_tokens,
+	get_token_counter,
+	image_tokens,
+)
+from browser_use.agent.views import MessageManagerState
+from browser_use.browser.screenshot import image_size
+
+
+class WordCounter(TokenCounter):
+	def __init__(self):
+		super().__init__()
+		self.calls = 0
+
+	def _count_text(self, text: str) -> int:
+		self.calls += 1
+		return len(text.split())
+
+
+def _image(size: tuple[int, int], image_format: str) -> str:
+	output = io.BytesIO()
+	Image.new('RGB', size, (200, 10, 10)).save(output, format=image_format)
+	return base64.b64encode(output.getvalue()).decode('utf-8')
+
+
+@pytest.mark.parametrize('image_format', ['PNG', 'JPEG', 'WEBP'])
+def test_image_size_from_header(image_format):
+	assert image_size(_image((1280, 720), image_format)) == (1280, 720)
+
+
+def test_image_size_of_invalid_data():
+	assert image_size('not an image') is None
+
+
+def test_image_tokens():
+	assert image_tokens(1024, 1024, detail='low') == 85
+	# Scaled to 768x768, 4 tiles
+	assert image_tokens(1024, 1024) == 765
+	# Scaled to 1024x2048 then 768x1536, 6 tiles
+	assert image_tokens(2048, 4096) == 1105
+	# Small images are not scaled up
+	assert image_tokens(500, 300) == 255
+
+
+def test_anthropic_image_tokens():
+	assert anthropic_image_tokens(1000, 750) == 1000
+	# Scaled down to about 1.15 megapixels
+	assert anthropic_image_tokens(2000, 1500) == 1534
+	assert anthropic_image_tokens(1092, 1092) == anthropic_image_tokens(2184, 2184)
+
+	screenshot = f'data:image/png;base64,{_image((1000, 750), "PNG")}'
+	assert get_token_counter('claude-3-5-sonnet-20241022').count_image({'url': screenshot}) == 1000
+	assert get_token_counter('gpt-4o').count_image({'url': screenshot}) == 765
+
+
+def test_counts_are_memoized():
+	counter = WordCounter()
+	assert counter.count_text('one two three') == 3
+	assert counter.count_text('one two three') == 3
+	assert counter.calls == 1
+
+	counter.cache_size = 1
+	counter.count_text('four')
+	counter.count_text('one two three')
+	assert counter.calls == 3
+
+
+def test_message_manager_uses_the_token_counter():
+	screenshot = _image((1024, 1024), 'PNG')
+	message_manager = MessageManager(
+		task='Test task',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(image_tokens=800),
+		token_counter=WordCounter(),
+	)
+
+	message = HumanMessage(
+		content=[
+			{'type': 'text', 'text': 'one two'},
+			{'type': 'image_url', 'image_url': {'url': f'data:image/png;base64,{screenshot}'}},
+		]
+	)
+	assert message_manager._count_tokens(message) == 2 + 765
+
+	low_detail = HumanMessage(
+		content=[{'type': 'image_url', 'image_url': {'url': f'data:image/png;base64,{screenshot}', 'detail': 'low'}}]
+	)
+	assert message_manager._count_tokens(low_detail) == 85
+
+	unreadable = HumanMessage(content=[{'type': 'image_url', 'image_url': {'url': 'data:image/png;base64,AAAA'}}])
+	assert message_manager._count_tokens(unreadable) == 800
+
+
+def test_estimate():
+	assert EstimateTokenCounter(characters_per_token=4).count_text('a' * 40) == 10
+
+
+class Encoding:
+	def encode(self, text: str, disallowed_special=()) -> list[str]:
+		return text.split()
+
+
+async def test_tokenizer_is_loaded_off_the_event_loop(monkeypatch):
+	loaded_in = []
+
+	def get_encoding(model_name):
+		loaded_in.append(threading.current_thread())
+		return Encoding()
+
+	monkeypatch.setattr(tokens, '_get_encoding', get_encoding)
+	message_manager = MessageManager(
+		task='Test task',
+		system_message=SystemMessage(content='Test actions'),
+		settings=MessageManagerSettings(),
+		state=MessageManagerState(),
+		token_counter=TiktokenCounter('gpt-4o', characters_per_token=1),
+	)
+	# Estimated until the tokenizer is loaded
+	assert message_manager.token_counter.count_text('one two') == 7
+	estimated = message_manager.state.history.current_tokens
+
+	await message_manager.load_token_counter()
+	assert loaded_in and loaded_in[0] is not threading.main_thread()
+	assert message_manager.token_counter.count_text('one two') == 2
+	# The messages counted before are counted again with the tokenizer
+	assert message_manager.state.history.current_tokens < estimated
+	assert message_manager.state.history.current_tokens == sum(m.metadata.tokens for m in message_manager.state.history.messages)
+	assert not await message_manager.token_counter.load()